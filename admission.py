@@ -0,0 +1,120 @@
+"""정산이 밀릴 때의 입장 제어.
+
+디스크가 느리거나 큰 보정이 도는 동안에도 새 놀이를 그대로 받으면, 저장소 잠금에 줄을 선 채로
+디스코드 응답 제한(3초)이 지나 상호작용이 실패한다. 잠금의 대기 인원과 대기·보유 시간을 재서
+
+- 예상 대기가 ADMISSION_DEFER_MS 를 넘으면 정산 전에 먼저 응답을 미뤄(defer) 두고,
+- ADMISSION_REJECT_MS 나 ADMISSION_MAX_WAITING 을 넘으면 새 놀이를 "바쁨" 안내와 함께 받지 않는다.
+
+이미 시작한 놀이의 정산은 막지 않는다. 상태는 health 서버에서 볼 수 있다.
+MeteredLock은 저장소도 쓰므로 여기서는 discord 를 import 하지 않는다.
+"""
+
+import asyncio
+import time
+from typing import Callable, Optional
+
+STATE_OK = 'ok'
+STATE_SLOW = 'slow'
+STATE_BUSY = 'busy'
+
+STATE_NAMES = {STATE_OK: "정상", STATE_SLOW: "지연", STATE_BUSY: "과부하"}
+
+
+class MeteredLock:
+    """asyncio.Lock에 대기 인원과 대기·보유 시간(지수 이동 평균) 측정을 더한 것."""
+
+    def __init__(self, alpha: float = 0.2):
+        self._lock = asyncio.Lock()
+        self.alpha = alpha
+        self.waiting = 0
+        self.wait_avg = 0.0
+        self.hold_avg = 0.0
+        self._acquired_at: Optional[float] = None
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    async def __aenter__(self) -> None:
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._lock.acquire()
+        finally:
+            self.waiting -= 1
+        now = time.monotonic()
+        self.wait_avg = self._average(self.wait_avg, now - started)
+        self._acquired_at = now
+
+    async def __aexit__(self, *exc) -> None:
+        if self._acquired_at is not None:
+            self.hold_avg = self._average(self.hold_avg, time.monotonic() - self._acquired_at)
+            self._acquired_at = None
+        self._lock.release()
+
+    def _average(self, average: float, sample: float) -> float:
+        # 처음 잰 값은 그대로 쓴다. 0에서 시작하면 한동안 실제보다 작게 나온다.
+        return sample if not average else average + self.alpha * (sample - average)
+
+    def expected_wait(self) -> float:
+        """지금 줄을 서면 기다릴 시간(초) 추정.
+
+        지금 잡고 있는 쪽이 잡은 지 지난 시간 + 앞에 선 인원 × 평소 잡고 있는 시간.
+        """
+        acquired_at = self._acquired_at
+        held = time.monotonic() - acquired_at if acquired_at is not None else 0.0
+        return held + self.waiting * self.hold_avg
+
+
+class AdmissionController:
+    def __init__(
+        self, lock: MeteredLock, defer_ms: int, reject_ms: int, max_waiting: int,
+        backlog: Callable[[], float] = lambda: 0.0,
+    ):
+        self.lock = lock
+        # 잠금 말고 더 기다릴 시간(초). 잠금 밖에서 파일 쓰기를 기다리는 시간 등.
+        self.backlog = backlog
+        self.defer_after = defer_ms / 1000
+        self.reject_after = reject_ms / 1000
+        self.max_waiting = max_waiting
+        self.admitted = 0
+        self.deferred = 0
+        self.rejected = 0
+
+    def expected_wait(self) -> float:
+        return self.lock.expected_wait() + self.backlog()
+
+    def state(self) -> str:
+        expected = self.expected_wait()
+        if expected >= self.reject_after or self.lock.waiting >= self.max_waiting:
+            return STATE_BUSY
+        if expected >= self.defer_after:
+            return STATE_SLOW
+        return STATE_OK
+
+    def admit(self) -> bool:
+        """새 놀이를 받을지. 과부하면 False."""
+        if self.state() == STATE_BUSY:
+            self.rejected += 1
+            return False
+        self.admitted += 1
+        return True
+
+    async def defer_if_slow(self, interaction, ephemeral: bool = False) -> bool:
+        """정산이 밀려 있으면 응답을 먼저 미룬다. 미뤘으면 True이고, 이후 응답은 followup 으로 보낸다."""
+        if interaction.response.is_done() or self.state() == STATE_OK:
+            return False
+        if interaction.type.name == 'component':
+            # 버튼은 "생각 중" 메시지 없이 원래 메시지를 고칠 수 있게 미룬다.
+            await interaction.response.defer()
+        else:
+            await interaction.response.defer(ephemeral=ephemeral, thinking=True)
+        self.deferred += 1
+        return True
+
+    def report(self) -> str:
+        return (
+            f"정산 {STATE_NAMES[self.state()]} (대기 {self.lock.waiting}명, "
+            f"예상 {self.expected_wait() * 1000:.0f}ms, 평균 대기 {self.lock.wait_avg * 1000:.0f}ms) "
+            f"/ 받음 {self.admitted} · 미룸 {self.deferred} · 거절 {self.rejected}"
+        )
@@ -0,0 +1,199 @@
+"""경제 지표 분석.
+
+한 서버의 보유량과 변동 기록을 NumPy 배열로 읽어 설정값(SOLO_BET, 보상, GIFT_RATIO 등)을
+조정할 때 참고할 지표를 계산한다. 봇과 별개로 실행하는 도구다.
+
+    python analytics.py 123456789012345678
+    python analytics.py 123456789012345678 --days 14 --out report.json
+
+- 총 발행량, 보유 인원, 지니 계수
+- 날짜별 발행(최초 지급·매일 보정·혼자놀기 보상)과 소멸(혼자놀기 회수·선물 손실)
+- 사유별 순변동
+- 같이놀기 베팅액 분포
+
+변동 기록은 고정 길이라 파일을 그대로 구조화 배열로 매핑하고, 모든 집계는 배열 연산으로 한다.
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config
+from ledger import (
+    RECORD,
+    REASON_DUO,
+    REASON_GIFT,
+    REASON_INITIAL,
+    REASON_NAMES,
+    REASON_SOLO,
+    REASON_TOPUP,
+    Ledger,
+)
+from storage import TokenStore
+
+# ledger.RECORD 와 같은 배치
+LEDGER_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('guild', '<u8'),
+    ('user', '<u8'),
+    ('counterparty', '<u8'),
+    ('delta', '<i8'),
+    ('reason', 'u1'),
+    ('pad', 'V7'),
+])
+assert LEDGER_DTYPE.itemsize == RECORD.size
+
+DAY_MS = 86_400_000
+
+
+def load_records(ledger: Ledger, guild_id: int, days: Optional[int]) -> np.ndarray:
+    """한 서버의 변동 기록을 구조화 배열로 읽는다. days가 있으면 최근 그 일수만."""
+    segments = ledger.segments()
+    if days:
+        segments = segments[-days:]
+
+    parts = []
+    for day in segments:
+        path = ledger.segment_path(day)
+        count = os.path.getsize(path) // RECORD.size
+        if not count:
+            continue
+        records = np.memmap(path, dtype=LEDGER_DTYPE, mode='r', shape=(count,))
+        parts.append(np.asarray(records[records['guild'] == guild_id]))
+    if not parts:
+        return np.empty(0, dtype=LEDGER_DTYPE)
+    return np.concatenate(parts)
+
+
+def gini(balances: np.ndarray) -> float:
+    """0이면 모두 같은 양을 가졌고, 1에 가까울수록 한쪽에 몰려 있다."""
+    if balances.size == 0 or balances.sum() == 0:
+        return 0.0
+    ordered = np.sort(balances.astype(np.float64))
+    n = ordered.size
+    ranks = np.arange(1, n + 1)
+    return float((2 * (ranks * ordered).sum()) / (n * ordered.sum()) - (n + 1) / n)
+
+
+def daily_flows(records: np.ndarray) -> List[dict]:
+    """날짜별 발행량과 소멸량."""
+    if records.size == 0:
+        return []
+    day_index = records['ts'] // DAY_MS
+    first = int(day_index.min())
+    slot = (day_index - first).astype(np.int64)
+    slots = int(slot.max()) + 1
+    delta = records['delta']
+    reason = records['reason']
+
+    minted_mask = np.isin(reason, (REASON_INITIAL, REASON_TOPUP)) | ((reason == REASON_SOLO) & (delta > 0))
+    minted = np.bincount(slot, weights=np.where(minted_mask, delta, 0), minlength=slots)
+
+    solo_loss = np.bincount(slot, weights=np.where((reason == REASON_SOLO) & (delta < 0), -delta, 0),
+                            minlength=slots)
+    # 선물은 보낸 양과 받은 양의 차이만큼 사라진다. 날짜별 순변동의 음수가 곧 소멸량이다.
+    gift_loss = -np.bincount(slot, weights=np.where(reason == REASON_GIFT, delta, 0), minlength=slots)
+
+    flows = []
+    for offset in range(slots):
+        day = datetime.fromtimestamp((first + offset) * DAY_MS / 1000, tz=timezone.utc).date()
+        flows.append({
+            'day': day.isoformat(),
+            'minted': int(minted[offset]),
+            'burned_solo': int(solo_loss[offset]),
+            'burned_gift': int(gift_loss[offset]),
+            'net': int(minted[offset] - solo_loss[offset] - gift_loss[offset]),
+        })
+    return flows
+
+
+def reason_totals(records: np.ndarray) -> Dict[str, int]:
+    if records.size == 0:
+        return {}
+    totals = np.bincount(records['reason'], weights=records['delta'], minlength=max(REASON_NAMES) + 1)
+    return {REASON_NAMES.get(code, str(code)): int(total) for code, total in enumerate(totals) if total}
+
+
+def duo_bets(records: np.ndarray) -> dict:
+    """같이놀기 베팅액 분포. 한 판은 이긴 쪽(+)과 진 쪽(-) 두 행으로 남으므로 이긴 쪽만 센다."""
+    bets = records['delta'][(records['reason'] == REASON_DUO) & (records['delta'] > 0)]
+    if bets.size == 0:
+        return {'games': 0}
+    ladder = np.asarray(config.DUO_BET_LADDER)
+    buckets = np.searchsorted(ladder, bets, side='right') - 1
+    counts = np.bincount(np.clip(buckets, 0, None), minlength=ladder.size)
+    p50, p90, p99 = np.percentile(bets, [50, 90, 99])
+    return {
+        'games': int(bets.size),
+        'total_wagered': int(bets.sum()),
+        'mean': float(bets.mean()),
+        'p50': float(p50),
+        'p90': float(p90),
+        'p99': float(p99),
+        'by_ladder': {str(int(ladder[i])): int(c) for i, c in enumerate(counts) if c},
+    }
+
+
+def build_report(data_dir: str, guild_id: int, days: Optional[int]) -> dict:
+    # 봇이 돌고 있는 DATA_DIR일 수 있으므로 읽기만 한다. 변동 기록도 열지 않고 파일을 그대로 매핑한다.
+    store = TokenStore(data_dir)
+    store.load(readonly=True)
+    balances = np.fromiter(store.snapshot(guild_id).values(), dtype=np.int64)
+    records = load_records(Ledger(data_dir), guild_id, days)
+
+    return {
+        'guild_id': str(guild_id),
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'records': int(records.size),
+        'supply': {
+            'total': int(balances.sum()),
+            'holders': int(balances.size),
+            'mean': float(balances.mean()) if balances.size else 0.0,
+            'median': float(np.median(balances)) if balances.size else 0.0,
+            'gini': round(gini(balances), 4),
+            'at_floor_or_below': int((balances <= config.DAILY_FLOOR).sum()),
+        },
+        'daily': daily_flows(records),
+        'by_reason': reason_totals(records),
+        'duo_bets': duo_bets(records),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='서버 경제 지표 분석')
+    parser.add_argument('guild_id', type=int)
+    parser.add_argument('--days', type=int, default=None, help='최근 며칠치 기록만 (기본: 전체)')
+    parser.add_argument('--data-dir', default=config.DATA_DIR)
+    parser.add_argument('--out', default=None, help='보고서 경로 (기본: DATA_DIR/reports/)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = build_report(args.data_dir, args.guild_id, args.days)
+    elapsed = time.perf_counter() - started
+
+    out = args.out or os.path.join(
+        args.data_dir, 'reports', f"analytics-{args.guild_id}-{date.today().isoformat()}.json"
+    )
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, separators=(',', ':'))
+
+    supply = report['supply']
+    print(f"기록 {report['records']:,}건 분석 ({elapsed:.2f}초)")
+    print(f"총 발행량 {supply['total']:,} / 보유 인원 {supply['holders']:,} / 지니 계수 {supply['gini']}")
+    for row in report['daily'][-7:]:
+        print(f"  {row['day']}  발행 {row['minted']:>10,}  소멸 {row['burned_solo'] + row['burned_gift']:>10,}"
+              f"  순증 {row['net']:>10,}")
+    bets = report['duo_bets']
+    if bets['games']:
+        print(f"같이놀기 {bets['games']:,}판, 중앙값 {bets['p50']:,.0f}, 상위 10% {bets['p90']:,.0f}")
+    print(f"보고서: {out}")
+
+
+if __name__ == '__main__':
+    main()
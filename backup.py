@@ -0,0 +1,293 @@
+"""DATA_DIR 증분 백업.
+
+백업할 때마다 파일을 통째로 복사하지 않고, 내용을 조각(chunk)으로 나눠 해시로 이름 붙여 저장한다.
+이미 있는 조각은 다시 쓰지 않으므로 바뀐 부분만 디스크에 쓰인다.
+
+- 보유량 스냅숏(tokens.bin, tokens.prev.bin)은 서버 블록 단위로 조각을 나눈다. 변동이 없는 서버는
+  새로 쓰이지 않는다. 예전 백업의 tokens.json 조각도 그대로 복원할 수 있다.
+- 나머지 파일(변동 기록, 전적 등)은 1 MiB 단위로 나눈다. 덧붙이기만 하는 파일은 앞부분이 그대로 재사용된다.
+- 백업 한 번은 조각 목록을 적은 manifest 하나로 남고, BACKUP_KEEP 개를 넘으면 오래된 것부터 지운다.
+- 읽고 쓰는 양을 BACKUP_IO_LIMIT(바이트/초)로 제한하고, 저장소가 파일을 쓰는 중이면 잠시 비켜서
+  정산의 fsync와 디스크를 다투지 않게 한다.
+
+    python backup.py snapshot
+    python backup.py list
+    python backup.py restore --at 2026-10-19T07:00 [--to 복원할_폴더]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import config
+import tokenfile
+
+BACKUP_DIRNAME = 'backups'
+CHUNK_SIZE = 1 << 20
+# 백업 대상에서 빼는 것
+SKIP_DIRS = {BACKUP_DIRNAME, 'reports'}
+SKIP_SUFFIXES = ('.tmp', '.broken', '.sock', '.lock')
+# 서버 블록 단위로 조각을 나누는 파일
+SNAPSHOT_FILES = ('tokens.bin', 'tokens.prev.bin')
+
+
+class Throttle:
+    """초당 처리량을 제한한다. 한도를 넘으면 그만큼 잠든다."""
+
+    def __init__(self, bytes_per_second: int, busy: Optional[Callable[[], bool]] = None):
+        self.rate = bytes_per_second
+        self.busy = busy
+        self._started = time.monotonic()
+        self._spent = 0
+
+    def spend(self, amount: int) -> None:
+        # 저장소가 파일을 쓰는 동안은 기다렸다가 이어서 한다.
+        while self.busy is not None and self.busy():
+            time.sleep(0.05)
+        if self.rate <= 0:
+            return
+        self._spent += amount
+        ahead = self._spent / self.rate - (time.monotonic() - self._started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+class BackupStore:
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.root = os.path.join(data_dir, BACKUP_DIRNAME)
+        self.chunk_dir = os.path.join(self.root, 'chunks')
+        self.manifest_dir = os.path.join(self.root, 'manifests')
+
+    # ------------------------------------------------------------------
+    # 조각
+    # ------------------------------------------------------------------
+    def chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def put_chunk(self, data: bytes, throttle: Throttle) -> str:
+        """조각을 저장하고 해시를 돌려준다. 이미 있으면 쓰지 않는다."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if os.path.exists(path):
+            return digest
+        compressed = zlib.compress(data, 6)
+        throttle.spend(len(compressed))
+        write_atomic(path, compressed)
+        return digest
+
+    def get_chunk(self, digest: str) -> bytes:
+        with open(self.chunk_path(digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f'조각 {digest[:12]} 의 내용이 해시와 다릅니다.')
+        return data
+
+    # ------------------------------------------------------------------
+    # 백업
+    # ------------------------------------------------------------------
+    def data_files(self) -> List[str]:
+        found = []
+        for current, dirs, files in os.walk(self.data_dir):
+            dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+            for name in sorted(files):
+                if name.endswith(SKIP_SUFFIXES):
+                    continue
+                found.append(os.path.relpath(os.path.join(current, name), self.data_dir))
+        return found
+
+    def snapshot(self, throttle: Optional[Throttle] = None) -> str:
+        """지금의 DATA_DIR을 백업하고 manifest 이름을 돌려준다."""
+        throttle = throttle or Throttle(config.BACKUP_IO_LIMIT)
+        files: Dict[str, dict] = {}
+        written_before = self._chunk_count()
+
+        for relpath in self.data_files():
+            try:
+                with open(os.path.join(self.data_dir, relpath), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            throttle.spend(len(data))
+            if relpath in SNAPSHOT_FILES:
+                chunks = [self.put_chunk(data[start:end], throttle) for start, end in tokenfile.block_spans(data)]
+                files[relpath] = {'kind': 'raw', 'size': len(data), 'chunks': chunks}
+            elif relpath == 'tokens.json':
+                files[relpath] = self._put_tokens(data, throttle)
+            else:
+                chunks = [
+                    self.put_chunk(data[i:i + CHUNK_SIZE], throttle)
+                    for i in range(0, len(data), CHUNK_SIZE)
+                ]
+                files[relpath] = {'kind': 'raw', 'size': len(data), 'chunks': chunks}
+
+        created = datetime.now(timezone.utc)
+        name = created.strftime('%Y%m%dT%H%M%S%fZ')
+        manifest = {'created': created.isoformat(timespec='seconds'), 'files': files}
+        write_atomic(
+            os.path.join(self.manifest_dir, f'{name}.json'),
+            json.dumps(manifest, separators=(',', ':')).encode('utf-8'),
+            durable=True,
+        )
+        self.prune(config.BACKUP_KEEP)
+        print(f"[backup] {name}: 파일 {len(files)}개, 새 조각 {self._chunk_count() - written_before}개")
+        return name
+
+    def _put_tokens(self, data: bytes, throttle: Throttle) -> dict:
+        """tokens.json 은 서버별로 조각을 나눠, 변동이 없는 서버는 다시 쓰지 않는다."""
+        try:
+            raw = json.loads(data)
+        except ValueError:
+            return {'kind': 'raw', 'size': len(data), 'chunks': [self.put_chunk(data, throttle)]}
+
+        balances = raw.pop('balances', {})
+        guilds = {
+            gid: self.put_chunk(
+                json.dumps(members, sort_keys=True, separators=(',', ':')).encode('utf-8'), throttle
+            )
+            for gid, members in balances.items()
+        }
+        meta = self.put_chunk(json.dumps(raw, sort_keys=True, separators=(',', ':')).encode('utf-8'), throttle)
+        return {'kind': 'tokens', 'meta': meta, 'guilds': guilds}
+
+    def _chunk_count(self) -> int:
+        try:
+            return sum(len(os.listdir(os.path.join(self.chunk_dir, d))) for d in os.listdir(self.chunk_dir))
+        except FileNotFoundError:
+            return 0
+
+    # ------------------------------------------------------------------
+    # 보관 개수 정리
+    # ------------------------------------------------------------------
+    def manifests(self) -> List[str]:
+        try:
+            return sorted(n[:-5] for n in os.listdir(self.manifest_dir) if n.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    def load_manifest(self, name: str) -> dict:
+        with open(os.path.join(self.manifest_dir, f'{name}.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def prune(self, keep: int) -> None:
+        """오래된 manifest를 지우고, 어느 manifest도 쓰지 않는 조각을 지운다."""
+        names = self.manifests()
+        if len(names) <= keep:
+            return
+        for name in names[:-keep]:
+            os.unlink(os.path.join(self.manifest_dir, f'{name}.json'))
+
+        used = set()
+        for name in names[-keep:]:
+            for entry in self.load_manifest(name)['files'].values():
+                used.update(chunks_of(entry))
+        for sub in os.listdir(self.chunk_dir):
+            for digest in os.listdir(os.path.join(self.chunk_dir, sub)):
+                if digest not in used:
+                    os.unlink(os.path.join(self.chunk_dir, sub, digest))
+
+    # ------------------------------------------------------------------
+    # 복원
+    # ------------------------------------------------------------------
+    def find(self, at: Optional[datetime]) -> Optional[str]:
+        """at 시각 이전의 가장 최근 백업. at이 없으면 가장 최근 백업."""
+        chosen = None
+        for name in self.manifests():
+            created = datetime.fromisoformat(self.load_manifest(name)['created'])
+            if at is None or created <= at:
+                chosen = name
+        return chosen
+
+    def restore(self, name: str, target_dir: str) -> int:
+        """백업을 target_dir에 풀어 놓는다. 복원한 파일 수를 돌려준다.
+
+        백업 뒤에 생긴 파일(그 뒤의 일지 조각, 변동 기록 날짜 파일, 이전 스냅숏 등)이 남아 있으면
+        불러올 때 복원한 스냅숏 위에 다시 반영되어 그 시점보다 앞서 버린다. 그래서 백업 대상이 되는 파일 중
+        manifest에 없는 것은 먼저 지운다. backups/ 와 reports/ 는 건드리지 않는다.
+        """
+        manifest = self.load_manifest(name)
+        removed = 0
+        for relpath in BackupStore(target_dir).data_files():
+            if relpath not in manifest['files']:
+                os.unlink(os.path.join(target_dir, relpath))
+                removed += 1
+        if removed:
+            print(f"[backup] {name}: 백업 뒤에 생긴 파일 {removed}개를 지웠습니다.")
+        for relpath, entry in manifest['files'].items():
+            if entry['kind'] == 'tokens':
+                payload = json.loads(self.get_chunk(entry['meta']))
+                payload['balances'] = {
+                    gid: json.loads(self.get_chunk(digest)) for gid, digest in entry['guilds'].items()
+                }
+                data = json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8')
+            else:
+                data = b''.join(self.get_chunk(digest) for digest in entry['chunks'])
+            write_atomic(os.path.join(target_dir, relpath), data, durable=True)
+        return len(manifest['files'])
+
+
+def chunks_of(entry: dict) -> List[str]:
+    if entry['kind'] == 'tokens':
+        return [entry['meta'], *entry['guilds'].values()]
+    return list(entry['chunks'])
+
+
+def write_atomic(path: str, data: bytes, durable: bool = False) -> None:
+    """임시 파일에 쓴 뒤 교체한다. 조각은 잃어도 다시 만들 수 있어 fsync는 manifest·복원에만 한다."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='토큰 데이터 증분 백업')
+    parser.add_argument('--data-dir', default=config.DATA_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('snapshot', help='지금 백업한다')
+    sub.add_parser('list', help='백업 목록')
+    restore = sub.add_parser('restore', help='백업을 복원한다 (봇을 멈춘 뒤 실행)')
+    restore.add_argument('--at', default=None, help='이 시각 이전의 가장 최근 백업 (ISO 형식, UTC)')
+    restore.add_argument('--to', default=None, help='복원할 폴더 (기본: DATA_DIR)')
+    args = parser.parse_args()
+
+    backups = BackupStore(args.data_dir)
+    if args.command == 'snapshot':
+        backups.snapshot(Throttle(0))
+    elif args.command == 'list':
+        for name in backups.manifests():
+            manifest = backups.load_manifest(name)
+            print(f"{name}  {manifest['created']}  파일 {len(manifest['files'])}개")
+    else:
+        at = None
+        if args.at:
+            at = datetime.fromisoformat(args.at)
+            if at.tzinfo is None:
+                at = at.replace(tzinfo=timezone.utc)
+        name = backups.find(at)
+        if name is None:
+            raise SystemExit('해당 시각 이전의 백업이 없습니다.')
+        count = backups.restore(name, args.to or args.data_dir)
+        print(f"{name} 에서 파일 {count}개를 복원했습니다.")
+
+
+if __name__ == '__main__':
+    main()
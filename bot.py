@@ -1,11 +1,18 @@
-import hashlib
+import asyncio
+import hmac
+import math
 import os
 import random
 import threading
 import time
-from datetime import datetime, time as dt_time
+
+# 시작 시간 측정 기준. 다른 import보다 먼저 잰다.
+STARTED_AT = time.monotonic()
+
+from datetime import datetime
 from http.server import HTTPServer, BaseHTTPRequestHandler
-from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from typing import Dict, List, Optional, Set, Tuple
 from zoneinfo import ZoneInfo
 
 import discord
@@ -13,7 +20,45 @@ from discord import app_commands
 from discord.ext import commands, tasks
 
 import config
-from storage import store
+from admission import AdmissionController
+from command_sync import sync_commands
+from ledger import (
+    REASON_NAMES,
+    REASON_SOLO,
+    REASON_TOURNAMENT_FEE,
+    REASON_TOURNAMENT_PRIZE,
+)
+from members import MemberDirectory
+from memprof import default_profiler
+from reset_schedule import ResetScheduler
+from rules import (
+    GAME_NAMES,
+    GAME_NUMBER,
+    GAME_ODD_EVEN,
+    bet_bucket,
+    bet_limit,
+    bet_options,
+    duel_rolls,
+    gift_amounts,
+    gift_received,
+    roll,
+    rolls,
+    solo_correct,
+    solo_delta,
+)
+from settings import GameSettings, settings
+from stats import STAT_NAMES, STAT_NUMBER, STAT_ODD_EVEN, win_rate
+from storage import SettlementError, store
+from throttle import Throttle, parse_limits
+from tournament import (
+    STATE_FINISHED,
+    STATE_REGISTERING,
+    STATE_RUNNING,
+    Tournament,
+    load_checkpoints,
+    remove_checkpoint,
+    save_checkpoint,
+)
 
 
 # ============================================
@@ -21,15 +66,48 @@ from storage import store
 # ============================================
 class SimpleHandler(BaseHTTPRequestHandler):
     def do_GET(self):
+        if self.path.startswith('/memory'):
+            self.memory()
+            return
+
         self.send_response(200)
         self.send_header('Content-type', 'text/plain; charset=utf-8')
         self.end_headers()
         if self.path == '/health':
-            status = "연결됨" if bot.is_ready() else "연결중"
-            self.wfile.write(f"Discord Bot 상태: {status}".encode('utf-8'))
+            if not store_ready.is_set():
+                status = "데이터 불러오는 중"
+            else:
+                status = "연결됨" if bot.is_ready() else "연결중"
+            text = f"Discord Bot 상태: {status}"
+            if replication_server is not None:
+                text += f" / 대기 프로세스 {replication_server.standbys}개"
+            text += f"\n{admission.report()}\n{throttle.report()}\n{store.persist.report()}"
+            if store.files.lost:
+                text += f"\n일지 블록이 깨져 커밋 일부를 잃은 서버: {', '.join(sorted(store.files.lost, key=int))}"
+            self.wfile.write(text.encode('utf-8'))
         else:
             self.wfile.write("Discord Bot이 실행중입니다!".encode('utf-8'))
 
+    def memory(self):
+        """메모리 추적 보기·켜기·끄기. MEMPROF_KEY 를 아는 사람만 쓸 수 있다."""
+        url = urlsplit(self.path)
+        key = parse_qs(url.query).get('key', [''])[0]
+        if not config.MEMPROF_KEY or not hmac.compare_digest(key, config.MEMPROF_KEY):
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        if url.path == '/memory/start':
+            text = "할당 추적을 켰습니다." if profiler.start() else "이미 켜져 있습니다."
+        elif url.path == '/memory/stop':
+            text = "할당 추적을 껐습니다." if profiler.stop() else "이미 꺼져 있습니다."
+        else:
+            text = profiler.report(profiler.sample())
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(text.encode('utf-8'))
+
     def log_message(self, format, *args):
         return
 
@@ -47,7 +125,27 @@ def start_http_server():
 intents = discord.Intents.default()
 intents.members = True
 
-bot = commands.Bot(command_prefix='!', intents=intents)
+if config.LOW_MEMORY:
+    # 멤버 객체를 캐시하지 않고, 시작할 때 전체 인원 목록도 받지 않는다.
+    # 인원 목록은 보정할 때만 받아서 ID와 봇 여부만 남긴다.
+    bot = commands.Bot(
+        command_prefix='!',
+        intents=intents,
+        member_cache_flags=discord.MemberCacheFlags.none(),
+        chunk_guilds_at_startup=False,
+    )
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents)
+
+directory = MemberDirectory(config.NAME_CACHE_SIZE)
+
+# 복제를 켰을 때 주 프로세스가 여는 소켓 서버 (on_ready에서 시작)
+replication_server = None
+# 복제를 켰을 때 주 프로세스가 쥐는 잠금 (replication.PrimaryLock)
+primary_lock = None
+
+# 저장소를 다 불러왔는지. 게이트웨이 접속과 동시에 불러오므로, 그 전에 온 명령은 잠시 기다린다.
+store_ready = asyncio.Event()
 
 KST = ZoneInfo(config.TIMEZONE)
 
@@ -68,6 +166,10 @@ class PlayLock:
         # guild_id -> (user_id, 만료 시각)
         self._holders: Dict[int, Tuple[int, float]] = {}
 
+    def __len__(self) -> int:
+        """만료됐지만 아직 치우지 않은 항목까지 센다. (메모리 추적용)"""
+        return len(self._holders)
+
     def holder(self, guild_id: int) -> Optional[int]:
         entry = self._holders.get(guild_id)
         if entry is None:
@@ -83,12 +185,12 @@ class PlayLock:
         current = self.holder(guild_id)
         if current is not None and current != user_id:
             return current
-        self._holders[guild_id] = (user_id, time.monotonic() + config.PLAY_LOCK_TIMEOUT)
+        self._holders[guild_id] = (user_id, time.monotonic() + settings.get(guild_id).PLAY_LOCK_TIMEOUT)
         return None
 
     def refresh(self, guild_id: int, user_id: int) -> None:
         if self.holder(guild_id) == user_id:
-            self._holders[guild_id] = (user_id, time.monotonic() + config.PLAY_LOCK_TIMEOUT)
+            self._holders[guild_id] = (user_id, time.monotonic() + settings.get(guild_id).PLAY_LOCK_TIMEOUT)
 
     def release(self, guild_id: int, user_id: int) -> None:
         if self._holders.get(guild_id, (None, 0.0))[0] == user_id:
@@ -100,12 +202,12 @@ play_lock = PlayLock()
 
 async def try_acquire(interaction: discord.Interaction) -> bool:
     """잠금을 시도하고, 실패하면 안내 메시지를 보낸 뒤 False를 돌려준다."""
+    remember_name(interaction.user)
     busy_user_id = play_lock.acquire(interaction.guild_id, interaction.user.id)
     if busy_user_id is None:
         return True
 
-    member = interaction.guild.get_member(busy_user_id)
-    name = member.display_name if member else f"<@{busy_user_id}>"
+    name = display_name(interaction.guild, busy_user_id)
     await interaction.response.send_message(
         f"{name}님이 놀고 있어요. 다 놀때까지 기다려주세요.",
         ephemeral=True,
@@ -120,29 +222,74 @@ def fmt(amount: int) -> str:
     return f"{amount:,}"
 
 
-def roll() -> int:
-    return random.randint(config.DICE_MIN, config.DICE_MAX)
+def remember_name(user: discord.abc.User) -> None:
+    """멤버 캐시가 없어도 이름을 보여줄 수 있게 최근에 본 이름을 남긴다."""
+    directory.names.put(user.id, user.display_name)
+
+
+def display_name(guild: Optional[discord.Guild], user_id: int) -> str:
+    member = guild.get_member(user_id) if guild else None
+    if member is not None:
+        return member.display_name
+    name = directory.names.get(user_id)
+    return name if name is not None else f"<@{user_id}>"
 
 
 def error_embed(message: str) -> discord.Embed:
     return discord.Embed(description=message, color=COLOR_ERROR)
 
 
-def elapsed_over_limit(started_at: float) -> bool:
-    return (time.monotonic() - started_at) > config.MODAL_TIME_LIMIT
+async def respond(interaction: discord.Interaction, **kwargs) -> None:
+    """첫 응답이면 send_message, 이미 응답했으면(미룬 경우 포함) followup 으로 보낸다."""
+    if interaction.response.is_done():
+        await interaction.followup.send(**kwargs)
+    else:
+        await interaction.response.send_message(**kwargs)
+
+
+# 저장소가 밀려 있으면 새 놀이를 받지 않거나 응답을 미리 미룬다.
+admission = AdmissionController(
+    store.lock_meter, config.ADMISSION_DEFER_MS, config.ADMISSION_REJECT_MS, config.ADMISSION_MAX_WAITING,
+    backlog=store.persist.expected_wait,
+)
+
+# 같은 사람이 같은 명령어를 연달아 보내면 저장소·디스코드 작업 전에 거절한다.
+throttle = Throttle({**config.THROTTLE_LIMITS, **parse_limits(config.THROTTLE_OVERRIDE)}, config.THROTTLE_DEFAULT)
+
+
+async def admit_game(interaction: discord.Interaction) -> bool:
+    """새 놀이를 받을 수 있으면 True. 과부하면 안내를 보내고 False."""
+    if admission.admit():
+        return True
+    await interaction.response.send_message(
+        embed=error_embed("지금은 정산이 밀려 있어 새 놀이를 받지 않습니다. 잠시 후 다시 시도해주세요."),
+        ephemeral=True,
+    )
+    return False
+
+
+def elapsed_over_limit(started_at: float, cfg: GameSettings) -> bool:
+    return (time.monotonic() - started_at) > cfg.MODAL_TIME_LIMIT
 
 
-async def reply_timeout(interaction: discord.Interaction) -> None:
+async def reply_timeout(interaction: discord.Interaction, cfg: GameSettings) -> None:
     await interaction.response.send_message(
         embed=error_embed(
-            f"입력 제한 시간 {config.MODAL_TIME_LIMIT}초를 넘겨 종료되었습니다. 토큰 변동은 없습니다."
+            f"입력 제한 시간 {cfg.MODAL_TIME_LIMIT}초를 넘겨 종료되었습니다. 토큰 변동은 없습니다."
         ),
         ephemeral=True,
     )
 
 
 class BaseModal(discord.ui.Modal):
-    """처리 중 오류가 나면 잠금을 풀고 사용자에게 알린다."""
+    """처리 중 오류가 나면 잠금을 풀고 사용자에게 알린다.
+
+    모달을 연 시점의 서버 설정(cfg)을 들고 있어, 제출 전에 설정이 바뀌어도 안내한 값 그대로 처리한다.
+    """
+
+    def __init__(self, cfg: GameSettings):
+        super().__init__()
+        self.cfg = cfg
 
     async def on_error(self, interaction: discord.Interaction, error: Exception) -> None:
         print(f"Modal error ({type(self).__name__}): {error}")
@@ -150,6 +297,10 @@ class BaseModal(discord.ui.Modal):
             play_lock.release(interaction.guild_id, interaction.user.id)
 
         message = "처리 중 오류가 발생했습니다. 토큰 변동은 없습니다."
+        if interaction.guild_id and store.was_settled(str(interaction.id)):
+            # 정산까지 끝난 뒤에 오류가 났다. 토큰은 이미 움직였으므로 그대로 알린다.
+            balance = store.get_balance(interaction.guild_id, interaction.user.id)
+            message = f"처리 중 오류가 발생했지만 정산은 반영되었습니다. 현재 보유 {fmt(balance)} 토큰입니다."
         try:
             if not interaction.response.is_done():
                 await interaction.response.send_message(embed=error_embed(message), ephemeral=True)
@@ -171,115 +322,231 @@ async def recommend_channel(interaction: discord.Interaction):
 # ============================================
 # 2. 토큰 지급
 # ============================================
-def human_members(guild: discord.Guild) -> List[int]:
-    return [m.id for m in guild.members if not m.bot]
+async def human_members(guild: discord.Guild, refresh: bool = False) -> List[int]:
+    """서버의 봇이 아닌 인원 ID 목록.
+
+    저메모리 모드에서는 멤버 캐시가 없으므로 인원 목록을 받아와 ID와 봇 여부만 남긴다.
+    한 번 받은 목록은 입장·퇴장 이벤트로 갱신하고, refresh가 참일 때만 다시 받는다.
+    """
+    if not config.LOW_MEMORY:
+        return [m.id for m in guild.members if not m.bot]
+
+    roster = directory.roster(guild.id)
+    if refresh or not len(roster):
+        members = await guild.chunk(cache=False)
+        roster.replace((m.id, m.bot) for m in members)
+    return roster.humans()
 
 
 async def ensure_account(guild_id: int, user_id: int) -> int:
     """계정이 없으면 만들고 현재 보유량을 돌려준다."""
     if not store.has_account(guild_id, user_id):
-        await store.grant_initial(guild_id, [user_id])
+        await store.grant_initial(guild_id, [user_id], settings.get(guild_id).INITIAL_TOKENS)
     return store.get_balance(guild_id, user_id)
 
 
 async def grant_initial_tokens(guild: discord.Guild) -> int:
-    granted = await store.grant_initial(guild.id, human_members(guild))
+    amount = settings.get(guild.id).INITIAL_TOKENS
+    members = await human_members(guild)
+    granted = await store.grant_initial(guild.id, members, amount)
     if granted:
-        print(f"[tokens] {guild.name}: {granted}명에게 최초 {config.INITIAL_TOKENS} 토큰을 지급했습니다.")
+        print(f"[tokens] {guild.name}: {granted}명에게 최초 {amount} 토큰을 지급했습니다.")
+    if config.LAZY_FLOOR:
+        # 꺼져 있던 동안의 입장·퇴장은 이벤트로 받지 못했으므로 여기서 한 번 맞춘다.
+        left, returned = await store.sync_members(guild.id, members)
+        if left or returned:
+            print(f"[tokens] {guild.name}: 떠난 인원 {left}명, 돌아온 인원 {returned}명을 반영했습니다.")
     return granted
 
 
-def today_kst() -> str:
-    return datetime.now(KST).date().isoformat()
+def reset_time_text(cfg: GameSettings) -> str:
+    """'매일 오전 7시' 같은 보정 시각 안내. 기본 시간대가 아니면 시간대도 붙인다."""
+    hour = cfg.DAILY_RESET_HOUR
+    text = f"매일 {'오전' if hour < 12 else '오후'} {hour if hour <= 12 else hour - 12}시"
+    if cfg.TIMEZONE != config.TIMEZONE:
+        text += f"({cfg.TIMEZONE})"
+    return text
 
 
-def topup_missed(guild_id: int) -> bool:
-    """오늘 보정 시각이 지났는데 아직 오늘 보정을 하지 않았는지 확인한다."""
-    now = datetime.now(KST)
-    if now.hour < config.DAILY_RESET_HOUR:
-        # 오늘 보정 시각이 아직 오지 않았다. 예정된 실행을 기다리면 된다.
-        return False
-    return store.get_last_topup(guild_id) != now.date().isoformat()
+# 서버별 다음 보정 시각
+topup_schedule = ResetScheduler(config.TOPUP_JITTER_WINDOW)
+# 보정 일정을 돌리는 작업 (on_ready에서 시작)
+topup_task: Optional[asyncio.Task] = None
 
+# 보정이 실패했을 때 다시 시도하기까지의 시간(초)
+TOPUP_RETRY_DELAY = 60
+# 일정 확인 간격의 상한(초). 설정이 바뀌었는지도 이 간격으로 본다.
+TOPUP_IDLE_CHECK = 60
 
-async def run_topup(guild: discord.Guild) -> None:
-    members = human_members(guild)
-    await store.grant_initial(guild.id, members)
-    changed = await store.daily_topup(guild.id, members, today_kst())
-    print(f"[tokens] {guild.name}: {changed}명의 보유량을 {config.DAILY_FLOOR}으로 맞췄습니다.")
 
+def schedule_topup(guild_id: int) -> None:
+    cfg = settings.get(guild_id)
+    topup_schedule.schedule(guild_id, cfg.TIMEZONE, cfg.DAILY_RESET_HOUR, store.get_last_topup(guild_id))
 
-@tasks.loop(time=dt_time(hour=config.DAILY_RESET_HOUR, tzinfo=KST))
-async def daily_topup():
-    """매일 지정 시각에 보유량이 기준선 미만인 인원을 기준선으로 맞춘다."""
+
+def schedule_all_topups() -> None:
     for guild in bot.guilds:
+        schedule_topup(guild.id)
+
+
+async def run_topup(guild: discord.Guild, day: str) -> None:
+    cfg = settings.get(guild.id)
+    if config.LAZY_FLOOR:
+        # 계정과 입장·퇴장은 이벤트로 맞춰 두므로 인원 목록을 받지 않고 회차만 올린다.
+        await store.daily_topup(guild.id, (), day, cfg.DAILY_FLOOR)
+        print(f"[tokens] {guild.name}: 기준선 {cfg.DAILY_FLOOR} 회차를 올렸습니다. ({day})")
+        return
+    members = await human_members(guild, refresh=True)
+    await store.grant_initial(guild.id, members, cfg.INITIAL_TOKENS)
+    changed = await store.daily_topup(guild.id, members, day, cfg.DAILY_FLOOR)
+    print(f"[tokens] {guild.name}: {changed}명의 보유량을 {cfg.DAILY_FLOOR}으로 맞췄습니다. ({day})")
+
+
+async def run_due_topups(label: str = "Daily topup") -> int:
+    """실행 시각이 지난 서버를 이른 순서로 하나씩 보정한다. 보정한 서버 수를 돌려준다."""
+    done = 0
+    for guild_id, day in topup_schedule.pop_due(time.time()):
+        guild = bot.get_guild(guild_id)
+        if guild is None:
+            topup_schedule.forget(guild_id)
+            continue
         try:
-            await run_topup(guild)
+            await run_topup(guild, day)
         except Exception as e:
-            print(f"Daily topup error ({guild.id}): {e}")
+            print(f"{label} error ({guild_id}): {e}")
+            topup_schedule.retry(guild_id, day, TOPUP_RETRY_DELAY, time.time())
+            continue
+        topup_schedule.finish(guild_id)
+        schedule_topup(guild_id)
+        done += 1
+    return done
+
+
+async def topup_loop() -> None:
+    """가장 이른 보정 시각까지 잠들었다가, 시각이 된 서버만 보정한다."""
+    version = settings.version
+    while True:
+        try:
+            if settings.version != version:
+                # 보정 시각·시간대가 바뀌었을 수 있다.
+                version = settings.version
+                schedule_all_topups()
+            await run_due_topups()
+        except Exception as e:
+            print(f"Daily topup error: {e}")
+        next_at = topup_schedule.peek()
+        delay = TOPUP_IDLE_CHECK if next_at is None else next_at - time.time()
+        await asyncio.sleep(min(max(delay, 0.0), TOPUP_IDLE_CHECK))
 
 
 async def catch_up_topup() -> None:
     """봇이 보정 시각에 꺼져 있었으면 시작 직후에 한 번 따라잡는다.
 
-    시간 지정 루프는 놓친 실행을 다시 하지 않으므로, 재시작 시점이 언제든
-    그날 보정이 한 번은 이뤄지도록 여기서 확인한다.
+    서버마다 다음 보정을 일정에 넣는다. 오늘 보정 시각이 지났는데 기록이 없는 서버는
+    실행 시각이 이미 지난 것으로 잡히므로, 여기서 바로 꺼내 보정한다.
     """
-    for guild in bot.guilds:
-        try:
-            if topup_missed(guild.id):
-                print(f"[tokens] {guild.name}: 오늘 보정 기록이 없어 지금 실행합니다.")
-                await run_topup(guild)
-        except Exception as e:
-            print(f"Catch-up topup error ({guild.id}): {e}")
+    schedule_all_topups()
+    caught_up = await run_due_topups("Catch-up topup")
+    if caught_up:
+        print(f"[tokens] 오늘 보정 기록이 없던 {caught_up}개 서버를 보정했습니다.")
+
+
+@tasks.loop(minutes=max(config.BACKUP_INTERVAL_MINUTES, 1))
+async def periodic_backup():
+    """DATA_DIR을 주기적으로 증분 백업한다. 정산과 디스크를 다투지 않도록 천천히 한다."""
+    # 첫 백업 때 불러온다. 시작 경로에서는 필요 없다.
+    from backup import BackupStore, Throttle
+
+    backups = BackupStore(config.DATA_DIR)
+    throttle = Throttle(config.BACKUP_IO_LIMIT, busy=store.busy)
+    try:
+        await asyncio.to_thread(backups.snapshot, throttle)
+    except Exception as e:
+        print(f"Backup error: {e}")
 
 
-@daily_topup.before_loop
-async def before_daily_topup():
-    await bot.wait_until_ready()
+@tasks.loop(seconds=max(config.CONFIG_POLL_SECONDS, 1))
+async def poll_settings():
+    """game_config.json 이 바뀌었으면 다시 읽는다. 진행 중인 판은 연 시점의 설정으로 끝난다."""
+    try:
+        await asyncio.to_thread(settings.reload)
+    except Exception as e:
+        print(f"Settings reload error: {e}")
 
 
 @bot.event
 async def on_member_join(member: discord.Member):
+    if config.LOW_MEMORY:
+        directory.roster(member.guild.id).add(member.id, member.bot)
     if member.bot:
         return
+    await store_ready.wait()
     try:
-        await store.grant_initial(member.guild.id, [member.id])
+        await store.grant_initial(member.guild.id, [member.id], settings.get(member.guild.id).INITIAL_TOKENS)
+        if config.LAZY_FLOOR:
+            await store.mark_present(member.guild.id, [member.id])
     except Exception as e:
         print(f"Member join grant error: {e}")
 
 
+@bot.event
+async def on_raw_member_remove(payload: discord.RawMemberRemoveEvent):
+    if config.LOW_MEMORY:
+        directory.roster(payload.guild_id).remove(payload.user.id)
+    if not config.LAZY_FLOOR or payload.user.bot:
+        return
+    # 늦춘 보정에서는 떠나 있는 동안 기준선을 받지 않게 표시해 둔다. (바로 보정은 그날 있는 인원만 올린다)
+    await store_ready.wait()
+    try:
+        await store.mark_away(payload.guild_id, [payload.user.id])
+    except Exception as e:
+        print(f"Member remove error: {e}")
+
+
+@bot.event
+async def on_guild_remove(guild: discord.Guild):
+    directory.forget_guild(guild.id)
+    topup_schedule.forget(guild.id)
+
+
 @bot.event
 async def on_guild_join(guild: discord.Guild):
+    await store_ready.wait()
     try:
         await grant_initial_tokens(guild)
     except Exception as e:
         print(f"Guild join grant error: {e}")
+    schedule_topup(guild.id)
 
 
 # ============================================
 # 3. 혼자놀기
 # ============================================
-GAME_ODD_EVEN = '1'
-GAME_NUMBER = '2'
-GAME_NAMES = {GAME_ODD_EVEN: "홀짝 맞추기", GAME_NUMBER: "숫자 맞추기"}
+# 같은 상호작용이 다시 들어왔을 때 같은 숫자가 나오게 하는 프로세스별 비밀값. 밖에서는 결과를 미리 알 수 없다.
+# 정산은 상호작용 ID로 한 번만 반영되므로, 숫자도 ID로 정해야 다시 보여줄 때 실제 결과와 맞는다.
+ROLL_SALT = os.urandom(16).hex()
+
+
+def replay_rng(key: str) -> random.Random:
+    """key(상호작용 ID 등)마다 늘 같은 순서로 숫자를 내는 난수."""
+    return random.Random(f"{ROLL_SALT}:{key}")
 
 
 class GameSelectModal(BaseModal, title="혼자놀기"):
     """진행할 게임을 고르는 첫 번째 단계."""
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, cfg: GameSettings):
+        super().__init__(cfg)
         self.started_at = time.monotonic()
 
-        self.add_item(discord.ui.TextDisplay(
-            f"**1** 홀짝 맞추기 — 1~{config.DICE_MAX} 중 뽑힌 숫자가 홀수인지 짝수인지 맞춥니다. "
-            f"정답 시 {fmt(config.ODD_EVEN_REWARD)} 토큰 지급.\n"
-            f"**2** 숫자 맞추기 — 1~{config.DICE_MAX} 중 뽑힌 숫자를 맞춥니다. "
-            f"정답 시 {fmt(config.NUMBER_REWARD)} 토큰 지급.\n\n"
-            f"오답 시 {fmt(config.SOLO_BET)} 토큰이 회수됩니다.\n"
-            f"## {config.MODAL_TIME_LIMIT}초 안에 입력을 완료하지 않으면 종료됩니다."
-        ))
+        self.add_item(discord.ui.TextDisplay(cfg.memo('solo_intro', lambda: (
+            f"**1** 홀짝 맞추기 — {cfg.DICE_MIN}~{cfg.DICE_MAX} 중 뽑힌 숫자가 홀수인지 짝수인지 맞춥니다. "
+            f"정답 시 {fmt(cfg.ODD_EVEN_REWARD)} 토큰 지급.\n"
+            f"**2** 숫자 맞추기 — {cfg.DICE_MIN}~{cfg.DICE_MAX} 중 뽑힌 숫자를 맞춥니다. "
+            f"정답 시 {fmt(cfg.NUMBER_REWARD)} 토큰 지급.\n\n"
+            f"오답 시 {fmt(cfg.SOLO_BET)} 토큰이 회수됩니다.\n"
+            f"## {cfg.MODAL_TIME_LIMIT}초 안에 입력을 완료하지 않으면 종료됩니다."
+        ))))
 
         self.choice = discord.ui.Select(
             placeholder="진행할 게임을 선택하세요",
@@ -288,12 +555,12 @@ class GameSelectModal(BaseModal, title="혼자놀기"):
                 discord.SelectOption(
                     label=GAME_NAMES[GAME_ODD_EVEN],
                     value=GAME_ODD_EVEN,
-                    description=f"정답 시 {fmt(config.ODD_EVEN_REWARD)} 토큰 지급",
+                    description=f"정답 시 {fmt(cfg.ODD_EVEN_REWARD)} 토큰 지급",
                 ),
                 discord.SelectOption(
                     label=GAME_NAMES[GAME_NUMBER],
                     value=GAME_NUMBER,
-                    description=f"정답 시 {fmt(config.NUMBER_REWARD)} 토큰 지급",
+                    description=f"정답 시 {fmt(cfg.NUMBER_REWARD)} 토큰 지급",
                 ),
             ],
         )
@@ -301,10 +568,11 @@ class GameSelectModal(BaseModal, title="혼자놀기"):
 
     async def on_submit(self, interaction: discord.Interaction):
         guild_id, user_id = interaction.guild_id, interaction.user.id
+        cfg = self.cfg
 
-        if elapsed_over_limit(self.started_at):
+        if elapsed_over_limit(self.started_at, cfg):
             play_lock.release(guild_id, user_id)
-            await reply_timeout(interaction)
+            await reply_timeout(interaction, cfg)
             return
 
         value = self.choice.values[0] if self.choice.values else ''
@@ -317,13 +585,13 @@ class GameSelectModal(BaseModal, title="혼자놀기"):
             return
 
         play_lock.refresh(guild_id, user_id)
-        view = SoloStartView(user_id, value)
+        view = SoloStartView(user_id, value, cfg)
         await interaction.response.send_message(
             embed=discord.Embed(
                 title=GAME_NAMES[value],
                 description=(
                     "아래 버튼을 누르면 입력창이 열립니다.\n"
-                    f"입력창이 열린 뒤 {config.MODAL_TIME_LIMIT}초 안에 답을 제출해야 합니다."
+                    f"입력창이 열린 뒤 {cfg.MODAL_TIME_LIMIT}초 안에 답을 제출해야 합니다."
                 ),
                 color=COLOR_NEUTRAL,
             ),
@@ -336,10 +604,11 @@ class GameSelectModal(BaseModal, title="혼자놀기"):
 class SoloStartView(discord.ui.View):
     """모달 제출에 대한 응답으로는 모달을 띄울 수 없어 중간에 두는 버튼."""
 
-    def __init__(self, user_id: int, game: str):
-        super().__init__(timeout=config.BUTTON_TIME_LIMIT)
+    def __init__(self, user_id: int, game: str, cfg: GameSettings):
+        super().__init__(timeout=cfg.BUTTON_TIME_LIMIT)
         self.user_id = user_id
         self.game = game
+        self.cfg = cfg
         self.interaction: Optional[discord.Interaction] = None
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
@@ -351,7 +620,7 @@ class SoloStartView(discord.ui.View):
     @discord.ui.button(label="게임 시작", style=discord.ButtonStyle.primary)
     async def start(self, interaction: discord.Interaction, button: discord.ui.Button):
         play_lock.refresh(interaction.guild_id, self.user_id)
-        modal = OddEvenModal() if self.game == GAME_ODD_EVEN else NumberModal()
+        modal = OddEvenModal(self.cfg) if self.game == GAME_ODD_EVEN else NumberModal(self.cfg)
         await interaction.response.send_modal(modal)
         self.stop()
         await self.clear_prompt()
@@ -387,19 +656,41 @@ async def finish_solo_game(
     answer_text: str,
     correct: bool,
     number: int,
+    cfg: GameSettings,
+    quick: bool = False,
 ) -> None:
-    """정산하고 결과를 본인에게 보여준 뒤 채널에 게시한다."""
+    """정산하고 결과를 본인에게 보여준 뒤 채널에 게시한다.
+
+    quick이면 (명령어 옵션으로 바로 진행한 경우) 본인용 결과 없이 채널 게시 한 번으로 응답한다.
+    """
     guild_id, user = interaction.guild_id, interaction.user
 
+    await admission.defer_if_slow(interaction, ephemeral=not quick)
     await ensure_account(guild_id, user.id)
 
-    reward = config.ODD_EVEN_REWARD if game == GAME_ODD_EVEN else config.NUMBER_REWARD
-    delta = reward if correct else -config.SOLO_BET
-    balance = await store.adjust(guild_id, user.id, delta)
+    delta = solo_delta(game, correct, cfg)
+    stat = STAT_ODD_EVEN if game == GAME_ODD_EVEN else STAT_NUMBER
+    balance = await store.adjust(
+        guild_id, user.id, delta, reason=REASON_SOLO, game=stat, idempotency_key=str(interaction.id)
+    )
 
     play_lock.release(guild_id, user.id)
 
     verdict = "정답!" if correct else "오답!"
+    public_embed = discord.Embed(
+        description=(
+            f"{user.display_name}님이 {GAME_NAMES[game]}을(를) 진행했습니다.\n"
+            f"뽑힌 숫자 **{number}** / 입력 **{answer_text}**\n"
+            f"결과 **{verdict}**\n"
+            f"남은 토큰 **{fmt(balance)}**"
+        ),
+        color=COLOR_WIN if correct else COLOR_LOSE,
+    )
+    if quick:
+        public_embed.set_footer(text=f"토큰 {'+' if delta > 0 else ''}{fmt(delta)}")
+        await respond(interaction, embed=public_embed)
+        return
+
     result_embed = discord.Embed(
         title=GAME_NAMES[game],
         description=f"# {number}\n# {verdict}",
@@ -413,17 +704,8 @@ async def finish_solo_game(
     )
     result_embed.add_field(name="보유 토큰", value=fmt(balance), inline=True)
 
-    await interaction.response.send_message(embed=result_embed, ephemeral=True)
+    await respond(interaction, embed=result_embed, ephemeral=True)
 
-    public_embed = discord.Embed(
-        description=(
-            f"{user.display_name}님이 {GAME_NAMES[game]}을(를) 진행했습니다.\n"
-            f"뽑힌 숫자 **{number}** / 입력 **{answer_text}**\n"
-            f"결과 **{verdict}**\n"
-            f"남은 토큰 **{fmt(balance)}**"
-        ),
-        color=COLOR_WIN if correct else COLOR_LOSE,
-    )
     try:
         await interaction.followup.send(embed=public_embed)
     except discord.HTTPException as e:
@@ -431,31 +713,36 @@ async def finish_solo_game(
 
 
 class OddEvenModal(BaseModal, title="홀짝 맞추기"):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, cfg: GameSettings):
+        super().__init__(cfg)
         self.started_at = time.monotonic()
 
-        self.add_item(discord.ui.TextDisplay(
+        self.add_item(discord.ui.TextDisplay(cfg.memo('odd_even_intro', lambda: (
             f"# 홀짝 맞추기\n"
-            f"1~{config.DICE_MAX} 중 하나가 무작위로 뽑힙니다. 그 숫자가 홀수인지 짝수인지 맞추세요.\n"
-            f"정답 시 {fmt(config.ODD_EVEN_REWARD)} 토큰 지급, 오답 시 {fmt(config.SOLO_BET)} 토큰 회수.\n"
-            f"## {config.MODAL_TIME_LIMIT}초 안에 제출하지 않으면 종료됩니다."
-        ))
+            f"{cfg.DICE_MIN}~{cfg.DICE_MAX} 중 하나가 무작위로 뽑힙니다. 그 숫자가 홀수인지 짝수인지 맞추세요.\n"
+            f"정답 시 {fmt(cfg.ODD_EVEN_REWARD)} 토큰 지급, 오답 시 {fmt(cfg.SOLO_BET)} 토큰 회수.\n"
+            f"## {cfg.MODAL_TIME_LIMIT}초 안에 제출하지 않으면 종료됩니다."
+        ))))
 
+        numbers = range(cfg.DICE_MIN, cfg.DICE_MAX + 1)
         self.answer = discord.ui.Select(
             placeholder="짝 또는 홀을 선택하세요",
             required=True,
             options=[
-                discord.SelectOption(label="짝", value="짝", description="2, 4, 6, 8, 10"),
-                discord.SelectOption(label="홀", value="홀", description="1, 3, 5, 7, 9"),
+                discord.SelectOption(
+                    label="짝", value="짝", description=", ".join(str(n) for n in numbers if n % 2 == 0)
+                ),
+                discord.SelectOption(
+                    label="홀", value="홀", description=", ".join(str(n) for n in numbers if n % 2)
+                ),
             ],
         )
         self.add_item(discord.ui.Label(text="정답 선택", component=self.answer))
 
     async def on_submit(self, interaction: discord.Interaction):
-        if elapsed_over_limit(self.started_at):
+        if elapsed_over_limit(self.started_at, self.cfg):
             play_lock.release(interaction.guild_id, interaction.user.id)
-            await reply_timeout(interaction)
+            await reply_timeout(interaction, self.cfg)
             return
 
         chosen = self.answer.values[0] if self.answer.values else ''
@@ -467,37 +754,38 @@ class OddEvenModal(BaseModal, title="홀짝 맞추기"):
             )
             return
 
-        number = roll()
-        actual = "짝" if number % 2 == 0 else "홀"
-        await finish_solo_game(interaction, GAME_ODD_EVEN, chosen, chosen == actual, number)
+        number = roll(self.cfg, replay_rng(str(interaction.id)))
+        await finish_solo_game(
+            interaction, GAME_ODD_EVEN, chosen, solo_correct(GAME_ODD_EVEN, chosen, number), number, self.cfg
+        )
 
 
 class NumberModal(BaseModal, title="숫자 맞추기"):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, cfg: GameSettings):
+        super().__init__(cfg)
         self.started_at = time.monotonic()
 
-        self.add_item(discord.ui.TextDisplay(
+        self.add_item(discord.ui.TextDisplay(cfg.memo('number_intro', lambda: (
             f"# 숫자 맞추기\n"
-            f"1~{config.DICE_MAX} 중 하나가 무작위로 뽑힙니다. 그 숫자를 맞추세요.\n"
-            f"정답 시 {fmt(config.NUMBER_REWARD)} 토큰 지급, 오답 시 {fmt(config.SOLO_BET)} 토큰 회수.\n"
-            f"## {config.MODAL_TIME_LIMIT}초 안에 제출하지 않으면 종료됩니다."
-        ))
+            f"{cfg.DICE_MIN}~{cfg.DICE_MAX} 중 하나가 무작위로 뽑힙니다. 그 숫자를 맞추세요.\n"
+            f"정답 시 {fmt(cfg.NUMBER_REWARD)} 토큰 지급, 오답 시 {fmt(cfg.SOLO_BET)} 토큰 회수.\n"
+            f"## {cfg.MODAL_TIME_LIMIT}초 안에 제출하지 않으면 종료됩니다."
+        ))))
 
         self.answer = discord.ui.Select(
             placeholder="숫자를 선택하세요",
             required=True,
             options=[
                 discord.SelectOption(label=str(n), value=str(n))
-                for n in range(config.DICE_MIN, config.DICE_MAX + 1)
+                for n in range(cfg.DICE_MIN, cfg.DICE_MAX + 1)
             ],
         )
         self.add_item(discord.ui.Label(text="정답 선택", component=self.answer))
 
     async def on_submit(self, interaction: discord.Interaction):
-        if elapsed_over_limit(self.started_at):
+        if elapsed_over_limit(self.started_at, self.cfg):
             play_lock.release(interaction.guild_id, interaction.user.id)
-            await reply_timeout(interaction)
+            await reply_timeout(interaction, self.cfg)
             return
 
         chosen = self.answer.values[0] if self.answer.values else ''
@@ -509,47 +797,152 @@ class NumberModal(BaseModal, title="숫자 맞추기"):
             )
             return
 
-        number = roll()
-        await finish_solo_game(interaction, GAME_NUMBER, chosen, int(chosen) == number, number)
+        number = roll(self.cfg, replay_rng(str(interaction.id)))
+        await finish_solo_game(interaction, GAME_NUMBER, chosen, int(chosen) == number, number, self.cfg)
+
+
+def solo_rounds(
+    game: str, guess: str, rounds: int, cfg: GameSettings, key: str
+) -> Tuple[List[int], List[int]]:
+    """rounds 판의 숫자를 한 번에 뽑아 채점한다. 모든 판에 같은 답을 낸다. (뽑힌 숫자, 판별 증감)
+
+    숫자는 key(상호작용 ID)로 정해지므로, 같은 상호작용이 다시 들어와도 정산된 결과와 같은 숫자가 나온다.
+    """
+    import numpy as np
+
+    numbers = rolls(cfg, rounds, np.random.default_rng(replay_rng(key).getrandbits(128)))
+    return numbers.tolist(), solo_delta(game, solo_correct(game, guess, numbers), cfg).tolist()
+
+
+async def finish_solo_rounds(
+    interaction: discord.Interaction, game: str, guess: str, rounds: int, cfg: GameSettings
+) -> None:
+    """여러 판을 한 번에 정산하고 요약을 채널에 한 번 게시한다."""
+    guild_id, user = interaction.guild_id, interaction.user
+    await admission.defer_if_slow(interaction)
+    await ensure_account(guild_id, user.id)
+    numbers, deltas = solo_rounds(game, guess, rounds, cfg, str(interaction.id))
+    stat = STAT_ODD_EVEN if game == GAME_ODD_EVEN else STAT_NUMBER
+    played, balance, net = await store.play_rounds(
+        guild_id, user.id, deltas, cfg.SOLO_BET,
+        reason=REASON_SOLO, game=stat, idempotency_key=str(interaction.id),
+    )
+    play_lock.release(guild_id, user.id)
+
+    wins = sum(1 for delta in deltas[:played] if delta > 0)
+    shown = " ".join(str(n) for n in numbers[:played])
+    if len(shown) > 300:
+        shown = shown[:300].rsplit(" ", 1)[0] + " …"
+    lines = [
+        f"{user.display_name}님이 {GAME_NAMES[game]}을(를) {fmt(played)}판 진행했습니다. (답 **{guess}**)",
+        f"뽑힌 숫자 {shown}",
+        f"결과 **{fmt(wins)}승 {fmt(played - wins)}패** / 토큰 **{'+' if net > 0 else ''}{fmt(net)}**",
+        f"남은 토큰 **{fmt(balance)}**",
+    ]
+    if played < rounds:
+        lines.append(f"보유 토큰이 {fmt(cfg.SOLO_BET)} 미만이 되어 {fmt(rounds - played)}판은 진행하지 않았습니다.")
+    await respond(
+        interaction,
+        embed=discord.Embed(description="\n".join(lines), color=COLOR_WIN if net > 0 else COLOR_LOSE),
+    )
+
+
+def solo_answers(game: str, cfg: GameSettings) -> List[str]:
+    """게임별로 고를 수 있는 답."""
+    if game == GAME_ODD_EVEN:
+        return ["짝", "홀"]
+    return [str(n) for n in range(cfg.DICE_MIN, cfg.DICE_MAX + 1)]
 
 
 @bot.tree.command(name="혼자놀기", description="토큰을 걸고 혼자 하는 게임을 진행합니다.")
 @app_commands.guild_only()
-async def solo_play(interaction: discord.Interaction):
+@app_commands.rename(game="게임", guess="답", rounds="판수")
+@app_commands.describe(
+    game="바로 진행할 게임 (비우면 입력창에서 고릅니다)",
+    guess="홀짝 맞추기는 짝/홀, 숫자 맞추기는 숫자",
+    rounds=f"같은 답으로 연달아 진행할 판 수 (1~{config.SOLO_MAX_ROUNDS}, 게임과 답이 필요합니다)",
+)
+@app_commands.choices(game=[
+    app_commands.Choice(name=GAME_NAMES[GAME_ODD_EVEN], value=GAME_ODD_EVEN),
+    app_commands.Choice(name=GAME_NAMES[GAME_NUMBER], value=GAME_NUMBER),
+])
+async def solo_play(
+    interaction: discord.Interaction,
+    game: Optional[app_commands.Choice[str]] = None,
+    guess: Optional[str] = None,
+    rounds: app_commands.Range[int, 1, config.SOLO_MAX_ROUNDS] = 1,
+):
+    if not await admit_game(interaction):
+        return
+    cfg = settings.get(interaction.guild_id)
     balance = await ensure_account(interaction.guild_id, interaction.user.id)
-    if balance < config.SOLO_BET:
+    if balance < cfg.SOLO_BET:
         await interaction.response.send_message(
             embed=error_embed(
-                f"보유 토큰이 {fmt(config.SOLO_BET)} 미만이라 진행할 수 없습니다. "
+                f"보유 토큰이 {fmt(cfg.SOLO_BET)} 미만이라 진행할 수 없습니다. "
                 f"현재 보유 {fmt(balance)} 토큰입니다.\n"
-                f"매일 오전 {config.DAILY_RESET_HOUR}시에 {fmt(config.DAILY_FLOOR)} 토큰으로 보정됩니다."
+                f"{reset_time_text(cfg)}에 {fmt(cfg.DAILY_FLOOR)} 토큰으로 보정됩니다."
             ),
             ephemeral=True,
         )
         return
 
+    if game is None or guess is None:
+        if rounds > 1:
+            await interaction.response.send_message(
+                embed=error_embed("여러 판을 진행하려면 게임과 답을 함께 골라주세요. 토큰 변동은 없습니다."),
+                ephemeral=True,
+            )
+            return
+        if not await try_acquire(interaction):
+            return
+        await interaction.response.send_modal(GameSelectModal(cfg))
+        return
+
+    # 게임과 답을 옵션으로 받았으면 입력창 없이 이 상호작용 안에서 정산까지 끝낸다.
+    guess = guess.strip()
+    if guess not in solo_answers(game.value, cfg):
+        await interaction.response.send_message(
+            embed=error_embed(
+                f"{GAME_NAMES[game.value]}의 답은 {', '.join(solo_answers(game.value, cfg))} 중 하나입니다. "
+                "토큰 변동은 없습니다."
+            ),
+            ephemeral=True,
+        )
+        return
     if not await try_acquire(interaction):
         return
-    await interaction.response.send_modal(GameSelectModal())
+    if rounds > 1:
+        try:
+            await finish_solo_rounds(interaction, game.value, guess, rounds, cfg)
+        finally:
+            play_lock.release(interaction.guild_id, interaction.user.id)
+        return
+    number = roll(cfg, replay_rng(str(interaction.id)))
+    try:
+        await finish_solo_game(
+            interaction, game.value, guess, solo_correct(game.value, guess, number), number, cfg, quick=True
+        )
+    finally:
+        play_lock.release(interaction.guild_id, interaction.user.id)
+
+
+@solo_play.autocomplete('guess')
+async def solo_guess_autocomplete(
+    interaction: discord.Interaction, current: str
+) -> List[app_commands.Choice[str]]:
+    cfg = settings.get(interaction.guild_id)
+    game = getattr(interaction.namespace, '게임', None)
+    games = [game] if game in GAME_NAMES else list(GAME_NAMES)
+    answers = [answer for g in games for answer in solo_answers(g, cfg) if answer.startswith(current.strip())]
+    return [app_commands.Choice(name=answer, value=answer) for answer in answers[:config.SELECT_MAX_OPTIONS]]
 
 
 # ============================================
 # 4. 같이놀기
 # ============================================
-def bet_options(max_bet: int) -> List[int]:
-    """걸 수 있는 금액 선택지. 사다리 값 중 한도 이하인 것들과 한도 자체를 합친다."""
-    amounts = {a for a in config.DUO_BET_LADDER if a <= max_bet}
-    if max_bet >= config.DUO_MIN_BET:
-        amounts.add(max_bet)
-    ordered = sorted(amounts)
-    if len(ordered) > config.SELECT_MAX_OPTIONS:
-        # 넘칠 일은 없지만, 넘치면 가장 큰 값(한도)은 반드시 남긴다.
-        ordered = ordered[: config.SELECT_MAX_OPTIONS - 1] + [ordered[-1]]
-    return ordered
-
-
 def duo_invite_embed(
-    challenger: discord.Member, target: discord.Member, amount: int
+    challenger: discord.Member, target: discord.Member, amount: int, cfg: GameSettings
 ) -> discord.Embed:
     embed = discord.Embed(
         title="같이놀기 신청",
@@ -562,23 +955,64 @@ def duo_invite_embed(
     )
     embed.set_footer(
         text=f"{target.display_name}님만 응답할 수 있습니다 · "
-             f"{config.INVITE_TIME_LIMIT}초 내 무응답 시 자동 거절"
+             f"{cfg.INVITE_TIME_LIMIT}초 내 무응답 시 자동 거절"
+    )
+    return embed
+
+
+async def play_duel(
+    guild_id: int, challenger: discord.Member, target: discord.Member, amount: int, key: str
+) -> discord.Embed:
+    """숫자를 뽑아 승패를 정하고 정산한 뒤 결과 임베드를 돌려준다.
+
+    key는 이 대결의 중복 정산 방지 키다. 같은 key로 다시 불리면 숫자도 정산도 처음과 같다.
+    """
+    my_roll, their_roll = duel_rolls(settings.get(guild_id), replay_rng(key))
+    if my_roll > their_roll:
+        winner, loser = challenger, target
+    else:
+        winner, loser = target, challenger
+
+    winner_balance, loser_balance = await store.transfer(
+        guild_id, winner.id, loser.id, amount, idempotency_key=key
+    )
+
+    balances = {winner.id: winner_balance, loser.id: loser_balance}
+    embed = discord.Embed(
+        title="같이놀기 결과",
+        description=(
+            f"# {challenger.display_name} : {my_roll}\n"
+            f"# {target.display_name} : {their_roll}\n"
+            f"# {winner.display_name} 승리!"
+        ),
+        color=COLOR_WIN,
+    )
+    embed.add_field(name="걸린 토큰", value=f"**{fmt(amount)}**", inline=True)
+    embed.add_field(
+        name=f"{challenger.display_name} 보유 토큰",
+        value=fmt(balances[challenger.id]),
+        inline=True,
+    )
+    embed.add_field(
+        name=f"{target.display_name} 보유 토큰",
+        value=fmt(balances[target.id]),
+        inline=True,
     )
     return embed
 
 
 class DuoSetupModal(BaseModal, title="같이놀기"):
-    def __init__(self, max_bet: int):
-        super().__init__()
+    def __init__(self, max_bet: int, cfg: GameSettings):
+        super().__init__(cfg)
         self.started_at = time.monotonic()
         self.max_bet_hint = max_bet
 
-        self.add_item(discord.ui.TextDisplay(
-            f"상대와 각각 1~{config.DICE_MAX} 중 하나를 뽑아 더 높은 쪽이 이깁니다.\n"
+        self.add_item(discord.ui.TextDisplay(cfg.memo('duo_intro', lambda: (
+            f"상대와 각각 {cfg.DICE_MIN}~{cfg.DICE_MAX} 중 하나를 뽑아 더 높은 쪽이 이깁니다.\n"
             f"이긴 쪽은 건 토큰만큼 얻고, 진 쪽은 그만큼 잃습니다.\n"
             f"상대의 보유량이 내 보유량보다 적으면, 적은 쪽에 맞춰 다시 선택해야 합니다.\n"
-            f"## {config.MODAL_TIME_LIMIT}초 안에 제출하지 않으면 종료됩니다."
-        ))
+            f"## {cfg.MODAL_TIME_LIMIT}초 안에 제출하지 않으면 종료됩니다."
+        ))))
 
         self.opponent = discord.ui.UserSelect(
             placeholder="같이 놀 상대를 선택하세요",
@@ -593,7 +1027,7 @@ class DuoSetupModal(BaseModal, title="같이놀기"):
             required=True,
             options=[
                 discord.SelectOption(label=f"{fmt(amount)} 토큰", value=str(amount))
-                for amount in bet_options(max_bet)
+                for amount in bet_options(max_bet, cfg)
             ],
         )
         self.add_item(discord.ui.Label(
@@ -604,10 +1038,11 @@ class DuoSetupModal(BaseModal, title="같이놀기"):
 
     async def on_submit(self, interaction: discord.Interaction):
         guild_id, user = interaction.guild_id, interaction.user
+        cfg = self.cfg
 
-        if elapsed_over_limit(self.started_at):
+        if elapsed_over_limit(self.started_at, cfg):
             play_lock.release(guild_id, user.id)
-            await reply_timeout(interaction)
+            await reply_timeout(interaction, cfg)
             return
 
         selected = self.opponent.values
@@ -625,13 +1060,13 @@ class DuoSetupModal(BaseModal, title="같이놀기"):
 
         my_balance = await ensure_account(guild_id, user.id)
         their_balance = await ensure_account(guild_id, target.id)
-        max_bet = min(my_balance, their_balance) // config.DUO_UNIT * config.DUO_UNIT
+        max_bet = bet_limit(min(my_balance, their_balance), cfg)
 
-        if max_bet < config.DUO_MIN_BET:
+        if max_bet < cfg.DUO_MIN_BET:
             short = "상대" if their_balance < my_balance else "내"
             await self.reject(
                 interaction,
-                f"{short} 보유 토큰이 {fmt(config.DUO_MIN_BET)} 미만이라 진행할 수 없습니다. "
+                f"{short} 보유 토큰이 {fmt(cfg.DUO_MIN_BET)} 미만이라 진행할 수 없습니다. "
                 f"(내 보유 {fmt(my_balance)} / 상대 보유 {fmt(their_balance)})",
             )
             return
@@ -655,10 +1090,10 @@ class DuoSetupModal(BaseModal, title="같이놀기"):
 
         play_lock.refresh(guild_id, user.id)
 
-        view = DuoInviteView(challenger=user, target=target, amount=amount)
+        view = DuoInviteView(challenger=user, target=target, amount=amount, cfg=cfg)
         await interaction.response.send_message(
             content=f"{target.mention} 대결 신청이 도착했습니다.",
-            embed=duo_invite_embed(user, target, amount),
+            embed=duo_invite_embed(user, target, amount, cfg),
             view=view,
         )
         view.message = await interaction.original_response()
@@ -667,17 +1102,20 @@ class DuoSetupModal(BaseModal, title="같이놀기"):
         self, interaction: discord.Interaction, message: str, max_bet: Optional[int] = None
     ) -> None:
         """검증에 실패했을 때 사유와 다시 선택 버튼을 보여준다."""
-        view = DuoRetryView(interaction.user.id, max_bet if max_bet is not None else self.max_bet_hint)
+        view = DuoRetryView(
+            interaction.user.id, max_bet if max_bet is not None else self.max_bet_hint, self.cfg
+        )
         await interaction.response.send_message(embed=error_embed(message), view=view, ephemeral=True)
         view.interaction = interaction
         play_lock.refresh(interaction.guild_id, interaction.user.id)
 
 
 class DuoRetryView(discord.ui.View):
-    def __init__(self, user_id: int, max_bet: int):
-        super().__init__(timeout=config.BUTTON_TIME_LIMIT)
+    def __init__(self, user_id: int, max_bet: int, cfg: GameSettings):
+        super().__init__(timeout=cfg.BUTTON_TIME_LIMIT)
         self.user_id = user_id
         self.max_bet = max_bet
+        self.cfg = cfg
         self.interaction: Optional[discord.Interaction] = None
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
@@ -689,7 +1127,7 @@ class DuoRetryView(discord.ui.View):
     @discord.ui.button(label="다시 선택", style=discord.ButtonStyle.secondary)
     async def retry(self, interaction: discord.Interaction, button: discord.ui.Button):
         play_lock.refresh(interaction.guild_id, self.user_id)
-        await interaction.response.send_modal(DuoSetupModal(self.max_bet))
+        await interaction.response.send_modal(DuoSetupModal(self.max_bet, self.cfg))
         self.stop()
         if self.interaction is None:
             return
@@ -715,8 +1153,11 @@ class DuoRetryView(discord.ui.View):
 
 
 class DuoInviteView(discord.ui.View):
-    def __init__(self, challenger: discord.Member, target: discord.Member, amount: int):
-        super().__init__(timeout=config.INVITE_TIME_LIMIT)
+    def __init__(
+        self, challenger: discord.Member, target: discord.Member, amount: int, cfg: GameSettings
+    ):
+        super().__init__(timeout=cfg.INVITE_TIME_LIMIT)
+        self.cfg = cfg
         self.challenger = challenger
         self.target = target
         self.amount = amount
@@ -743,54 +1184,20 @@ class DuoInviteView(discord.ui.View):
         self.stop()
 
         guild_id = interaction.guild_id
-        my_balance = store.get_balance(guild_id, self.challenger.id)
-        their_balance = store.get_balance(guild_id, self.target.id)
-
-        if min(my_balance, their_balance) < self.amount:
-            self.release(guild_id)
-            await interaction.response.edit_message(
-                embed=error_embed("보유 토큰이 부족해져 대결이 취소되었습니다. 토큰 변동은 없습니다."),
-                view=None,
+        deferred = await admission.defer_if_slow(interaction)
+        try:
+            # 두 사람의 보유량 확인과 정산은 저장소 안에서 한 번에 이뤄진다.
+            # 연타로 수락이 두 번 들어와도 신청 메시지가 같으므로 한 번만 정산된다.
+            embed = await play_duel(
+                guild_id, self.challenger, self.target, self.amount, str(interaction.message.id)
             )
-            return
-
-        # 무승부가 나오지 않도록 서로 다른 숫자가 나올 때까지 다시 뽑는다.
-        my_roll, their_roll = roll(), roll()
-        while my_roll == their_roll:
-            my_roll, their_roll = roll(), roll()
-
-        if my_roll > their_roll:
-            winner, loser = self.challenger, self.target
-        else:
-            winner, loser = self.target, self.challenger
-
-        winner_balance, loser_balance = await store.transfer(
-            guild_id, winner.id, loser.id, self.amount
-        )
+        except SettlementError:
+            embed = error_embed("보유 토큰이 부족해져 대결이 취소되었습니다. 토큰 변동은 없습니다.")
         self.release(guild_id)
-
-        balances = {winner.id: winner_balance, loser.id: loser_balance}
-        embed = discord.Embed(
-            title="같이놀기 결과",
-            description=(
-                f"# {self.challenger.display_name} : {my_roll}\n"
-                f"# {self.target.display_name} : {their_roll}\n"
-                f"# {winner.display_name} 승리!"
-            ),
-            color=COLOR_WIN,
-        )
-        embed.add_field(name="걸린 토큰", value=f"**{fmt(self.amount)}**", inline=True)
-        embed.add_field(
-            name=f"{self.challenger.display_name} 보유 토큰",
-            value=fmt(balances[self.challenger.id]),
-            inline=True,
-        )
-        embed.add_field(
-            name=f"{self.target.display_name} 보유 토큰",
-            value=fmt(balances[self.target.id]),
-            inline=True,
-        )
-        await interaction.response.edit_message(embed=embed, view=None)
+        if deferred:
+            await interaction.edit_original_response(embed=embed, view=None)
+        else:
+            await interaction.response.edit_message(embed=embed, view=None)
 
     @discord.ui.button(label="거절", style=discord.ButtonStyle.secondary)
     async def decline(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -817,7 +1224,7 @@ class DuoInviteView(discord.ui.View):
                 embed=discord.Embed(
                     title="같이놀기 종료",
                     description=(
-                        f"{config.INVITE_TIME_LIMIT}초 안에 응답이 없어 자동으로 거절되었습니다. "
+                        f"{self.cfg.INVITE_TIME_LIMIT}초 안에 응답이 없어 자동으로 거절되었습니다. "
                         "토큰 변동은 없습니다."
                     ),
                     color=COLOR_LOSE,
@@ -831,13 +1238,16 @@ class DuoInviteView(discord.ui.View):
 @bot.tree.command(name="같이놀기", description="다른 인원과 토큰을 걸고 대결합니다.")
 @app_commands.guild_only()
 async def duo_play(interaction: discord.Interaction):
+    if not await admit_game(interaction):
+        return
+    cfg = settings.get(interaction.guild_id)
     balance = await ensure_account(interaction.guild_id, interaction.user.id)
-    if balance < config.DUO_MIN_BET:
+    if balance < cfg.DUO_MIN_BET:
         await interaction.response.send_message(
             embed=error_embed(
-                f"보유 토큰이 {fmt(config.DUO_MIN_BET)} 미만이라 진행할 수 없습니다. "
+                f"보유 토큰이 {fmt(cfg.DUO_MIN_BET)} 미만이라 진행할 수 없습니다. "
                 f"현재 보유 {fmt(balance)} 토큰입니다.\n"
-                f"매일 오전 {config.DAILY_RESET_HOUR}시에 {fmt(config.DAILY_FLOOR)} 토큰으로 보정됩니다."
+                f"{reset_time_text(cfg)}에 {fmt(cfg.DAILY_FLOOR)} 토큰으로 보정됩니다."
             ),
             ephemeral=True,
         )
@@ -845,151 +1255,457 @@ async def duo_play(interaction: discord.Interaction):
 
     if not await try_acquire(interaction):
         return
-    max_bet = balance // config.DUO_UNIT * config.DUO_UNIT
-    await interaction.response.send_modal(DuoSetupModal(max_bet))
+    max_bet = bet_limit(balance, cfg)
+    await interaction.response.send_modal(DuoSetupModal(max_bet, cfg))
 
 
 # ============================================
-# 5. 토큰선물
+# 4-1. 같이놀기 자동 매칭
 # ============================================
-def gift_received(amount: int) -> int:
-    """선물한 금액 중 실제로 상대에게 들어가는 양."""
-    return int(amount * config.GIFT_RATIO)
+class MatchEntry:
+    __slots__ = ('member', 'amount', 'view')
 
+    def __init__(self, member: discord.Member, amount: int, view: 'MatchWaitView'):
+        self.member = member
+        self.amount = amount
+        self.view = view
 
-class GiftModal(BaseModal, title="토큰선물"):
-    def __init__(self):
-        super().__init__()
 
-        self.add_item(discord.ui.TextDisplay(
-            f"보유한 토큰을 다른 인원에게 보냅니다.\n"
-            f"보내는 쪽은 선택한 금액이 그대로 차감되고, "
-            f"받는 쪽에는 그 중 {int(config.GIFT_RATIO * 100)}%가 들어갑니다.\n"
-            f"예를 들어 {fmt(config.GIFT_MIN)} 토큰을 보내면 "
-            f"상대는 {fmt(gift_received(config.GIFT_MIN))} 토큰을 받습니다."
-        ))
+class MatchQueue:
+    """서버별·베팅 구간별 매칭 대기열.
 
-        self.target = discord.ui.UserSelect(
-            placeholder="선물할 인원을 선택하세요",
-            min_values=1,
-            max_values=1,
-            required=True,
-        )
-        self.add_item(discord.ui.Label(text="받는 사람", component=self.target))
+    대기열 조작은 모두 이벤트 루프 안에서 await 없이 끝나므로 별도 잠금이 필요 없다.
+    짝이 지어진 두 사람의 정산만 저장소를 거치고, 서로 다른 짝은 동시에 진행된다.
+    """
 
-        self.amount = discord.ui.Select(
-            placeholder="보낼 토큰을 선택하세요",
-            required=True,
-            options=[
-                discord.SelectOption(
-                    label=f"{fmt(value)} 토큰",
-                    value=str(value),
-                    description=f"상대는 {fmt(gift_received(value))} 토큰을 받습니다",
-                )
-                for value in range(config.GIFT_MIN, config.GIFT_MAX + 1, config.GIFT_STEP)
-            ],
-        )
-        self.add_item(discord.ui.Label(text="보낼 토큰", component=self.amount))
+    def __init__(self):
+        # guild_id -> 구간 -> {user_id: MatchEntry} (넣은 순서가 대기 순서)
+        self._waiting: Dict[int, Dict[int, Dict[int, MatchEntry]]] = {}
+
+    def is_waiting(self, guild_id: int, user_id: int) -> bool:
+        return any(user_id in entries for entries in self._waiting.get(guild_id, {}).values())
+
+    def add(self, guild_id: int, entry: MatchEntry) -> None:
+        buckets = self._waiting.setdefault(guild_id, {})
+        ladder = settings.get(guild_id).DUO_BET_LADDER
+        buckets.setdefault(bet_bucket(entry.amount, ladder), {})[entry.member.id] = entry
+
+    def remove(self, guild_id: int, user_id: int) -> Optional[MatchEntry]:
+        buckets = self._waiting.get(guild_id, {})
+        for bucket, entries in buckets.items():
+            entry = entries.pop(user_id, None)
+            if entry is not None:
+                self._prune(guild_id, bucket)
+                return entry
+        return None
 
-    async def on_submit(self, interaction: discord.Interaction):
-        guild_id, user = interaction.guild_id, interaction.user
+    def pop_partner(self, guild_id: int, amount: int) -> Optional[MatchEntry]:
+        """같은 구간에서 가장 오래 기다린 인원을 꺼낸다."""
+        bucket = bet_bucket(amount, settings.get(guild_id).DUO_BET_LADDER)
+        entries = self._waiting.get(guild_id, {}).get(bucket)
+        if not entries:
+            return None
+        entry = entries.pop(next(iter(entries)))
+        self._prune(guild_id, bucket)
+        return entry
 
-        selected = self.target.values
-        target = selected[0] if selected else None
+    def _prune(self, guild_id: int, bucket: int) -> None:
+        buckets = self._waiting.get(guild_id, {})
+        if not buckets.get(bucket, True):
+            del buckets[bucket]
+        if not buckets:
+            self._waiting.pop(guild_id, None)
 
-        if target is None:
-            await interaction.response.send_message(
-                embed=error_embed("받는 사람을 선택해주세요."), ephemeral=True
-            )
-            return
-        if target.id == user.id:
-            await interaction.response.send_message(
-                embed=error_embed("자기 자신에게는 선물할 수 없습니다."), ephemeral=True
-            )
-            return
-        if getattr(target, 'bot', False):
-            await interaction.response.send_message(
-                embed=error_embed("봇에게는 선물할 수 없습니다."), ephemeral=True
-            )
-            return
+    def waiting_count(self) -> int:
+        return sum(len(e) for b in self._waiting.values() for e in b.values())
 
-        chosen = self.amount.values[0] if self.amount.values else ''
-        if not chosen.isdigit():
-            await interaction.response.send_message(
-                embed=error_embed("보낼 토큰을 선택해주세요."), ephemeral=True
-            )
-            return
 
-        amount = int(chosen)
-        if not (config.GIFT_MIN <= amount <= config.GIFT_MAX):
-            await interaction.response.send_message(
-                embed=error_embed(
-                    f"{fmt(config.GIFT_MIN)} ~ {fmt(config.GIFT_MAX)} 토큰만 선물할 수 있습니다."
-                ),
-                ephemeral=True,
-            )
-            return
+match_queue = MatchQueue()
 
-        my_balance = await ensure_account(guild_id, user.id)
-        await ensure_account(guild_id, target.id)
 
-        if my_balance < amount:
-            await interaction.response.send_message(
-                embed=error_embed(
-                    f"보유 토큰이 부족합니다. 현재 보유 {fmt(my_balance)} 토큰입니다."
-                ),
-                ephemeral=True,
+class MatchWaitView(discord.ui.View):
+    """매칭을 기다리는 동안 본인에게만 보이는 안내와 취소 버튼."""
+
+    def __init__(self, guild_id: int, user_id: int, cfg: GameSettings):
+        super().__init__(timeout=cfg.MATCH_QUEUE_TIMEOUT)
+        self.cfg = cfg
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.interaction: Optional[discord.Interaction] = None
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message("본인만 사용할 수 있습니다.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="대기 취소", style=discord.ButtonStyle.secondary)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.stop()
+        if match_queue.remove(self.guild_id, self.user_id) is None:
+            # 버튼을 누르는 사이에 이미 짝이 지어졌다.
+            await interaction.response.defer()
+            return
+        await interaction.response.edit_message(
+            embed=discord.Embed(description="매칭 대기를 취소했습니다. 토큰 변동은 없습니다.", color=COLOR_LOSE),
+            view=None,
+        )
+
+    async def finish(self, embed: discord.Embed) -> None:
+        """짝이 지어졌거나 대기열에서 빠졌을 때 안내 메시지를 바꾼다."""
+        self.stop()
+        if self.interaction is None:
+            return
+        try:
+            await self.interaction.edit_original_response(embed=embed, view=None)
+        except discord.HTTPException:
+            pass
+
+    async def on_timeout(self):
+        if match_queue.remove(self.guild_id, self.user_id) is None:
+            return
+        await self.finish(error_embed(
+            f"{self.cfg.MATCH_QUEUE_TIMEOUT}초 동안 상대가 나타나지 않아 종료되었습니다. 토큰 변동은 없습니다."
+        ))
+
+
+class MatchModal(BaseModal, title="대결매칭"):
+    def __init__(self, max_bet: int, cfg: GameSettings):
+        super().__init__(cfg)
+        self.started_at = time.monotonic()
+
+        self.add_item(discord.ui.TextDisplay(cfg.memo('match_intro', lambda: (
+            f"걸 토큰을 고르면 비슷한 금액을 건 인원과 자동으로 대결합니다.\n"
+            f"두 사람 중 적게 건 금액(과 적게 가진 보유량)에 맞춰 정산됩니다.\n"
+            f"{cfg.MATCH_QUEUE_TIMEOUT}초 동안 상대가 없으면 자동으로 종료됩니다.\n"
+            f"## {cfg.MODAL_TIME_LIMIT}초 안에 제출하지 않으면 종료됩니다."
+        ))))
+
+        self.bet = discord.ui.Select(
+            placeholder="걸 토큰을 선택하세요",
+            required=True,
+            options=[
+                discord.SelectOption(label=f"{fmt(amount)} 토큰", value=str(amount))
+                for amount in bet_options(max_bet, cfg)
+            ],
+        )
+        self.add_item(discord.ui.Label(
+            text="걸 토큰",
+            description=f"현재 보유량 기준 최대 {fmt(max_bet)} 토큰까지 걸 수 있습니다.",
+            component=self.bet,
+        ))
+
+    async def on_submit(self, interaction: discord.Interaction):
+        guild_id, user = interaction.guild_id, interaction.user
+        cfg = self.cfg
+
+        if elapsed_over_limit(self.started_at, cfg):
+            await reply_timeout(interaction, cfg)
+            return
+
+        chosen = self.bet.values[0] if self.bet.values else ''
+        if not chosen.isdigit():
+            await interaction.response.send_message(
+                embed=error_embed("걸 토큰을 선택해주세요. 토큰 변동은 없습니다."), ephemeral=True
+            )
+            return
+
+        my_balance = await ensure_account(guild_id, user.id)
+        amount = min(int(chosen), bet_limit(my_balance, cfg))
+        if amount < cfg.DUO_MIN_BET:
+            await interaction.response.send_message(
+                embed=error_embed(
+                    f"보유 토큰이 {fmt(cfg.DUO_MIN_BET)} 미만이라 진행할 수 없습니다. "
+                    f"현재 보유 {fmt(my_balance)} 토큰입니다."
+                ),
+                ephemeral=True,
+            )
+            return
+        if match_queue.is_waiting(guild_id, user.id):
+            await interaction.response.send_message(
+                embed=error_embed("이미 매칭을 기다리는 중입니다."), ephemeral=True
             )
             return
 
-        received = gift_received(amount)
-        sender_balance, receiver_balance = await store.gift(
-            guild_id, user.id, target.id, amount, received
+        # 여기서부터 대기열에 넣거나 짝을 꺼낼 때까지 await 없이 진행해야 한다.
+        partner, stake = None, 0
+        while partner is None:
+            candidate = match_queue.pop_partner(guild_id, amount)
+            if candidate is None:
+                break
+            their_balance = store.get_balance(guild_id, candidate.member.id)
+            stake = bet_limit(min(amount, candidate.amount, their_balance), cfg)
+            if stake >= cfg.DUO_MIN_BET:
+                partner = candidate
+            else:
+                asyncio.create_task(candidate.view.finish(error_embed(
+                    "보유 토큰이 부족해져 매칭 대기가 취소되었습니다. 토큰 변동은 없습니다."
+                )))
+
+        if partner is None:
+            view = MatchWaitView(guild_id, user.id, cfg)
+            match_queue.add(guild_id, MatchEntry(user, amount, view))
+            await interaction.response.send_message(
+                embed=discord.Embed(
+                    title="매칭 대기 중",
+                    description=(
+                        f"## 걸린 토큰 {fmt(amount)}\n"
+                        f"비슷한 금액을 건 상대가 나타나면 바로 대결합니다."
+                    ),
+                    color=COLOR_NEUTRAL,
+                ),
+                view=view,
+                ephemeral=True,
+            )
+            view.interaction = interaction
+            return
+
+        deferred = await admission.defer_if_slow(interaction)
+        try:
+            embed = await play_duel(guild_id, partner.member, user, stake, str(interaction.id))
+        except SettlementError:
+            # 확인한 뒤 정산하기 전 사이에 누군가의 보유량이 줄었다. 두 사람 모두 대기에서 빠진다.
+            message = "보유 토큰이 부족해져 대결이 취소되었습니다. 토큰 변동은 없습니다."
+            if deferred:
+                # 공개로 미룬 "생각 중" 메시지는 첫 followup이 그대로 고쳐 쓰므로 ephemeral이 무시된다.
+                # 그 메시지를 지우고 본인에게만 따로 보낸다.
+                await interaction.delete_original_response()
+            await respond(interaction, embed=error_embed(message), ephemeral=True)
+            await partner.view.finish(error_embed(message))
+            return
+
+        await respond(
+            interaction,
+            content=f"{partner.member.mention} {user.mention} 매칭되었습니다.",
+            embed=embed,
         )
+        await partner.view.finish(discord.Embed(
+            description=f"{user.display_name}님과 매칭되어 대결을 마쳤습니다.", color=COLOR_NEUTRAL
+        ))
+
+
+@bot.tree.command(name="대결매칭", description="비슷한 금액을 건 인원과 자동으로 대결합니다.")
+@app_commands.guild_only()
+async def duo_match(interaction: discord.Interaction):
+    if not await admit_game(interaction):
+        return
+    cfg = settings.get(interaction.guild_id)
+    balance = await ensure_account(interaction.guild_id, interaction.user.id)
+    if balance < cfg.DUO_MIN_BET:
+        await interaction.response.send_message(
+            embed=error_embed(
+                f"보유 토큰이 {fmt(cfg.DUO_MIN_BET)} 미만이라 진행할 수 없습니다. "
+                f"현재 보유 {fmt(balance)} 토큰입니다.\n"
+                f"{reset_time_text(cfg)}에 {fmt(cfg.DAILY_FLOOR)} 토큰으로 보정됩니다."
+            ),
+            ephemeral=True,
+        )
+        return
+
+    if match_queue.is_waiting(interaction.guild_id, interaction.user.id):
+        await interaction.response.send_message(
+            embed=error_embed("이미 매칭을 기다리는 중입니다."), ephemeral=True
+        )
+        return
 
+    max_bet = bet_limit(balance, cfg)
+    await interaction.response.send_modal(MatchModal(max_bet, cfg))
+
+
+# ============================================
+# 5. 토큰선물
+# ============================================
+class GiftModal(BaseModal, title="토큰선물"):
+    def __init__(self, cfg: GameSettings):
+        super().__init__(cfg)
+
+        self.add_item(discord.ui.TextDisplay(cfg.memo('gift_intro', lambda: (
+            f"보유한 토큰을 다른 인원에게 보냅니다. 한 번에 최대 {cfg.GIFT_MAX_RECIPIENTS}명까지 고를 수 있습니다.\n"
+            f"보내는 쪽은 선택한 금액이 받는 사람 수만큼 그대로 차감되고, "
+            f"받는 쪽에는 그 중 {int(cfg.GIFT_RATIO * 100)}%가 들어갑니다.\n"
+            f"예를 들어 {fmt(cfg.GIFT_MIN)} 토큰을 보내면 "
+            f"상대는 {fmt(gift_received(cfg.GIFT_MIN, cfg))} 토큰을 받습니다."
+        ))))
+
+        self.target = discord.ui.UserSelect(
+            placeholder="선물할 인원을 선택하세요",
+            min_values=1,
+            max_values=cfg.GIFT_MAX_RECIPIENTS,
+            required=True,
+        )
+        self.add_item(discord.ui.Label(text="받는 사람", component=self.target))
+
+        self.amount = discord.ui.Select(
+            placeholder="한 명당 보낼 토큰을 선택하세요",
+            required=True,
+            options=list(cfg.memo('gift_options', lambda: [
+                discord.SelectOption(
+                    label=f"{fmt(value)} 토큰",
+                    value=str(value),
+                    description=f"한 명당 {fmt(gift_received(value, cfg))} 토큰을 받습니다",
+                )
+                for value in gift_amounts(cfg)
+            ])),
+        )
+        self.add_item(discord.ui.Label(text="한 명당 보낼 토큰", component=self.amount))
+
+    async def on_submit(self, interaction: discord.Interaction):
+        guild_id, user = interaction.guild_id, interaction.user
+        cfg = self.cfg
+
+        # 같은 사람이 두 번 들어오지 않게 하고, 고른 순서는 유지한다.
+        targets = list({t.id: t for t in self.target.values}.values())
+
+        if not targets:
+            await interaction.response.send_message(
+                embed=error_embed("받는 사람을 선택해주세요."), ephemeral=True
+            )
+            return
+        if len(targets) > cfg.GIFT_MAX_RECIPIENTS:
+            await interaction.response.send_message(
+                embed=error_embed(f"한 번에 {cfg.GIFT_MAX_RECIPIENTS}명까지만 선물할 수 있습니다."),
+                ephemeral=True,
+            )
+            return
+        if any(t.id == user.id for t in targets):
+            await interaction.response.send_message(
+                embed=error_embed("자기 자신에게는 선물할 수 없습니다."), ephemeral=True
+            )
+            return
+        if any(getattr(t, 'bot', False) for t in targets):
+            await interaction.response.send_message(
+                embed=error_embed("봇에게는 선물할 수 없습니다."), ephemeral=True
+            )
+            return
+
+        chosen = self.amount.values[0] if self.amount.values else ''
+        if not chosen.isdigit():
+            await interaction.response.send_message(
+                embed=error_embed("보낼 토큰을 선택해주세요."), ephemeral=True
+            )
+            return
+
+        amount = int(chosen)
+        if not (cfg.GIFT_MIN <= amount <= cfg.GIFT_MAX):
+            await interaction.response.send_message(
+                embed=error_embed(
+                    f"{fmt(cfg.GIFT_MIN)} ~ {fmt(cfg.GIFT_MAX)} 토큰만 선물할 수 있습니다."
+                ),
+                ephemeral=True,
+            )
+            return
+
+        # 금액 범위는 보내는 사람 기준이다. 여러 명에게 보내도 합계가 GIFT_MAX 를 넘을 수 없다.
+        total = amount * len(targets)
+        if total > cfg.GIFT_MAX:
+            await interaction.response.send_message(
+                embed=error_embed(
+                    f"한 번에 보낼 수 있는 토큰은 합계 {fmt(cfg.GIFT_MAX)} 토큰까지입니다. "
+                    f"({len(targets)}명 × {fmt(amount)} = {fmt(total)} 토큰)"
+                ),
+                ephemeral=True,
+            )
+            return
+
+        for target in targets:
+            remember_name(target)
+        # 보내는 사람과 받는 사람 중 계정이 없는 인원을 한 번에 만든다.
+        await store.grant_initial(guild_id, [user.id] + [t.id for t in targets], cfg.INITIAL_TOKENS)
+        my_balance = store.get_balance(guild_id, user.id)
+
+        if my_balance < total:
+            await interaction.response.send_message(
+                embed=error_embed(
+                    f"보유 토큰이 부족합니다. {len(targets)}명에게 {fmt(amount)} 토큰씩 보내려면 "
+                    f"{fmt(total)} 토큰이 필요하고, 현재 보유 {fmt(my_balance)} 토큰입니다."
+                ),
+                ephemeral=True,
+            )
+            return
+
+        received = gift_received(amount, cfg)
+        try:
+            sender_balance, receiver_balances = await store.gift_many(
+                guild_id,
+                user.id,
+                [(target.id, amount, received) for target in targets],
+                idempotency_key=str(interaction.id),
+            )
+        except SettlementError as e:
+            await interaction.response.send_message(
+                embed=error_embed(f"보유 토큰이 부족합니다. 현재 보유 {fmt(e.balance)} 토큰입니다."),
+                ephemeral=True,
+            )
+            return
+
+        if len(targets) == 1:
+            arrow = f"{user.mention} → {targets[0].mention}"
+        else:
+            arrow = f"{user.mention} → {len(targets)}명"
         embed = discord.Embed(
             title="토큰 선물",
-            description=(
-                f"## {fmt(received)} 토큰\n"
-                f"{user.mention} → {target.mention}"
-            ),
+            description=f"## {fmt(received)} 토큰\n{arrow}",
             color=COLOR_WIN,
         )
-        embed.add_field(name="보낸 토큰", value=fmt(amount), inline=True)
-        embed.add_field(name="받은 토큰", value=fmt(received), inline=True)
+        embed.add_field(name="보낸 토큰", value=fmt(total), inline=True)
+        embed.add_field(name="받은 토큰", value=f"{fmt(received)} × {len(targets)}명", inline=True)
         embed.add_field(
             name=f"{user.display_name} 보유 토큰", value=fmt(sender_balance), inline=False
         )
         embed.add_field(
-            name=f"{target.display_name} 보유 토큰", value=fmt(receiver_balance), inline=False
+            name="받은 사람 보유 토큰",
+            value="\n".join(
+                f"{target.display_name} / {fmt(receiver_balances[target.id])}" for target in targets
+            ),
+            inline=False,
         )
 
-        await interaction.response.send_message(content=target.mention, embed=embed)
+        await interaction.response.send_message(
+            content=" ".join(target.mention for target in targets), embed=embed
+        )
 
 
 @bot.tree.command(name="토큰선물", description="보유한 토큰을 다른 인원에게 선물합니다.")
 @app_commands.guild_only()
 async def gift_tokens(interaction: discord.Interaction):
+    cfg = settings.get(interaction.guild_id)
     balance = await ensure_account(interaction.guild_id, interaction.user.id)
-    if balance < config.GIFT_MIN:
+    if balance < cfg.GIFT_MIN:
         await interaction.response.send_message(
             embed=error_embed(
-                f"보유 토큰이 {fmt(config.GIFT_MIN)} 미만이라 선물할 수 없습니다. "
+                f"보유 토큰이 {fmt(cfg.GIFT_MIN)} 미만이라 선물할 수 없습니다. "
                 f"현재 보유 {fmt(balance)} 토큰입니다."
             ),
             ephemeral=True,
         )
         return
 
-    await interaction.response.send_modal(GiftModal())
+    await interaction.response.send_modal(GiftModal(cfg))
 
 
 # ============================================
 # 6. 토큰보유
 # ============================================
+async def resolve_names(guild: discord.Guild, user_ids: List[int]) -> None:
+    """이름을 모르는 인원만 골라 한 번에 조회해 이름 캐시에 넣는다."""
+    missing = [
+        user_id for user_id in user_ids
+        if guild.get_member(user_id) is None and directory.names.get(user_id) is None
+    ]
+    if not missing:
+        return
+    try:
+        members = await guild.query_members(user_ids=missing, cache=False)
+    except (discord.HTTPException, asyncio.TimeoutError) as e:
+        print(f"Name lookup error ({guild.id}): {e}")
+        return
+    for member in members:
+        remember_name(member)
+
+
 class BalanceModal(BaseModal, title="토큰보유"):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, cfg: GameSettings):
+        super().__init__(cfg)
 
         self.add_item(discord.ui.TextDisplay(
             "선택한 인원의 보유 토큰량을 확인합니다.\n"
@@ -1018,11 +1734,14 @@ class BalanceModal(BaseModal, title="토큰보유"):
         is_bot = getattr(target, 'bot', False)
         if not is_bot:
             await ensure_account(guild_id, target.id)
+        remember_name(target)
+
+        ranking = store.top(guild_id, 5)
+        await resolve_names(interaction.guild, [user_id for user_id, _ in ranking])
 
         lines = []
-        for rank, (user_id, amount) in enumerate(store.top(guild_id, 5), start=1):
-            member = interaction.guild.get_member(user_id)
-            name = member.display_name if member else f"<@{user_id}>"
+        for rank, (user_id, amount) in enumerate(ranking, start=1):
+            name = display_name(interaction.guild, user_id)
             lines.append(f"{rank}등 : {name} / 토큰 보유량 {fmt(amount)}")
 
         embed = discord.Embed(title="토큰 보유 현황", color=COLOR_NEUTRAL)
@@ -1047,63 +1766,511 @@ class BalanceModal(BaseModal, title="토큰보유"):
 @bot.tree.command(name="토큰보유", description="선택한 인원의 보유 토큰량을 확인합니다.")
 @app_commands.guild_only()
 async def check_balance(interaction: discord.Interaction):
-    await interaction.response.send_modal(BalanceModal())
+    await interaction.response.send_modal(BalanceModal(settings.get(interaction.guild_id)))
+
+
+@bot.tree.command(name="토큰내역", description="내 토큰이 언제, 왜 바뀌었는지 최근 기록을 확인합니다.")
+@app_commands.guild_only()
+async def token_history(interaction: discord.Interaction):
+    guild_id, user = interaction.guild_id, interaction.user
+    if store.ledger.indexed:
+        entries = store.history(guild_id, user.id, config.LEDGER_HISTORY_LIMIT)
+        send = interaction.response.send_message
+    else:
+        # 시작 후 첫 조회라 색인을 만든다. 기록이 많으면 오래 걸릴 수 있어 응답을 미뤄 둔다.
+        await interaction.response.defer(ephemeral=True)
+        entries = await asyncio.to_thread(store.history, guild_id, user.id, config.LEDGER_HISTORY_LIMIT)
+        send = interaction.followup.send
+
+    lines = []
+    for entry in entries:
+        when = datetime.fromtimestamp(entry.timestamp_ms / 1000, KST).strftime('%m-%d %H:%M')
+        sign = '+' if entry.delta > 0 else ''
+        line = f"`{when}` {REASON_NAMES.get(entry.reason, '기타')} **{sign}{fmt(entry.delta)}**"
+        if entry.counterparty:
+            line += f" · {display_name(interaction.guild, entry.counterparty)}"
+        lines.append(line)
+
+    embed = discord.Embed(
+        title=f"{user.display_name}님의 토큰 내역",
+        description="\n".join(lines) if lines else "기록이 없습니다.",
+        color=COLOR_NEUTRAL,
+    )
+    embed.add_field(name="보유 토큰", value=fmt(store.get_balance(guild_id, user.id)), inline=False)
+    await send(embed=embed, ephemeral=True)
+
+
+def streak_text(streak: int) -> str:
+    if streak > 0:
+        return f"{streak}연승 중"
+    if streak < 0:
+        return f"{-streak}연패 중"
+    return "-"
+
+
+@bot.tree.command(name="전적", description="놀이별 승률과 연승 기록을 확인합니다.")
+@app_commands.guild_only()
+@app_commands.rename(target="대상")
+@app_commands.describe(target="확인할 인원 (비우면 나)")
+async def game_stats(interaction: discord.Interaction, target: Optional[discord.Member] = None):
+    target = target or interaction.user
+    records = store.stats.get(interaction.guild_id, target.id)
+
+    embed = discord.Embed(title=f"{target.display_name}님의 전적", color=COLOR_NEUTRAL)
+    for record in sorted(records, key=lambda r: r.game):
+        embed.add_field(
+            name=STAT_NAMES.get(record.game, "기타"),
+            value=(
+                f"{fmt(record.plays)}판 {fmt(record.wins)}승 · 승률 {win_rate(record):.0%}\n"
+                f"얻은 토큰 {fmt(record.won)} / 잃은 토큰 {fmt(record.lost)}\n"
+                f"{streak_text(record.streak)} · 최고 {record.best}연승"
+            ),
+            inline=False,
+        )
+    if not records:
+        embed.description = "기록이 없습니다."
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 # ============================================
-# 이벤트
+# 7. 토너먼트
 # ============================================
-def command_signature() -> str:
-    """등록된 명령어 목록의 지문. 내용이 바뀌면 값이 달라진다."""
-    items = []
-    for cmd in bot.tree.walk_commands():
-        params = ",".join(f"{p.name}:{p.type}" for p in getattr(cmd, 'parameters', []))
-        items.append(f"{cmd.name}|{getattr(cmd, 'description', '')}|{params}")
-    return hashlib.sha256("\n".join(sorted(items)).encode('utf-8')).hexdigest()
-
+# guild_id -> 모집 중이거나 진행 중인 대회. 서버당 하나만 연다.
+tournaments: Dict[int, Tournament] = {}
+# 라운드를 진행 중인 작업. 이벤트 루프는 작업을 약하게만 참조하므로 끝날 때까지 여기서 들고 있는다.
+tournament_tasks: Set[asyncio.Task] = set()
+
+
+def round_name(match_count: int) -> str:
+    if match_count == 1:
+        return "결승"
+    if match_count == 2:
+        return "준결승"
+    return f"{match_count * 2}강"
+
+
+def tournament_embed(guild: Optional[discord.Guild], t: Tournament) -> discord.Embed:
+    """모집·진행·결과를 한 메시지에서 보여주기 위한 임베드."""
+    if t.state == STATE_REGISTERING:
+        names = ", ".join(display_name(guild, user_id) for user_id in t.players[:30])
+        if len(t.players) > 30:
+            names += f" 외 {len(t.players) - 30}명"
+        embed = discord.Embed(
+            title="토너먼트 참가 모집",
+            description=(
+                f"## 참가비 {fmt(t.entry_fee)} 토큰\n"
+                f"참가 {len(t.players)} / {config.TOURNAMENT_MAX_PLAYERS}명 · "
+                f"상금 {fmt(t.pot)} 토큰\n\n"
+                f"{names}"
+            ),
+            color=COLOR_NEUTRAL,
+        )
+        embed.set_footer(
+            text=f"{display_name(guild, t.host_id)}님이 시작할 수 있습니다 · "
+                 f"{settings.get(t.guild_id).TOURNAMENT_MIN_PLAYERS}명 이상 필요"
+        )
+        return embed
 
-def signature_path() -> str:
-    return os.path.join(config.DATA_DIR, 'commands.sig')
+    played = [r for r in t.rounds if r and r[0][4] is not None]
+    if t.state == STATE_FINISHED:
+        title = "토너먼트 결과"
+    else:
+        title = f"토너먼트 진행 중 · {round_name(len(t.rounds[-1]))}"
+
+    lines = []
+    if played:
+        last = played[-1]
+        lines.append(f"**{round_name(len(last))}**")
+        for first, second, first_roll, second_roll, winner in last:
+            if second is None:
+                lines.append(f"{display_name(guild, first)} 부전승")
+            else:
+                lines.append(
+                    f"{display_name(guild, first)} {first_roll} : {second_roll} "
+                    f"{display_name(guild, second)} → **{display_name(guild, winner)}**"
+                )
+    embed = discord.Embed(
+        title=title,
+        description="\n".join(lines)[:4000],
+        color=COLOR_WIN if t.state == STATE_FINISHED else COLOR_NEUTRAL,
+    )
+    embed.add_field(name="참가", value=f"{len(t.players)}명", inline=True)
+    embed.add_field(name="상금", value=fmt(t.pot), inline=True)
+    if t.state == STATE_FINISHED:
+        embed.add_field(
+            name="상금 지급",
+            value="\n".join(
+                f"{display_name(guild, user_id)} +{fmt(amount)}" for user_id, amount in t.payouts()
+            ),
+            inline=False,
+        )
+    return embed
 
 
-def read_saved_signature() -> str:
+async def edit_tournament_message(t: Tournament, embed: Optional[discord.Embed] = None) -> None:
+    """진행 메시지를 고친다. 응답 토큰 만료와 상관없이 고칠 수 있게 채널 메시지로 다룬다."""
+    channel = bot.get_channel(t.channel_id) if t.channel_id else None
+    if channel is None or t.message_id is None:
+        return
     try:
-        with open(signature_path(), 'r', encoding='utf-8') as f:
-            return f.read().strip()
-    except OSError:
-        return ''
+        await channel.get_partial_message(t.message_id).edit(
+            embed=embed or tournament_embed(getattr(channel, 'guild', None), t), view=None
+        )
+    except discord.HTTPException as e:
+        print(f"Tournament message edit error ({t.guild_id}): {e}")
 
 
-def save_signature(signature: str) -> None:
-    try:
-        os.makedirs(config.DATA_DIR, exist_ok=True)
-        with open(signature_path(), 'w', encoding='utf-8') as f:
-            f.write(signature)
-    except OSError as e:
-        print(f'Signature save error: {e}')
+async def collect_entry_fees(t: Tournament) -> List[int]:
+    """참가비를 한 번의 정산으로 걷고 대진을 짠다. 참가비가 모자란 인원은 빼고 다시 시도한다.
+
+    정산이 확정되면 커밋 직전에 대진과 커밋 번호를 진행 상태로 남긴다. 그래서 참가비를 걷은 뒤
+    봇이 꺼져도 재시작하면 대회를 이어서 끝낸다. 빠진 인원 목록을 돌려준다.
+    """
+    async def started(seq: int) -> None:
+        t.start()
+        t.fee_seq = seq
+        try:
+            await asyncio.to_thread(save_checkpoint, t)
+        except Exception:
+            # 남기지 못했으면 참가비도 걷지 않는다.
+            t.state, t.rounds, t.fee_seq = STATE_REGISTERING, [], None
+            raise
+
+    dropped = []
+    min_players = settings.get(t.guild_id).TOURNAMENT_MIN_PLAYERS
+    while len(t.players) >= min_players:
+        try:
+            await store.settle(
+                t.guild_id,
+                [(user_id, -t.entry_fee) for user_id in t.players],
+                preconditions={user_id: t.entry_fee for user_id in t.players},
+                reason=REASON_TOURNAMENT_FEE,
+                idempotency_key=f"tournament:{t.message_id}:fee",
+                before_commit=started,
+            )
+            return dropped
+        except SettlementError as e:
+            t.players.remove(e.user_id)
+            dropped.append(e.user_id)
+    return dropped
 
 
-async def sync_commands_if_changed() -> None:
-    """명령어가 바뀌었을 때만 동기화한다.
+async def run_tournament(t: Tournament) -> None:
+    """남은 라운드를 모두 치르고 상금을 지급한다. 재시작 후 이어서 진행할 때도 쓴다.
 
-    글로벌 동기화는 디스코드에서 강하게 제한하는 요청이라, 재배포마다 호출하면
-    IP 단위로 차단(Cloudflare 1015)될 수 있다.
+    상금도 커밋 직전에 커밋 번호를 남겨서, 지급 직후 꺼져도 재시작 때 두 번 주지 않는다.
     """
-    signature = command_signature()
-    if not config.FORCE_SYNC and signature == read_saved_signature():
-        print(f'Commands unchanged, skipping sync ({len(bot.tree.get_commands())} commands)')
+    async def paying(seq: int) -> None:
+        t.prize_seq = seq
+        await asyncio.to_thread(save_checkpoint, t)
+
+    cfg = settings.get(t.guild_id)
+    while t.state == STATE_RUNNING:
+        t.resolve_round(lambda: duel_rolls(cfg))
+        await asyncio.to_thread(save_checkpoint, t)
+        await edit_tournament_message(t)
+        if t.state == STATE_RUNNING:
+            await asyncio.sleep(cfg.TOURNAMENT_ROUND_DELAY)
+
+    await store.settle(
+        t.guild_id,
+        t.payouts(),
+        reason=REASON_TOURNAMENT_PRIZE,
+        idempotency_key=f"tournament:{t.message_id}:prize",
+        before_commit=paying,
+    )
+    await asyncio.to_thread(remove_checkpoint, t.guild_id)
+    tournaments.pop(t.guild_id, None)
+    await edit_tournament_message(t)
+
+
+def start_tournament(t: Tournament) -> None:
+    """run_tournament를 별도 작업으로 띄운다. 버튼 응답이나 시작 경로가 라운드 내내 기다리지 않게 한다."""
+    task = asyncio.create_task(run_tournament(t), name=f"tournament-{t.guild_id}")
+    tournament_tasks.add(task)
+    task.add_done_callback(_tournament_done)
+
+
+def _tournament_done(task: asyncio.Task) -> None:
+    tournament_tasks.discard(task)
+    if task.cancelled():
         return
+    error = task.exception()
+    if error is not None:
+        # 체크포인트는 남아 있으므로 재시작하면 이어서 진행한다.
+        print(f"Tournament error ({task.get_name()}): {type(error).__name__}: {error}")
+
+
+class TournamentJoinView(discord.ui.View):
+    def __init__(self, t: Tournament, cfg: GameSettings):
+        super().__init__(timeout=cfg.TOURNAMENT_JOIN_TIME)
+        self.t = t
+        self.cfg = cfg
+
+    @discord.ui.button(label="참가", style=discord.ButtonStyle.success)
+    async def join(self, interaction: discord.Interaction, button: discord.ui.Button):
+        balance = await ensure_account(interaction.guild_id, interaction.user.id)
+        if balance < self.t.entry_fee:
+            await interaction.response.send_message(
+                embed=error_embed(
+                    f"참가비 {fmt(self.t.entry_fee)} 토큰보다 보유량이 적습니다. "
+                    f"현재 보유 {fmt(balance)} 토큰입니다."
+                ),
+                ephemeral=True,
+            )
+            return
+        if not self.t.register(interaction.user.id):
+            await interaction.response.send_message(
+                "이미 참가했거나 인원이 가득 찼습니다.", ephemeral=True
+            )
+            return
+        remember_name(interaction.user)
+        await interaction.response.edit_message(embed=tournament_embed(interaction.guild, self.t))
+
+    @discord.ui.button(label="참가 취소", style=discord.ButtonStyle.secondary)
+    async def leave(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user.id == self.t.host_id or not self.t.withdraw(interaction.user.id):
+            await interaction.response.send_message("취소할 참가 신청이 없습니다.", ephemeral=True)
+            return
+        await interaction.response.edit_message(embed=tournament_embed(interaction.guild, self.t))
+
+    @discord.ui.button(label="시작", style=discord.ButtonStyle.primary)
+    async def start(self, interaction: discord.Interaction, button: discord.ui.Button):
+        t = self.t
+        min_players = settings.get(t.guild_id).TOURNAMENT_MIN_PLAYERS
+        if interaction.user.id != t.host_id:
+            await interaction.response.send_message("연 사람만 시작할 수 있습니다.", ephemeral=True)
+            return
+        if len(t.players) < min_players:
+            await interaction.response.send_message(
+                f"{min_players}명 이상 모여야 시작할 수 있습니다.", ephemeral=True
+            )
+            return
+
+        self.stop()
+        # 참가비 정산은 저장소 잠금과 파일 쓰기를 기다리므로 3초 안에 끝난다는 보장이 없다. 먼저 응답을 미루고
+        # 원래 메시지는 정산이 끝난 뒤에 고친다.
+        await interaction.response.defer()
+        dropped = await collect_entry_fees(t)
+        if len(t.players) < min_players:
+            # 참가비를 걷지 못했으므로 아무것도 반영되지 않았다.
+            tournaments.pop(t.guild_id, None)
+            await interaction.edit_original_response(
+                embed=error_embed("참가비를 낼 수 있는 인원이 부족해 취소되었습니다. 토큰 변동은 없습니다."),
+                view=None,
+            )
+            return
+
+        await interaction.edit_original_response(embed=tournament_embed(interaction.guild, t), view=None)
+        if dropped:
+            await interaction.followup.send(
+                "참가비가 모자라 빠진 인원: " + ", ".join(f"<@{user_id}>" for user_id in dropped),
+                ephemeral=True,
+            )
+        start_tournament(t)
+
+    @discord.ui.button(label="모집 취소", style=discord.ButtonStyle.danger)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user.id != self.t.host_id:
+            await interaction.response.send_message("연 사람만 취소할 수 있습니다.", ephemeral=True)
+            return
+        self.stop()
+        tournaments.pop(self.t.guild_id, None)
+        await interaction.response.edit_message(
+            embed=discord.Embed(description="토너먼트 모집이 취소되었습니다. 토큰 변동은 없습니다.", color=COLOR_LOSE),
+            view=None,
+        )
+
+    async def on_timeout(self):
+        if self.t.state != STATE_REGISTERING or tournaments.get(self.t.guild_id) is not self.t:
+            return
+        tournaments.pop(self.t.guild_id, None)
+        channel = bot.get_channel(self.t.channel_id) if self.t.channel_id else None
+        if channel is None or self.t.message_id is None:
+            return
+        try:
+            await channel.get_partial_message(self.t.message_id).edit(
+                embed=error_embed("모집 시간이 지나 토너먼트가 취소되었습니다. 토큰 변동은 없습니다."),
+                view=None,
+            )
+        except discord.HTTPException:
+            pass
+
+
+class TournamentSetupModal(BaseModal, title="토너먼트"):
+    def __init__(self, balance: int, cfg: GameSettings):
+        super().__init__(cfg)
 
+        self.add_item(discord.ui.TextDisplay(cfg.memo('tournament_intro', lambda: (
+            f"참가비를 정해 토너먼트 참가자를 모읍니다. 모인 참가비가 상금이 됩니다.\n"
+            f"대결은 같이놀기와 같은 숫자 대결이며, 우승자와 준우승자가 상금을 나눠 받습니다.\n"
+            f"최대 {config.TOURNAMENT_MAX_PLAYERS}명, 모집은 {cfg.TOURNAMENT_JOIN_TIME // 60}분 뒤 자동 취소됩니다."
+        ))))
+
+        self.fee = discord.ui.Select(
+            placeholder="참가비를 선택하세요",
+            required=True,
+            options=[
+                discord.SelectOption(label=f"{fmt(amount)} 토큰", value=str(amount))
+                for amount in cfg.TOURNAMENT_FEES
+                if amount <= balance
+            ],
+        )
+        self.add_item(discord.ui.Label(text="참가비", component=self.fee))
+
+    async def on_submit(self, interaction: discord.Interaction):
+        guild_id, user = interaction.guild_id, interaction.user
+        chosen = self.fee.values[0] if self.fee.values else ''
+        if not chosen.isdigit():
+            await interaction.response.send_message(
+                embed=error_embed("참가비를 선택해주세요."), ephemeral=True
+            )
+            return
+        if guild_id in tournaments:
+            await interaction.response.send_message(
+                embed=error_embed("이미 진행 중인 토너먼트가 있습니다."), ephemeral=True
+            )
+            return
+
+        t = Tournament(guild_id, user.id, int(chosen))
+        t.register(user.id)
+        remember_name(user)
+        tournaments[guild_id] = t
+
+        await interaction.response.send_message(
+            embed=tournament_embed(interaction.guild, t), view=TournamentJoinView(t, self.cfg)
+        )
+        message = await interaction.original_response()
+        t.channel_id, t.message_id = message.channel.id, message.id
+
+
+@bot.tree.command(name="토너먼트", description="참가비를 걸고 여러 명이 겨루는 토너먼트를 엽니다.")
+@app_commands.guild_only()
+async def open_tournament(interaction: discord.Interaction):
+    if interaction.guild_id in tournaments:
+        await interaction.response.send_message(
+            embed=error_embed("이미 진행 중인 토너먼트가 있습니다."), ephemeral=True
+        )
+        return
+
+    cfg = settings.get(interaction.guild_id)
+    balance = await ensure_account(interaction.guild_id, interaction.user.id)
+    if balance < cfg.TOURNAMENT_FEES[0]:
+        await interaction.response.send_message(
+            embed=error_embed(
+                f"보유 토큰이 {fmt(cfg.TOURNAMENT_FEES[0])} 미만이라 토너먼트를 열 수 없습니다. "
+                f"현재 보유 {fmt(balance)} 토큰입니다."
+            ),
+            ephemeral=True,
+        )
+        return
+
+    await interaction.response.send_modal(TournamentSetupModal(balance, cfg))
+
+
+async def resume_tournaments() -> None:
+    """재시작 전에 참가비를 걷고 끝나지 않은 대회를 이어서 끝낸다.
+
+    남겨 둔 커밋 번호를 저장소가 불러온 번호와 비교해서 정산이 파일에 남았는지 본다.
+    참가비가 반영되지 않았거나 모집 중이던 대회는 토큰이 움직이지 않았으므로 그냥 버리고,
+    상금까지 반영된 대회는 지우기만 한다.
+    """
+    for guild_id, t in (await asyncio.to_thread(load_checkpoints)).items():
+        if guild_id in tournaments:
+            continue
+        if t.state == STATE_REGISTERING or (t.fee_seq is not None and t.fee_seq > store.loaded_seq):
+            print(f"[tournament] {guild_id}: 참가비를 걷기 전에 멈춘 토너먼트를 취소합니다.")
+            await asyncio.to_thread(remove_checkpoint, guild_id)
+            await edit_tournament_message(t, error_embed(
+                "봇이 다시 시작되어 토너먼트가 취소되었습니다. 토큰 변동은 없습니다."
+            ))
+            continue
+        if t.prize_seq is not None and t.prize_seq <= store.loaded_seq:
+            print(f"[tournament] {guild_id}: 상금까지 지급한 토너먼트를 정리합니다.")
+            await asyncio.to_thread(remove_checkpoint, guild_id)
+            await edit_tournament_message(t)
+            continue
+        # 남겨 둔 상금 번호가 있어도 파일에 없으면 지급되지 않은 것이다.
+        t.prize_seq = None
+        print(f"[tournament] {guild_id}: 진행 중이던 토너먼트를 이어서 진행합니다.")
+        tournaments[guild_id] = t
+        start_tournament(t)
+
+
+# ============================================
+# 메모리 추적
+# ============================================
+def view_store_sizes() -> Dict[str, int]:
+    """discord.py가 시간 제한까지 들고 있는 뷰·모달 수."""
+    views = bot._connection._view_store
+    return {
+        'items': sum(len(items) for items in list(views._views.values())),
+        'messages': len(views._synced_message_views),
+        'modals': len(views._modals),
+    }
+
+
+profiler = default_profiler()
+profiler.add_object('lock', PlayLock)
+profiler.add_object('match_queue', MatchQueue)
+profiler.add_object('tournament', Tournament)
+profiler.add_gauge('lock.holders', lambda: len(play_lock))
+profiler.add_gauge('match.waiting', match_queue.waiting_count)
+profiler.add_gauge('tournaments', lambda: len(tournaments))
+profiler.add_gauge('throttle.keys', lambda: len(throttle))
+for _name in ('items', 'messages', 'modals'):
+    profiler.add_gauge(f'views.{_name}', lambda name=_name: view_store_sizes()[name])
+for _name in ('guilds', 'accounts', 'settled_keys', 'listeners'):
+    profiler.add_gauge(f'store.{_name}', lambda name=_name: store.sizes()[name])
+profiler.add_gauge('cache.users', lambda: len(bot._connection._users))
+profiler.add_gauge('cache.members', lambda: sum(len(g.members) for g in list(bot.guilds)))
+profiler.add_gauge('cache.messages', lambda: len(bot.cached_messages))
+profiler.add_gauge('cache.names', lambda: len(directory.names))
+profiler.add_gauge('cache.rosters', directory.member_count)
+
+
+@tasks.loop(minutes=max(config.MEMPROF_DUMP_MINUTES, 1))
+async def periodic_memory_dump():
+    """항목 수와(추적 중이면) 하위 시스템별 사용량을 DATA_DIR/reports/memory.jsonl 에 남긴다."""
     try:
-        synced = await bot.tree.sync()
-        save_signature(signature)
-        print(f'Synced {len(synced)} slash commands')
-        for cmd in synced:
-            print(f'  - /{cmd.name}: {cmd.description}')
+        record = await asyncio.to_thread(profiler.sample)
+        await asyncio.to_thread(profiler.dump, record, config.DATA_DIR)
     except Exception as e:
-        print(f'Sync error: {e}')
+        print(f"Memory dump error: {e}")
 
 
+# ============================================
+# 8. 설정
+# ============================================
+@bot.tree.command(name="설정새로고침", description="놀이 설정 파일(game_config.json)을 다시 읽습니다.")
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_guild=True)
+async def reload_settings(interaction: discord.Interaction):
+    changed = await asyncio.to_thread(settings.reload, True)
+    if settings.last_error:
+        await interaction.response.send_message(
+            embed=error_embed(
+                f"설정 파일에 오류가 있어 적용하지 않았습니다. 이전 설정({settings.version}판)을 계속 씁니다.\n"
+                f"{settings.last_error}"[:4000]
+            ),
+            ephemeral=True,
+        )
+        return
+
+    overrides = settings.overrides(interaction.guild_id)
+    lines = [f"{name} = {value}" for name, value in overrides.items()] or ["기본값(config.py)을 그대로 씁니다."]
+    embed = discord.Embed(
+        title=f"놀이 설정 {settings.version}판" + (" 적용" if changed else ""),
+        description="\n".join(lines)[:4000],
+        color=COLOR_NEUTRAL,
+    )
+    embed.set_footer(text="진행 중인 판은 시작할 때의 설정으로 끝납니다.")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+# ============================================
+# 이벤트
+# ============================================
 @bot.event
 async def on_ready():
     print('=== BOT READY EVENT TRIGGERED ===')
@@ -1111,7 +2278,11 @@ async def on_ready():
     print(f'Bot ID: {bot.user.id}')
     print(f'Bot in {len(bot.guilds)} servers')
 
-    await sync_commands_if_changed()
+    await sync_commands(bot)
+
+    if not store_ready.is_set():
+        print('[startup] 저장소를 불러오는 중이라 기다립니다.')
+        await store_ready.wait()
 
     for guild in bot.guilds:
         try:
@@ -1120,11 +2291,34 @@ async def on_ready():
             print(f'Initial grant error ({guild.id}): {e}')
 
     await catch_up_topup()
+    await resume_tournaments()
+
+    global topup_task
+    if topup_task is None:
+        topup_task = asyncio.create_task(topup_loop())
+        print(
+            f'Daily topup scheduled for {len(topup_schedule)} servers '
+            f'(default {config.DAILY_RESET_HOUR:02d}:00 {config.TIMEZONE}, spread over {config.TOPUP_JITTER_WINDOW}s)'
+        )
+
+    if config.BACKUP_INTERVAL_MINUTES > 0 and not periodic_backup.is_running():
+        periodic_backup.start()
+        print(f'Backup every {config.BACKUP_INTERVAL_MINUTES} minutes (keep {config.BACKUP_KEEP})')
+
+    if config.MEMPROF_DUMP_MINUTES > 0 and not periodic_memory_dump.is_running():
+        periodic_memory_dump.start()
+
+    if config.CONFIG_POLL_SECONDS > 0 and not poll_settings.is_running():
+        poll_settings.start()
+
+    global replication_server
+    if config.REPLICATION and replication_server is None:
+        from replication import ReplicationServer
 
-    if not daily_topup.is_running():
-        daily_topup.start()
-        print(f'Daily topup scheduled at {config.DAILY_RESET_HOUR:02d}:00 {config.TIMEZONE}')
+        replication_server = ReplicationServer(store, config.REPLICA_SOCKET)
+        await replication_server.start()
 
+    print(f'[startup] 프로세스 시작부터 준비까지 {time.monotonic() - STARTED_AT:.2f}초')
     print('=== BOT INITIALIZATION COMPLETE ===')
 
 
@@ -1148,6 +2342,85 @@ async def on_app_command_error(
 bot.tree.on_error = on_app_command_error
 
 
+async def wait_for_store(interaction: discord.Interaction) -> bool:
+    """저장소를 불러오기 전에 들어온 명령은 잠시 기다렸다가 진행한다."""
+    if store_ready.is_set():
+        return True
+    try:
+        # 응답 제한(3초) 안에 끝나야 하므로 조금만 기다린다.
+        await asyncio.wait_for(store_ready.wait(), config.STARTUP_COMMAND_WAIT)
+        return True
+    except asyncio.TimeoutError:
+        await interaction.response.send_message(
+            embed=error_embed("봇이 시작하는 중입니다. 잠시 후 다시 시도해주세요."), ephemeral=True
+        )
+        return False
+
+
+async def check_interaction(interaction: discord.Interaction) -> bool:
+    """모든 명령어에 먼저 남용 제한을 걸고, 통과하면 저장소를 기다린다."""
+    if interaction.type is discord.InteractionType.autocomplete:
+        return await wait_for_store(interaction)
+    command = (interaction.data or {}).get('name', '')
+    retry = throttle.check(interaction.guild_id, interaction.user.id, command)
+    if retry is not None:
+        await interaction.response.send_message(
+            embed=error_embed(f"너무 자주 사용했습니다. {math.ceil(retry)}초 뒤에 다시 시도해주세요."),
+            ephemeral=True,
+        )
+        return False
+    return await wait_for_store(interaction)
+
+
+bot.tree.interaction_check = check_interaction
+
+
+async def load_store() -> None:
+    """저장소를 별도 스레드에서 불러온다. 그동안 이벤트 루프는 게이트웨이 접속을 진행한다."""
+    started = time.monotonic()
+    try:
+        await asyncio.to_thread(store.load)
+    except BaseException:
+        await bot.close()
+        raise
+    store_ready.set()
+    print(f'[startup] 저장소 준비 {time.monotonic() - started:.2f}초')
+
+
+async def main() -> None:
+    if not config.DISCORD_TOKEN:
+        # 기다려도 달라지지 않으므로 재시작 간격을 두지 않고 바로 끝낸다.
+        raise SystemExit("DISCORD_TOKEN 환경변수가 설정되지 않았습니다!")
+    discord.utils.setup_logging()
+    if config.MEMPROF:
+        profiler.start()
+    # 작은 파일 하나라 바로 읽는다. 오류가 있으면 config.py 기본값으로 시작한다.
+    settings.reload()
+    async with bot:
+        loading = None
+        # 복제를 켰으면 먼저 주 프로세스가 있는지 본다. 있으면 그 프로세스가 죽을 때까지 여기서 따라간다.
+        if config.REPLICATION:
+            from replication import PrimaryLock, follow
+
+            # 주 프로세스가 되면 프로세스가 끝날 때까지 잠금을 쥔다.
+            global primary_lock
+            primary_lock = PrimaryLock(config.REPLICA_LOCK)
+            if await follow(store, config.REPLICA_SOCKET, primary_lock):
+                store.take_over()
+                store_ready.set()
+
+        # 대기하는 동안에는 포트를 주 프로세스가 쓰고 있으므로, 넘겨받은 뒤에 연다.
+        http_thread = threading.Thread(target=start_http_server, daemon=True)
+        http_thread.start()
+
+        if not store_ready.is_set():
+            # 저장소를 다 읽을 때까지 기다리지 않고 로그인을 시작한다.
+            loading = asyncio.create_task(load_store())
+        await bot.start(config.DISCORD_TOKEN)
+        if loading is not None:
+            await loading
+
+
 # ============================================
 # 봇 실행
 # ============================================
@@ -1159,13 +2432,10 @@ if __name__ == "__main__":
             f"[storage] 경고: {config.DATA_DIR} 은(는) 퍼시스턴트 디스크가 아닙니다. "
             "재배포·재시작 시 토큰 데이터가 사라집니다."
         )
-    store.load()
-
-    http_thread = threading.Thread(target=start_http_server, daemon=True)
-    http_thread.start()
-
     try:
-        bot.run(config.DISCORD_TOKEN)
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
     except discord.LoginFailure as e:
         # 토큰이 잘못된 경우는 기다려도 달라지지 않는다. 바로 종료해 로그에 드러나게 한다.
         print(f"봇 실행 실패: 토큰이 올바르지 않습니다. DISCORD_TOKEN 환경변수를 확인하세요. ({e})")
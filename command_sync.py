@@ -0,0 +1,210 @@
+"""슬래시 명령어 동기화 계획.
+
+bot.tree.sync() 는 명령어 하나만 바뀌어도 전체 목록을 덮어쓰는 요청(가장 강하게 제한됨)을 보낸다.
+여기서는 명령어마다 지문을 따로 두고, 바뀐 명령어만 하나씩 등록(upsert)하거나 지운다.
+
+- 지문과 디스코드 쪽 ID는 DATA_DIR/commands.json 에 범위(글로벌 / 서버)별로 남긴다.
+  재시작해도 바뀌지 않은 명령어에는 요청이 나가지 않는다.
+- 기록이 없는 범위(처음 실행, FORCE_SYNC=1)는 디스코드에 등록된 목록을 한 번 읽어 와서 비교한다.
+  읽기 요청은 제한이 느슨하고, 이미 같은 명령어는 다시 등록하지 않는다.
+- 단계적 배포: SYNC_STAGE=test 이면 SYNC_TEST_GUILDS 서버에만 서버 명령어로 등록한다(바로 보인다).
+  확인한 뒤 SYNC_STAGE=global 로 배포하면 글로벌로 등록하고, 시험 서버에 올렸던 사본은 지운다.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+GLOBAL_SCOPE = 'global'
+
+STAGE_TEST = 'test'
+STAGE_GLOBAL = 'global'
+
+# 비교할 때 빠져 있으면 기본값으로 보는 항목
+_COMMAND_DEFAULTS = {'type': 1, 'nsfw': False, 'default_member_permissions': None, 'contexts': None}
+_OPTION_KEYS = (
+    'type', 'name', 'description', 'required', 'choices', 'min_value', 'max_value',
+    'min_length', 'max_length', 'autocomplete', 'channel_types',
+)
+# 꺼져 있으면 빠져 있는 것과 같은 항목. min_value=0 같은 값은 그대로 비교해야 한다.
+_OPTION_FLAGS = ('required', 'autocomplete')
+
+
+def _localizations(value: Optional[dict]) -> dict:
+    return dict(sorted((value or {}).items()))
+
+
+def _normalize_option(option: dict) -> dict:
+    result = {}
+    for key in _OPTION_KEYS:
+        value = option.get(key)
+        if value is None or value == [] or (key in _OPTION_FLAGS and value is False):
+            continue
+        result[key] = value
+    if 'channel_types' in result:
+        result['channel_types'] = sorted(result['channel_types'])
+    result['name_localizations'] = _localizations(option.get('name_localizations'))
+    result['description_localizations'] = _localizations(option.get('description_localizations'))
+    result['options'] = [_normalize_option(o) for o in option.get('options') or []]
+    return result
+
+
+def normalize(payload: dict) -> dict:
+    """로컬 명령어(to_dict)와 디스코드가 돌려준 명령어를 같은 모양으로 맞춘다.
+
+    디스코드 쪽에만 있는 id·version 등은 버리고, 권한 값의 형식(정수 / 문자열)을 맞춘다.
+    """
+    result = {key: payload.get(key, default) for key, default in _COMMAND_DEFAULTS.items()}
+    result['name'] = payload['name']
+    result['description'] = payload.get('description', '')
+    if result['default_member_permissions'] is not None:
+        result['default_member_permissions'] = str(result['default_member_permissions'])
+    if result['contexts'] is not None:
+        result['contexts'] = sorted(result['contexts'])
+    result['name_localizations'] = _localizations(payload.get('name_localizations'))
+    result['description_localizations'] = _localizations(payload.get('description_localizations'))
+    result['options'] = [_normalize_option(o) for o in payload.get('options') or []]
+    return result
+
+
+def signature(payload: dict) -> str:
+    text = json.dumps(normalize(payload), sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def plan(local: Dict[str, str], known: Dict[str, dict]) -> Tuple[List[str], List[str]]:
+    """(등록할 이름, 지울 이름). local은 {이름: 지문}, known은 {이름: {'sig', 'id'}}."""
+    upserts = [name for name, sig in sorted(local.items()) if known.get(name, {}).get('sig') != sig]
+    deletes = [name for name in sorted(known) if name not in local]
+    return upserts, deletes
+
+
+class SyncState:
+    """범위별 {명령어 이름: {'sig': 지문, 'id': 디스코드 ID}} 기록."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.scopes: Dict[str, Dict[str, dict]] = {}
+
+    def load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.scopes = json.load(f).get('scopes', {})
+        except FileNotFoundError:
+            self.scopes = {}
+        except (OSError, ValueError) as e:
+            # 기록이 깨졌으면 디스코드 목록을 다시 읽어 비교하면 된다.
+            print(f"[sync] {self.path} 을(를) 읽지 못해 새로 비교합니다: {e}")
+            self.scopes = {}
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'scopes': self.scopes}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+def scope_key(guild_id: Optional[int]) -> str:
+    return GLOBAL_SCOPE if guild_id is None else str(guild_id)
+
+
+class CommandSyncer:
+    def __init__(self, tree, http, application_id: int, path: str):
+        self.tree = tree
+        self.http = http
+        self.application_id = application_id
+        self.state = SyncState(path)
+
+    def local_payloads(self) -> Dict[str, dict]:
+        return {cmd.name: cmd.to_dict(self.tree) for cmd in self.tree.get_commands()}
+
+    async def _fetch(self, guild_id: Optional[int]) -> List[dict]:
+        if guild_id is None:
+            return await self.http.get_global_commands(self.application_id)
+        return await self.http.get_guild_commands(self.application_id, guild_id)
+
+    async def _upsert(self, guild_id: Optional[int], payload: dict) -> dict:
+        if guild_id is None:
+            return await self.http.upsert_global_command(self.application_id, payload)
+        return await self.http.upsert_guild_command(self.application_id, guild_id, payload)
+
+    async def _delete(self, guild_id: Optional[int], command_id: str) -> None:
+        if guild_id is None:
+            await self.http.delete_global_command(self.application_id, command_id)
+        else:
+            await self.http.delete_guild_command(self.application_id, guild_id, command_id)
+
+    async def sync_scope(
+        self, guild_id: Optional[int], payloads: Dict[str, dict], refresh: bool = False
+    ) -> Tuple[int, int]:
+        """한 범위를 payloads 와 같게 맞춘다. (등록 수, 삭제 수)
+
+        요청마다 기록을 저장하므로, 중간에 제한에 걸려도 다음 시작 때 남은 것부터 이어 간다.
+        """
+        key = scope_key(guild_id)
+        known = self.state.scopes.get(key)
+        if known is None or refresh:
+            remote = await self._fetch(guild_id)
+            known = {cmd['name']: {'sig': signature(cmd), 'id': cmd['id']} for cmd in remote}
+            self.state.scopes[key] = known
+            self.state.save()
+
+        upserts, deletes = plan({name: signature(p) for name, p in payloads.items()}, known)
+        for name in upserts:
+            created = await self._upsert(guild_id, payloads[name])
+            known[name] = {'sig': signature(payloads[name]), 'id': created['id']}
+            self.state.save()
+            print(f"[sync] {key}: /{name} 등록")
+        for name in deletes:
+            await self._delete(guild_id, known[name]['id'])
+            del known[name]
+            self.state.save()
+            print(f"[sync] {key}: /{name} 삭제")
+        return len(upserts), len(deletes)
+
+    async def run(self, stage: str, test_guilds: List[int], refresh: bool = False) -> None:
+        self.state.load()
+        payloads = self.local_payloads()
+
+        if stage == STAGE_TEST:
+            if not test_guilds:
+                print("[sync] SYNC_STAGE=test 이지만 SYNC_TEST_GUILDS 가 비어 있어 동기화하지 않습니다.")
+                return
+            for guild_id in test_guilds:
+                upserted, deleted = await self.sync_scope(guild_id, payloads, refresh)
+                print(f"[sync] 시험 서버 {guild_id}: 등록 {upserted}, 삭제 {deleted}")
+            print("[sync] 글로벌 명령어는 그대로 두었습니다. 확인 후 SYNC_STAGE=global 로 배포하세요.")
+            return
+
+        upserted, deleted = await self.sync_scope(None, payloads, refresh)
+        if upserted or deleted:
+            print(f"[sync] 글로벌: 등록 {upserted}, 삭제 {deleted}")
+        else:
+            print(f"[sync] 글로벌: 바뀐 명령어가 없습니다. ({len(payloads)}개)")
+        # 시험 서버에 올렸던 사본은 글로벌과 겹쳐 두 번 보이므로 지운다.
+        for guild_id in test_guilds:
+            await self.sync_scope(guild_id, {}, refresh)
+
+
+async def sync_commands(bot) -> None:
+    """바뀐 명령어만 디스코드에 반영한다. 실패해도 봇은 계속 돈다."""
+    syncer = CommandSyncer(
+        bot.tree, bot.http, bot.application_id, os.path.join(config.DATA_DIR, 'commands.json')
+    )
+    try:
+        await syncer.run(config.SYNC_STAGE, config.SYNC_TEST_GUILDS, refresh=config.FORCE_SYNC)
+    except Exception as e:
+        print(f"Sync error: {e}")
@@ -1,16 +1,17 @@
 # 디스코드 봇 설정 파일
 import os
-from dotenv import load_dotenv
 
 # .env 파일에서 환경변수 로드 (로컬 개발용)
-load_dotenv()
+# 배포 환경에는 .env 가 없으므로 dotenv를 불러오지도 않는다.
+_ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+if os.path.exists(_ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(_ENV_FILE)
 
 # 환경변수에서 토큰 가져오기 (Render에서는 환경변수로 설정)
+# 없는지는 봇을 띄울 때(bot.main) 확인한다. 규칙·분석·시뮬레이터 같은 도구는 토큰 없이 불러올 수 있다.
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 
-if not DISCORD_TOKEN:
-    raise ValueError("DISCORD_TOKEN 환경변수가 설정되지 않았습니다!")
-
 # ============================================
 # 데이터 저장 위치
 # ============================================
@@ -40,8 +41,16 @@ CHANNEL_MAX = 38
 INITIAL_TOKENS = 1000       # 최초 1회 지급량
 DAILY_FLOOR = 1000          # 매일 이 값 미만이면 이 값으로 보정
 MAX_TOKENS = 1_000_000      # 보유 상한
-DAILY_RESET_HOUR = 7        # 보정 시각 (시)
-TIMEZONE = 'Asia/Seoul'     # 보정 시각의 기준 시간대
+DAILY_RESET_HOUR = 7        # 보정 시각 (시). 서버별로 game_config.json 에서 바꿀 수 있다
+TIMEZONE = 'Asia/Seoul'     # 보정 시각의 기준 시간대. 서버별로 바꿀 수 있다
+
+# 모든 서버가 같은 초에 보정하지 않도록, 보정 시각부터 이 시간(초) 안에서 서버마다 나눠 실행한다.
+# 서버별로 늦추는 양은 (서버, 날짜)로 정해져서 재시작해도 바뀌지 않는다. 0이면 정각에 모두 실행한다.
+TOPUP_JITTER_WINDOW = int(os.getenv('TOPUP_JITTER_WINDOW', '900'))
+
+# 매일 보정을 모든 인원에게 바로 하지 않고, 서버의 보정 회차만 올린 뒤 각자 다음에 조회·변경될 때 반영한다.
+# 보유량·순위는 바로 보정할 때와 같다. 매일 보정 기록은 그 사람의 보유량이 처음 바뀔 때 남는다.
+LAZY_FLOOR = os.getenv('LAZY_FLOOR', '').strip() in ('1', 'true', 'True')
 
 # ============================================
 # 놀이 규칙
@@ -51,6 +60,7 @@ ODD_EVEN_REWARD = 50        # 홀짝 맞추기 정답 시 지급량
 NUMBER_REWARD = 400         # 숫자 맞추기 정답 시 지급량
 DICE_MIN = 1                # 게임에 쓰이는 숫자 범위
 DICE_MAX = 10
+SOLO_MAX_ROUNDS = 100       # 혼자놀기 한 번에 진행할 수 있는 판 수 (명령어 옵션 범위라 서버별로 바꿀 수 없다)
 
 DUO_UNIT = 100              # 같이놀기 베팅 단위
 DUO_MIN_BET = 100           # 같이놀기 최소 베팅량
@@ -66,6 +76,10 @@ DUO_BET_LADDER = [
 ]
 SELECT_MAX_OPTIONS = 25     # 디스코드 선택 메뉴 항목 수 상한
 
+# 대결매칭에서 상대를 기다리는 최대 시간(초).
+# 디스코드 응답 토큰이 15분 뒤 만료되므로 그보다 짧아야 대기 안내를 고칠 수 있다.
+MATCH_QUEUE_TIMEOUT = 120
+
 # ============================================
 # 토큰 선물
 # ============================================
@@ -73,15 +87,94 @@ GIFT_MIN = 100              # 최소 선물 금액
 GIFT_MAX = 500              # 최대 선물 금액
 GIFT_STEP = 100             # 선물 금액 단위
 GIFT_RATIO = 0.9            # 받는 쪽에 들어가는 비율 (나머지는 소멸)
+GIFT_MAX_RECIPIENTS = 5     # 한 번에 선물할 수 있는 최대 인원 (선택 메뉴 상한 25, GIFT_MIN × 인원 ≤ GIFT_MAX)
+
+# ============================================
+# 백업
+# ============================================
+# DATA_DIR/backups/ 에 바뀐 부분만 주기적으로 백업한다. 0이면 자동 백업을 하지 않는다.
+BACKUP_INTERVAL_MINUTES = int(os.getenv('BACKUP_INTERVAL_MINUTES', '60'))
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '48'))                     # 남겨둘 백업 수
+BACKUP_IO_LIMIT = int(os.getenv('BACKUP_IO_LIMIT', str(2 * 1024 * 1024)))  # 초당 읽기·쓰기 한도(바이트)
+
+# ============================================
+# 토너먼트
+# ============================================
+TOURNAMENT_FEES = [100, 200, 300, 500, 1_000, 2_000, 5_000, 10_000]   # 참가비 선택지
+TOURNAMENT_MIN_PLAYERS = 2      # 시작에 필요한 최소 인원
+TOURNAMENT_MAX_PLAYERS = 64     # 최대 인원
+TOURNAMENT_JOIN_TIME = 600      # 모집 시간(초). 지나면 토큰 변동 없이 취소
+TOURNAMENT_ROUND_DELAY = 3      # 라운드 사이 간격(초)
+TOURNAMENT_PAYOUT = (0.7, 0.3)  # 상금 비율 (우승, 준우승)
+
+# ============================================
+# 변동 기록
+# ============================================
+LEDGER_INDEX_DAYS = 30          # 시작할 때 인원별 색인을 만들 최근 기록 일수
+LEDGER_INDEX_PER_USER = 50      # 인원별로 색인에 남길 최근 기록 수
+LEDGER_HISTORY_LIMIT = 10       # /토큰내역 에 보여줄 기록 수
+
+# ============================================
+# 중복 정산 방지
+# ============================================
+# 같은 상호작용으로 정산이 다시 들어오면(디스코드 재전송, 버튼 연타 등) 처음 결과를 돌려준다.
+SETTLE_DEDUP_TTL = 600          # 기억해 두는 시간(초)
+SETTLE_DEDUP_SIZE = 10_000      # 기억해 두는 최대 건수. 넘치면 오래된 것부터 잊는다
+
+# ============================================
+# 복제 (대기 프로세스)
+# ============================================
+# 켜면 같은 기기의 두 프로세스가 주/대기로 나뉜다. 먼저 뜬 쪽이 주 프로세스가 되어
+# 확정된 변동을 소켓으로 흘려보내고, 나중에 뜬 쪽은 메모리에 같은 상태를 들고 기다리다
+# 주 프로세스가 죽으면 파일을 다시 읽지 않고 바로 넘겨받는다.
+REPLICATION = os.getenv('REPLICATION', '').strip() in ('1', 'true', 'True')
+REPLICA_SOCKET = os.getenv('REPLICA_SOCKET', os.path.join(DATA_DIR, 'replica.sock'))
+REPLICA_LOCK = os.path.join(DATA_DIR, 'primary.lock')   # 주 프로세스가 살아 있는 동안 쥐는 잠금 파일
+REPLICA_HEARTBEAT = 1.0         # 변동이 없을 때 살아 있음을 알리는 간격(초)
+REPLICA_TIMEOUT = 5.0           # 이 시간 동안 아무것도 오지 않으면 주 프로세스가 죽은 것으로 본다
+REPLICA_QUEUE_SIZE = 10_000     # 대기 프로세스 하나에 쌓아 둘 수 있는 변동 수. 넘치면 연결을 끊고 처음부터 다시 받게 한다
 
 # ============================================
 # 시작 동작
 # ============================================
 # 명령어 목록이 바뀌었을 때만 디스코드에 동기화한다.
 # 글로벌 동기화는 제한이 강해서 재배포마다 호출하면 차단될 수 있다.
-# 강제로 다시 동기화해야 하면 FORCE_SYNC=1 환경변수를 준다.
+# 명령어마다 지문을 DATA_DIR/commands.json 에 남겨 두고, 바뀐 명령어만 하나씩 등록한다. (command_sync.py)
+# FORCE_SYNC=1 이면 남겨 둔 기록 대신 디스코드에 등록된 목록을 다시 읽어 비교한다.
 FORCE_SYNC = os.getenv('FORCE_SYNC', '').strip() in ('1', 'true', 'True')
 
+# 단계적 배포. SYNC_STAGE=test 면 SYNC_TEST_GUILDS(쉼표로 구분한 서버 ID)에만 먼저 등록하고
+# 글로벌은 건드리지 않는다. global(기본)이면 글로벌로 등록하고 시험 서버의 사본은 지운다.
+SYNC_STAGE = os.getenv('SYNC_STAGE', 'global').strip().lower()
+SYNC_TEST_GUILDS = [int(g) for g in os.getenv('SYNC_TEST_GUILDS', '').replace(' ', '').split(',') if g]
+
+# 저장소를 불러오는 동안 들어온 명령을 기다려 주는 시간(초). 응답 제한(3초)보다 짧아야 한다.
+STARTUP_COMMAND_WAIT = 2.0
+
+# 정산이 밀릴 때의 입장 제어 (admission.py)
+# 예상 대기가 DEFER 를 넘으면 정산 전에 응답을 미뤄 두고, REJECT 나 대기 인원 MAX_WAITING 을 넘으면
+# 새 놀이를 받지 않는다. REJECT 는 응답 제한(3초)보다 짧아야 한다.
+ADMISSION_DEFER_MS = int(os.getenv('ADMISSION_DEFER_MS', '500'))
+ADMISSION_REJECT_MS = int(os.getenv('ADMISSION_REJECT_MS', '2500'))
+ADMISSION_MAX_WAITING = int(os.getenv('ADMISSION_MAX_WAITING', '20'))
+
+# 명령어 남용 제한 (throttle.py). 명령어 이름: (횟수, 창(초)). 한 사람이 한 서버에서 창 안에 횟수보다
+# 많이 쓰면 거절한다. 목록에 없는 명령어는 THROTTLE_DEFAULT, 횟수 0은 제한 없음.
+# 환경변수 THROTTLE_LIMITS="토큰보유=3/60,혼자놀기=0/60" 로 일부만 바꿀 수 있다.
+THROTTLE_DEFAULT = (20, 60)
+THROTTLE_LIMITS = {
+    '채널추천': (5, 60),
+    '토큰보유': (5, 60),
+    '혼자놀기': (15, 60),
+}
+THROTTLE_OVERRIDE = os.getenv('THROTTLE_LIMITS', '')
+
+# 파일 쓰기 스레드(persistence.py)에 쌓아 둘 수 있는 커밋 수. 넘치면 정산이 자리가 날 때까지 기다린다.
+PERSIST_QUEUE_SIZE = int(os.getenv('PERSIST_QUEUE_SIZE', '64'))
+
+# 보유량 변동 일지(journal/)가 이 크기(바이트)를 넘으면 새 스냅숏(tokens.bin)을 쓰고 일지를 새로 시작한다.
+SNAPSHOT_JOURNAL_BYTES = int(os.getenv('SNAPSHOT_JOURNAL_BYTES', str(4 << 20)))
+
 # 시작에 실패했을 때 종료 전 대기 시간(초).
 # 곧바로 종료하면 Render가 즉시 재시작해 디스코드 속도 제한이 길어진다.
 RESTART_BACKOFF = int(os.getenv('RESTART_BACKOFF', '120'))
@@ -90,6 +183,24 @@ RESTART_BACKOFF = int(os.getenv('RESTART_BACKOFF', '120'))
 # 이 차단은 접속을 계속 시도하면 만료 시각이 갱신되므로, 훨씬 길게 쉬어야 풀린다.
 RATE_LIMIT_BACKOFF = int(os.getenv('RATE_LIMIT_BACKOFF', '3600'))
 
+# ============================================
+# 메모리
+# ============================================
+# 저메모리 모드. discord.py의 멤버 캐시를 끄고, 인원 목록은 필요할 때만 받아온다.
+# 인원이 많은 서버에서 멤버 객체가 메모리 대부분을 차지하는 것을 막는다.
+LOW_MEMORY = os.getenv('LOW_MEMORY', '').strip() in ('1', 'true', 'True')
+
+# 저메모리 모드에서 순위표 표시용으로 기억해 두는 이름 수.
+NAME_CACHE_SIZE = int(os.getenv('NAME_CACHE_SIZE', '2000'))
+
+# 메모리 추적 (memprof.py). health 서버의 /memory 로 보고, /memory/start·/memory/stop 으로 켜고 끈다.
+# MEMPROF_KEY 를 정해야 열린다. (?key=값 으로 전달) 비워 두면 /memory 경로는 모두 막힌다.
+MEMPROF_KEY = os.getenv('MEMPROF_KEY', '')
+MEMPROF = os.getenv('MEMPROF', '').strip() in ('1', 'true', 'True')   # 시작할 때부터 추적
+MEMPROF_FRAMES = int(os.getenv('MEMPROF_FRAMES', '25'))             # 할당마다 남기는 호출 깊이
+# 0보다 크면 이 간격(분)마다 항목 수(추적 중이면 하위 시스템별 사용량도)를 DATA_DIR/reports/memory.jsonl 에 남긴다.
+MEMPROF_DUMP_MINUTES = int(os.getenv('MEMPROF_DUMP_MINUTES', '0'))
+
 # ============================================
 # 시간 제한 (초)
 # ============================================
@@ -97,3 +208,10 @@ MODAL_TIME_LIMIT = 10       # 모달 제출 제한 시간
 INVITE_TIME_LIMIT = 10      # 같이놀기 수락/거절 제한 시간
 BUTTON_TIME_LIMIT = 30      # 중간 단계 버튼 유효 시간
 PLAY_LOCK_TIMEOUT = 90      # 놀이 잠금 자동 해제 시간
+
+# ============================================
+# 실행 중 설정 바꾸기
+# ============================================
+# 위의 지급량·배당·베팅·선물·시간 제한 값은 DATA_DIR/game_config.json 으로 덮어쓸 수 있다. (settings.py)
+# 이 간격(초)마다 파일이 바뀌었는지 확인한다. 0이면 /설정새로고침 으로만 다시 읽는다.
+CONFIG_POLL_SECONDS = int(os.getenv('CONFIG_POLL_SECONDS', '30'))
@@ -0,0 +1,257 @@
+"""토큰 변동 기록(원장).
+
+보유량이 왜 바뀌었는지 나중에 확인할 수 있도록 모든 변동을 덧붙이기만 하는 파일에 남긴다.
+
+- 한 건은 48바이트 고정 길이이고, 날짜(UTC)별로 ledger/YYYY-MM-DD.bin 파일에 쌓인다.
+- 열(시각, 서버, 인원, 상대, 증감, 사유)의 위치가 고정이라, 읽을 때는 파일을 메모리에
+  매핑해서 필요한 행만 꺼내거나 열 단위로 한꺼번에 읽을 수 있다. (analytics 등)
+- 인원별 최근 기록 위치를 메모리 색인으로 들고 있어서, 내역 조회 때 전체를 훑지 않는다.
+  색인은 시작 시간을 줄이려고 처음 조회할 때 만든다. 파일을 훑는 동안에는 잠금을 잡지 않는다.
+
+정산 경로에서는 버퍼에 한 번 덧붙이기만 하고, 디스크 반영(fsync)은 저장소가
+토큰 파일을 쓸 때 함께 한다. fsync는 잠금 밖에서 하므로 그동안에도 정산은 기록을 덧붙일 수 있다.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import config
+
+# 시각(ms), 서버, 인원, 상대, 증감, 사유 (+ 8바이트 정렬용 빈칸)
+RECORD = struct.Struct('<qQQQqB7x')
+
+# 변동 사유
+REASON_OTHER = 0
+REASON_INITIAL = 1
+REASON_TOPUP = 2
+REASON_SOLO = 3
+REASON_DUO = 4
+REASON_GIFT = 5
+REASON_TOURNAMENT_FEE = 6
+REASON_TOURNAMENT_PRIZE = 7
+
+REASON_NAMES = {
+    REASON_OTHER: "기타",
+    REASON_INITIAL: "최초 지급",
+    REASON_TOPUP: "매일 보정",
+    REASON_SOLO: "혼자놀기",
+    REASON_DUO: "같이놀기",
+    REASON_GIFT: "토큰선물",
+    REASON_TOURNAMENT_FEE: "토너먼트 참가비",
+    REASON_TOURNAMENT_PRIZE: "토너먼트 상금",
+}
+
+
+class Entry(NamedTuple):
+    timestamp_ms: int
+    guild_id: int
+    user_id: int
+    counterparty: int
+    delta: int
+    reason: int
+
+
+def day_of(timestamp_ms: int) -> str:
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).date().isoformat()
+
+
+def _remember(index: Dict[Tuple[int, int], Deque[Tuple[str, int]]], key: Tuple[int, int], day: str,
+              row: int) -> None:
+    positions = index.get(key)
+    if positions is None:
+        positions = index[key] = deque(maxlen=config.LEDGER_INDEX_PER_USER)
+    positions.append((day, row))
+
+
+class Ledger:
+    def __init__(self, data_dir: str):
+        self.directory = os.path.join(data_dir, 'ledger')
+        # (guild_id, user_id) -> 최근 기록 위치 (날짜, 행 번호). 오래된 것부터 밀려난다.
+        self._index: Dict[Tuple[int, int], Deque[Tuple[str, int]]] = {}
+        # _tracking: 덧붙이는 행을 바로 색인에 넣는 중. _indexed: 그 전 기록까지 다 색인에 들어갔다.
+        self._tracking = False
+        self._indexed = False
+        # 색인을 만드는 쪽은 한 번에 하나
+        self._build_lock = threading.Lock()
+        self._day: Optional[str] = None
+        self._file = None
+        self._rows = 0
+        # 날짜가 바뀌어 닫을 파일. 다음 flush()에서 fsync 하고 닫는다.
+        self._retired: List = []
+        # 정산(이벤트 루프)과 파일 반영(저장 스레드)이 같은 파일을 다룬다. 잡고 있는 동안 디스크를 기다리지 않는다.
+        self._io_lock = threading.Lock()
+
+    def segment_path(self, day: str) -> str:
+        return os.path.join(self.directory, f'{day}.bin')
+
+    def segments(self) -> List[str]:
+        """남아 있는 날짜 목록(오래된 순)."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-4] for name in names if name.endswith('.bin'))
+
+    # ------------------------------------------------------------------
+    # 시작
+    # ------------------------------------------------------------------
+    def open(self) -> None:
+        """끝까지 쓰이지 못한 마지막 행을 정리한다. 인원별 색인은 처음 조회할 때 만든다."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = {}
+        self._tracking = False
+        self._indexed = False
+        # 중간에 끊긴 쓰기는 마지막 파일에만 남는다.
+        for day in self.segments()[-1:]:
+            path = self.segment_path(day)
+            size = os.path.getsize(path)
+            usable = size - size % RECORD.size
+            if usable != size:
+                with open(path, 'r+b') as f:
+                    f.truncate(usable)
+
+    @property
+    def indexed(self) -> bool:
+        return self._indexed
+
+    def _build_index(self) -> None:
+        """최근 LEDGER_INDEX_DAYS일치 기록으로 인원별 색인을 만든다. _build_lock 안에서 부른다.
+
+        잠금 안에서는 훑을 날짜와 날짜별 행 수만 정하고, 그 뒤에 덧붙는 행은 append()가 바로 색인에
+        넣게 한다. 파일은 잠금 밖에서 훑으므로 그동안에도 정산은 기다리지 않는다. 다 훑으면 잠깐 잠금을
+        잡고 새로 덧붙은 행을 뒤에 이어 붙인다.
+        """
+        with self._io_lock:
+            if self._file is not None:
+                self._file.flush()
+            rows = {}
+            for day in self.segments()[-config.LEDGER_INDEX_DAYS:]:
+                rows[day] = self._rows if day == self._day else os.path.getsize(self.segment_path(day)) // RECORD.size
+            self._index = {}
+            self._tracking = True
+
+        index: Dict[Tuple[int, int], Deque[Tuple[str, int]]] = {}
+        for day, count in rows.items():
+            if not count:
+                continue
+            with open(self.segment_path(day), 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                for row, record in enumerate(RECORD.iter_unpack(view[:count * RECORD.size])):
+                    _remember(index, (record[1], record[2]), day, row)
+
+        with self._io_lock:
+            for key, positions in self._index.items():
+                for day, row in positions:
+                    _remember(index, key, day, row)
+            self._index = index
+            self._indexed = True
+
+    # ------------------------------------------------------------------
+    # 기록
+    # ------------------------------------------------------------------
+    def append(self, guild_id: int, entries: Iterable[Tuple[int, int, int, int]]) -> None:
+        """(user_id, counterparty, delta, reason) 목록을 한 번에 덧붙인다. 디스크 반영은 flush()에서."""
+        now = int(time.time() * 1000)
+        day = day_of(now)
+        entries = [entry for entry in entries if entry[2]]
+        if not entries:
+            return
+        packed = b''.join(
+            RECORD.pack(now, guild_id, user_id, counterparty, delta, reason)
+            for user_id, counterparty, delta, reason in entries
+        )
+        with self._io_lock:
+            if day != self._day:
+                self._roll(day)
+            self._file.write(packed)
+            start = self._rows
+            self._rows += len(entries)
+            # 색인을 아직 만들기 전이면, 만들 때 파일에서 함께 읽힌다.
+            if self._tracking:
+                for offset, (user_id, _, _, _) in enumerate(entries):
+                    _remember(self._index, (guild_id, user_id), day, start + offset)
+
+    def _roll(self, day: str) -> None:
+        """날짜가 바뀌면 새 파일로 넘어간다. _io_lock 안에서 부른다. 전날 파일은 다음 flush()가 닫는다."""
+        if self._file is not None:
+            self._file.flush()
+            self._retired.append(self._file)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.segment_path(day)
+        self._file = open(path, 'ab')
+        self._rows = os.path.getsize(path) // RECORD.size
+        self._day = day
+
+    def flush(self) -> None:
+        """버퍼에 쌓인 기록을 디스크에 반영한다.
+
+        잠금 안에서는 버퍼를 파일로 내보내고 파일 번호를 복제해 두기만 한다. fsync는 잠금을 놓은 뒤
+        복제한 번호로 하므로, 정산의 append()가 디스크를 기다리지 않는다.
+        """
+        with self._io_lock:
+            retired, self._retired = self._retired, []
+            fd = None
+            if self._file is not None:
+                self._file.flush()
+                fd = os.dup(self._file.fileno())
+        for f in retired:
+            os.fsync(f.fileno())
+            f.close()
+        if fd is not None:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def history(self, guild_id: int, user_id: int, limit: int) -> List[Entry]:
+        """한 사람의 최근 기록을 최신순으로 돌려준다. 색인에 있는 행만 읽는다."""
+        if not self._indexed:
+            with self._build_lock:
+                if not self._indexed:
+                    self._build_index()
+        with self._io_lock:
+            positions = list(self._index.get((guild_id, user_id), ()))[-limit:]
+            if not positions:
+                return []
+            if self._file is not None:
+                # 아직 버퍼에 있는 기록도 읽을 수 있게 파일로 내보낸다. (fsync는 하지 않는다)
+                self._file.flush()
+
+        by_day: Dict[str, List[int]] = {}
+        for day, row in positions:
+            by_day.setdefault(day, []).append(row)
+
+        found: List[Entry] = []
+        for day, rows in by_day.items():
+            try:
+                with open(self.segment_path(day), 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    for row in rows:
+                        offset = row * RECORD.size
+                        if offset + RECORD.size <= len(view):
+                            found.append(Entry(*RECORD.unpack_from(view, offset)))
+            except (FileNotFoundError, ValueError):
+                continue
+        # 색인은 파일에 쓴 순서다. 시각으로 정렬하면 한 번에 덧붙인 기록(여러 판 정산)의 순서가 뒤섞이므로
+        # 쓴 순서를 그대로 뒤집는다.
+        found.reverse()
+        return found
+
+    def close(self) -> None:
+        self.flush()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+                self._day = None
@@ -0,0 +1,115 @@
+"""서버 인원 목록의 가벼운 보관소.
+
+저메모리 모드에서는 discord.py의 멤버 캐시를 끄고, 봇에 필요한 최소한의 정보만 여기에 둔다.
+
+- 서버별 인원 ID는 정렬된 64비트 정수 배열로, 봇 여부는 같은 순서의 비트셋으로 보관한다.
+- 표시 이름은 순위표 등에 쓰기 위해 최근에 본 것만 크기 제한이 있는 LRU에 남긴다.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class GuildRoster:
+    """한 서버의 인원 ID와 봇 여부. Member 객체 대신 인원당 8바이트 + 1비트만 쓴다."""
+
+    __slots__ = ('ids', 'bots')
+
+    def __init__(self):
+        self.ids = array('Q')
+        # ids[i] 가 봇이면 i번째 비트가 1
+        self.bots = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def replace(self, members: Iterable[Tuple[int, bool]]) -> None:
+        """(user_id, is_bot) 목록으로 전체를 다시 만든다."""
+        ordered = sorted(set(members))
+        self.ids = array('Q', (user_id for user_id, _ in ordered))
+        bits = 0
+        for index, (_, is_bot) in enumerate(ordered):
+            if is_bot:
+                bits |= 1 << index
+        self.bots = bits
+
+    def add(self, user_id: int, is_bot: bool) -> None:
+        index = bisect_left(self.ids, user_id)
+        if index < len(self.ids) and self.ids[index] == user_id:
+            self._set_bit(index, is_bot)
+            return
+        self.ids.insert(index, user_id)
+        # 끼워 넣은 자리부터 위쪽 비트를 한 칸씩 민다.
+        low = self.bots & ((1 << index) - 1)
+        high = self.bots >> index
+        self.bots = low | (high << (index + 1)) | (int(is_bot) << index)
+
+    def remove(self, user_id: int) -> None:
+        index = bisect_left(self.ids, user_id)
+        if index >= len(self.ids) or self.ids[index] != user_id:
+            return
+        del self.ids[index]
+        low = self.bots & ((1 << index) - 1)
+        high = self.bots >> (index + 1)
+        self.bots = low | (high << index)
+
+    def _set_bit(self, index: int, is_bot: bool) -> None:
+        if is_bot:
+            self.bots |= 1 << index
+        else:
+            self.bots &= ~(1 << index)
+
+    def is_bot(self, user_id: int) -> Optional[bool]:
+        index = bisect_left(self.ids, user_id)
+        if index >= len(self.ids) or self.ids[index] != user_id:
+            return None
+        return bool((self.bots >> index) & 1)
+
+    def humans(self) -> List[int]:
+        bots = self.bots
+        return [user_id for index, user_id in enumerate(self.ids) if not (bots >> index) & 1]
+
+
+class NameCache:
+    """user_id -> 표시 이름. 가장 오래 쓰이지 않은 것부터 버린다."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._names: 'OrderedDict[int, str]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def get(self, user_id: int) -> Optional[str]:
+        name = self._names.get(user_id)
+        if name is not None:
+            self._names.move_to_end(user_id)
+        return name
+
+    def put(self, user_id: int, name: str) -> None:
+        self._names[user_id] = name
+        self._names.move_to_end(user_id)
+        while len(self._names) > self.capacity:
+            self._names.popitem(last=False)
+
+
+class MemberDirectory:
+    """서버별 GuildRoster와 전체 공용 NameCache를 묶는다."""
+
+    def __init__(self, name_capacity: int):
+        self._rosters: Dict[int, GuildRoster] = {}
+        self.names = NameCache(name_capacity)
+
+    def roster(self, guild_id: int) -> GuildRoster:
+        roster = self._rosters.get(guild_id)
+        if roster is None:
+            roster = self._rosters[guild_id] = GuildRoster()
+        return roster
+
+    def forget_guild(self, guild_id: int) -> None:
+        self._rosters.pop(guild_id, None)
+
+    def member_count(self) -> int:
+        return sum(len(r) for r in self._rosters.values())
@@ -0,0 +1,95 @@
+"""멤버 캐시 메모리 측정.
+
+discord.py 기본 멤버 캐시와 저메모리 모드(members.py)가 인원 N명당 얼마를 쓰는지
+tracemalloc으로 잰다. 실제 게이트웨이 연결 없이 같은 형태의 멤버 데이터를 만들어 넣는다.
+
+    python memory_report.py            # 10,000명 기준
+    python memory_report.py -n 50000
+"""
+
+import argparse
+import tracemalloc
+
+import discord
+from discord.state import ConnectionState
+
+from members import MemberDirectory
+
+BASE_ID = 10 ** 17
+
+
+def fake_member_payload(index: int) -> dict:
+    return {
+        'user': {
+            'id': str(BASE_ID + index),
+            'username': f'user{index}',
+            'discriminator': '0',
+            'avatar': None,
+            'global_name': f'인원{index}',
+            'bot': index % 50 == 0,
+        },
+        'roles': [],
+        'joined_at': '2024-01-01T00:00:00+00:00',
+        'deaf': False,
+        'mute': False,
+        'nick': None,
+        'flags': 0,
+    }
+
+
+def measure_default_cache(count: int) -> int:
+    """discord.py가 기본 설정으로 멤버를 캐시할 때 늘어나는 메모리(바이트)."""
+    intents = discord.Intents.default()
+    intents.members = True
+    state = ConnectionState(
+        dispatch=lambda *args: None,
+        handlers={},
+        hooks={},
+        http=None,
+        intents=intents,
+        member_cache_flags=discord.MemberCacheFlags.from_intents(intents),
+    )
+    guild = discord.Guild(data={'id': '1', 'name': 'report'}, state=state)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for index in range(count):
+        guild._add_member(discord.Member(data=fake_member_payload(index), guild=guild, state=state))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used
+
+
+def measure_low_memory(count: int, name_capacity: int) -> int:
+    """저메모리 모드에서 같은 인원을 보관할 때 늘어나는 메모리(바이트)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    directory = MemberDirectory(name_capacity)
+    roster = directory.roster(1)
+    roster.replace((BASE_ID + index, index % 50 == 0) for index in range(count))
+    for index in range(count):
+        directory.names.put(BASE_ID + index, f'인원{index}')
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used
+
+
+def main() -> None:
+    import config
+
+    parser = argparse.ArgumentParser(description='멤버 캐시 메모리 측정')
+    parser.add_argument('-n', '--members', type=int, default=10_000)
+    args = parser.parse_args()
+
+    default_bytes = measure_default_cache(args.members)
+    low_bytes = measure_low_memory(args.members, config.NAME_CACHE_SIZE)
+
+    per = 10_000 / args.members
+    print(f"인원 {args.members:,}명")
+    print(f"  기본 멤버 캐시 : {default_bytes / 1024:,.0f} KiB (1만 명당 {default_bytes * per / 1024:,.0f} KiB)")
+    print(f"  저메모리 모드  : {low_bytes / 1024:,.0f} KiB (1만 명당 {low_bytes * per / 1024:,.0f} KiB, "
+          f"이름 캐시 {config.NAME_CACHE_SIZE:,}개 한도)")
+
+
+if __name__ == '__main__':
+    main()
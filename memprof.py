@@ -0,0 +1,246 @@
+"""실행 중인 봇의 메모리 추적.
+
+몇 주씩 도는 동안 무엇이 메모리를 늘리는지 보려고 tracemalloc 스냅숏을 주기적으로 찍어
+직전 스냅숏과 비교하고, 늘어난 양을 하위 시스템(저장소, 잠금, 뷰, 캐시 등)별로 나눠 보여준다.
+
+- 할당마다 호출 경로를 거슬러 올라가며, 처음 만나는 등록된 파일·클래스의 하위 시스템으로 센다.
+  예를 들어 storage.py 안에서 json이 만든 문자열은 저장소로, discord/ui 안의 할당은 뷰로 센다.
+- 추적은 켜 둔 동안만 느려지고 메모리를 더 쓴다. 평소에는 꺼 두고 health 서버로 켜고 끈다.
+- 추적이 꺼져 있어도 항목 수(잠금 보유자, 살아 있는 뷰, 캐시된 인원 등)는 언제든 볼 수 있다.
+"""
+
+import inspect
+import json
+import os
+import threading
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+OTHER = 'other'
+
+# 스냅숏에서 빼는 것: 추적기 자신과 import 과정
+_EXCLUDE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class _Rule:
+    __slots__ = ('subsystem', 'prefix', 'first', 'last')
+
+    def __init__(self, subsystem: str, prefix: str, first: int = 0, last: int = 0):
+        self.subsystem = subsystem
+        self.prefix = prefix
+        self.first = first
+        self.last = last
+
+    def matches(self, filename: str, lineno: int) -> bool:
+        if not filename.startswith(self.prefix):
+            return False
+        return not self.last or self.first <= lineno <= self.last
+
+
+class MemoryProfiler:
+    def __init__(self, frames: int = 25):
+        self.frames = frames
+        # 클래스 범위 규칙을 파일 규칙보다 먼저 본다. 같은 파일 안에서 더 좁은 쪽이 이긴다.
+        self._object_rules: List[_Rule] = []
+        self._file_rules: List[_Rule] = []
+        self._gauges: Dict[str, Callable[[], int]] = {}
+        self._cache: Dict[tracemalloc.Traceback, str] = {}
+        self._previous: Optional[Tuple[tracemalloc.Snapshot, Dict[str, int]]] = None
+        self._lock = threading.Lock()
+        self.last: Optional[dict] = None
+
+    # ------------------------------------------------------------------
+    # 등록
+    # ------------------------------------------------------------------
+    def add_path(self, subsystem: str, path: str) -> None:
+        """파일 하나, 또는 폴더 아래 전부를 하위 시스템으로 센다."""
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            path = os.path.join(path, '')
+        self._file_rules.append(_Rule(subsystem, path))
+        self._cache.clear()
+
+    def add_object(self, subsystem: str, obj) -> None:
+        """클래스·함수의 소스 범위 안에서 일어난 할당을 하위 시스템으로 센다."""
+        lines, first = inspect.getsourcelines(obj)
+        self._object_rules.append(
+            _Rule(subsystem, os.path.abspath(inspect.getsourcefile(obj)), first, first + len(lines) - 1)
+        )
+        self._cache.clear()
+
+    def add_gauge(self, name: str, read: Callable[[], int]) -> None:
+        """추적 없이도 볼 수 있는 항목 수. 다른 스레드에서 읽으므로 가벼워야 한다."""
+        self._gauges[name] = read
+
+    # ------------------------------------------------------------------
+    # 추적
+    # ------------------------------------------------------------------
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> bool:
+        """추적을 켠다. 이미 켜져 있으면 False."""
+        with self._lock:
+            if tracemalloc.is_tracing():
+                return False
+            tracemalloc.start(self.frames)
+            self._previous = None
+            return True
+
+    def stop(self) -> bool:
+        """추적을 끄고 스냅숏을 버린다. 꺼져 있었으면 False."""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                return False
+            tracemalloc.stop()
+            self._previous = None
+            self._cache.clear()
+            return True
+
+    def gauges(self) -> Dict[str, object]:
+        values: Dict[str, object] = {}
+        for name, read in self._gauges.items():
+            try:
+                values[name] = read()
+            except Exception as e:
+                # 이벤트 루프가 같은 자료를 고치는 중이면 한 번쯤 실패할 수 있다.
+                values[name] = f'error: {type(e).__name__}'
+        return values
+
+    def _subsystem(self, traceback: tracemalloc.Traceback) -> str:
+        try:
+            return self._cache[traceback]
+        except KeyError:
+            pass
+        found = OTHER
+        # traceback 은 오래된 호출부터 담겨 있다. 가장 최근 호출부터 본다.
+        for frame in reversed(traceback):
+            rule = next(
+                (r for r in self._object_rules if r.matches(frame.filename, frame.lineno)), None
+            ) or next((r for r in self._file_rules if r.matches(frame.filename, frame.lineno)), None)
+            if rule is not None:
+                found = rule.subsystem
+                break
+        self._cache[traceback] = found
+        return found
+
+    def sample(self, top: int = 10) -> dict:
+        """스냅숏을 찍어 직전 스냅숏과 비교한다. 추적이 꺼져 있으면 항목 수만 담는다."""
+        record: dict = {
+            'at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'gauges': self.gauges(),
+        }
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                record['tracing'] = False
+                self.last = record
+                return record
+
+            snapshot = tracemalloc.take_snapshot().filter_traces(_EXCLUDE)
+            current, peak = tracemalloc.get_traced_memory()
+            totals: Dict[str, int] = {}
+            for trace in snapshot.traces:
+                name = self._subsystem(trace.traceback)
+                totals[name] = totals.get(name, 0) + trace.size
+
+            record.update({
+                'tracing': True,
+                'traced': current,
+                'peak': peak,
+                'overhead': tracemalloc.get_tracemalloc_memory(),
+                'subsystems': dict(sorted(totals.items(), key=lambda item: item[1], reverse=True)),
+            })
+            if self._previous is not None:
+                before, before_totals = self._previous
+                record['growth'] = {
+                    name: totals.get(name, 0) - before_totals.get(name, 0)
+                    for name in sorted(set(totals) | set(before_totals))
+                }
+                record['top'] = [
+                    [_where(stat.traceback[-1]), stat.size_diff, stat.count_diff]
+                    for stat in snapshot.compare_to(before, 'lineno')[:top]
+                ]
+            self._previous = (snapshot, totals)
+            self.last = record
+            return record
+
+    # ------------------------------------------------------------------
+    # 보고
+    # ------------------------------------------------------------------
+    @staticmethod
+    def report(record: dict) -> str:
+        lines = [f"메모리 {record['at']}"]
+        lines.append("항목 수")
+        lines += [f"  {name:<24} {value}" for name, value in record['gauges'].items()]
+        if not record.get('tracing'):
+            lines.append("할당 추적: 꺼짐 (/memory/start 로 켭니다)")
+            return '\n'.join(lines)
+
+        growth = record.get('growth', {})
+        lines.append(
+            f"할당 추적: 현재 {_kib(record['traced'])}, 최고 {_kib(record['peak'])}, "
+            f"추적 비용 {_kib(record['overhead'])}"
+        )
+        lines.append("하위 시스템별 (직전 대비)")
+        for name, size in record['subsystems'].items():
+            delta = f"{growth[name]:+,d} B" if name in growth else "-"
+            lines.append(f"  {name:<12} {_kib(size):>14}  {delta}")
+        if record.get('top'):
+            lines.append("많이 늘어난 줄")
+            lines += [f"  {where:<48} {size:+,d} B ({count:+d}개)" for where, size, count in record['top']]
+        elif 'growth' not in record:
+            lines.append("(처음 찍은 스냅숏이라 비교할 것이 없습니다. 다음 조회부터 늘어난 양이 보입니다.)")
+        return '\n'.join(lines)
+
+    @staticmethod
+    def dump(record: dict, data_dir: str) -> str:
+        path = os.path.join(data_dir, 'reports', 'memory.jsonl')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+
+def _where(frame: tracemalloc.Frame) -> str:
+    filename = frame.filename
+    if filename.startswith(HERE):
+        filename = os.path.relpath(filename, HERE)
+    return f"{filename}:{frame.lineno}"
+
+
+def _kib(size: int) -> str:
+    return f"{size / 1024:,.1f} KiB"
+
+
+def default_profiler() -> MemoryProfiler:
+    """저장소·캐시·뷰·네트워크를 미리 등록한 추적기. 봇 쪽 클래스는 bot.py에서 더한다."""
+    import aiohttp
+    import discord
+
+    profiler = MemoryProfiler(config.MEMPROF_FRAMES)
+    for name in ('storage.py', 'ledger.py', 'stats.py', 'persistence.py', 'tokenfile.py'):
+        profiler.add_path('store', os.path.join(HERE, name))
+    for name in ('members.py', 'settings.py', 'throttle.py'):
+        profiler.add_path('caches', os.path.join(HERE, name))
+
+    package = os.path.dirname(discord.__file__)
+    profiler.add_path('views', os.path.join(package, 'ui'))
+    for name in ('state.py', 'member.py', 'user.py', 'guild.py', 'channel.py', 'role.py', 'message.py'):
+        profiler.add_path('caches', os.path.join(package, name))
+    for name in ('gateway.py', 'http.py'):
+        profiler.add_path('network', os.path.join(package, name))
+    profiler.add_path('network', os.path.dirname(aiohttp.__file__))
+    # 나머지 discord.py와 봇 코드
+    profiler.add_path('discord', package)
+    profiler.add_path('bot', HERE)
+    return profiler
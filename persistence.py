@@ -0,0 +1,163 @@
+"""보유량 파일을 쓰는 전용 스레드.
+
+커밋마다 asyncio.to_thread 로 파일을 쓰면 다른 to_thread 작업(백업, 변동 기록 조회 등)과 같은
+스레드 풀을 나눠 쓰고, 쓰기끼리의 순서도 보장되지 않으며, 얼마나 밀렸는지도 알 수 없다.
+
+- 스레드 하나가 데이터 파일 쓰기를 모두 맡는다. 저장소의 상태를 직접 읽지 않고, 커밋마다 받은
+  변동(복제에 보내는 것과 같은 change)을 자기 사본에 반영한 뒤 그 사본을 쓴다. 전적 표도 사본을 두고
+  change의 games로 갱신하므로, 표 전체를 바이트로 만드는 일은 새 스냅숏을 쓸 때 이 스레드에서만 한다.
+- 밀려 있는 커밋은 한 번에 꺼내 사본에 차례로 반영하고 파일은 한 번만 쓴다. 쓰는 쪽은 사본과 함께
+  이번에 반영한 커밋 목록도 받으므로, 바뀐 것만 덧붙여 쓸 수도 있다.
+- 대기열은 PERSIST_QUEUE_SIZE 로 제한한다. 가득 차면 커밋하는 쪽(저장소 잠금 안)이 기다린다.
+- 쓰기가 끝난 커밋은 seq 순서대로 완료되고, 그때 on_durable(복제 알림)을 부른다.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from stats import GameStats
+
+# 대기열에 넣는 항목 종류
+_CHANGE = 'change'
+_RESET = 'reset'
+
+
+def merge(state: dict, stats: GameStats, change: dict) -> None:
+    """커밋 하나(change)를 사본(state, stats)에 반영한다. TokenStore.apply_change와 같은 규칙이다."""
+    gid = change['guild']
+    state['balances'].setdefault(gid, {}).update(change['balances'])
+    if change.get('last_topup'):
+        state['last_topup'][gid] = change['last_topup']
+    if 'floors' in change:
+        state['floors'][gid] = list(change['floors'])
+    if change.get('floor_epochs'):
+        state['floor_epochs'].setdefault(gid, {}).update(change['floor_epochs'])
+    for user_id, game, delta in change.get('games', ()):
+        stats.record(int(gid), user_id, game, delta)
+    state['seq'] = change['seq']
+
+
+class PersistenceWorker:
+    def __init__(
+        self, write: Callable[[dict, GameStats, List[dict]], None], max_pending: int, name: str = 'persist'
+    ):
+        # write(사본, 전적 사본, 이번에 반영한 커밋 목록). 이 스레드에서만 부른다.
+        self._write = write
+        self.max_pending = max_pending
+        self.name = name
+        self._queue: 'queue.SimpleQueue[tuple]' = queue.SimpleQueue()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._thread: Optional[threading.Thread] = None
+        self._state: Optional[dict] = None
+        self._stats: Optional[GameStats] = None
+        # 아직 쓰지 못한 커밋. 쓰기에 실패하면 다음 쓰기 때 다시 쓴다.
+        self._changes: List[dict] = []
+        self.pending = 0
+        self.writes = 0
+        self.merged = 0
+        self.failures = 0
+        self.last_flush = 0.0
+        self.avg_flush = 0.0
+
+    def reset(self, state: dict, stats: GameStats) -> None:
+        """사본을 파일에 이미 있는 상태로 바꾼다. 불러오기·넘겨받기 직후에 부른다. 어느 스레드에서나 된다.
+
+        stats는 이 스레드만 쓰는 사본이어야 한다. (GameStats.copy)
+        """
+        self._queue.put((_RESET, (state, stats), None, None))
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    async def submit(
+        self, change: Optional[dict], on_durable: Callable[[dict], None]
+    ) -> 'asyncio.Future[None]':
+        """커밋을 대기열에 넣고, 파일에 쓰기가 끝나면 완료되는 future를 돌려준다.
+
+        change가 None이면 바뀐 것 없이 지금 사본을 한 번 쓴다. 대기열이 가득 차면 자리가 날 때까지 기다린다.
+        """
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        await self._slots.acquire()
+        future = loop.create_future()
+        self.pending += 1
+        self._queue.put((_CHANGE, change, future, on_durable))
+        return future
+
+    # ------------------------------------------------------------------
+    # 쓰기 스레드
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            done: List[tuple] = []
+            for kind, payload, future, on_durable in batch:
+                if kind == _RESET:
+                    self._state, self._stats = payload
+                    self._changes = []
+                    continue
+                if payload is not None:
+                    merge(self._state, self._stats, payload)
+                    self._changes.append(payload)
+                done.append((future, payload, on_durable))
+            if done:
+                self._flush(done)
+
+    def _flush(self, done: List[tuple]) -> None:
+        started = time.monotonic()
+        error: Optional[BaseException] = None
+        try:
+            self._write(self._state, self._stats, self._changes)
+            self._changes = []
+        except Exception as e:
+            error = e
+            self.failures += 1
+            print(f"[persist] 파일을 쓰지 못했습니다: {e}")
+        elapsed = time.monotonic() - started
+        self.writes += 1
+        self.merged += len(done) - 1
+        self.last_flush = elapsed
+        self.avg_flush = elapsed if self.writes == 1 else self.avg_flush + 0.2 * (elapsed - self.avg_flush)
+        for future, change, on_durable in done:
+            try:
+                future.get_loop().call_soon_threadsafe(self._complete, future, change, on_durable, error)
+            except RuntimeError:
+                # 이벤트 루프가 이미 닫혔다. (종료 중)
+                pass
+
+    def _complete(
+        self, future: asyncio.Future, change: Optional[dict], on_durable: Callable[[dict], None],
+        error: Optional[BaseException],
+    ) -> None:
+        """이벤트 루프에서 불린다. 커밋 순서대로 불린다."""
+        self.pending -= 1
+        self._slots.release()
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+            return
+        future.set_result(None)
+        if change is not None:
+            on_durable(change)
+
+    def expected_wait(self) -> float:
+        """지금 커밋하면 파일에 쓰일 때까지 걸릴 시간(초) 추정. 밀려 있으면 지금 쓰기가 끝난 뒤 한 번 더 쓴다."""
+        return self.avg_flush * (2 if self.pending else 1)
+
+    def report(self) -> str:
+        return (
+            f"파일 쓰기 대기 {self.pending}건 (한도 {self.max_pending}), "
+            f"최근 {self.last_flush * 1000:.0f}ms · 평균 {self.avg_flush * 1000:.0f}ms, "
+            f"쓰기 {self.writes}회 · 합친 커밋 {self.merged}건"
+            + (f" · 실패 {self.failures}회" if self.failures else "")
+        )
@@ -0,0 +1,182 @@
+"""주/대기 프로세스 복제.
+
+재시작하면 보유량을 파일에서 다시 읽고 RESTART_BACKOFF 만큼 기다리느라 한동안 봇이 멈춘다.
+같은 기기에 대기 프로세스를 하나 더 띄워 두면, 주 프로세스가 죽었을 때 대기 프로세스가
+메모리에 들고 있던 상태로 곧바로 로그인한다.
+
+- 주 프로세스는 REPLICA_SOCKET 유닉스 소켓을 연다. 대기 프로세스가 붙으면 현재 상태 전체
+  (snapshot)를 한 번 보내고, 이후에는 파일에 쓰기까지 끝난 변동(change)만 순서대로 보낸다.
+  한 줄에 JSON 하나씩이고, 변동이 없으면 REPLICA_HEARTBEAT 마다 ping 을 보낸다.
+- 대기 프로세스는 받은 것을 메모리에만 반영한다. 연결이 끊기면 다시 붙어 보고, 붙을 곳이 없거나
+  REPLICA_TIMEOUT 동안 아무것도 오지 않으면 주 프로세스가 죽은 것으로 보고 넘겨받는다.
+- 넘겨받은 쪽이 새 주 프로세스가 되어 소켓을 다시 연다. 죽었던 프로세스가 다시 뜨면 대기 프로세스가 된다.
+- 주 프로세스는 REPLICA_LOCK 파일에 배타 잠금(flock)을 걸고 살아 있는 동안 놓지 않는다. 대기 프로세스는
+  이 잠금을 잡아야만 넘겨받는다. 주 프로세스가 잠시 멈춰(GC, 느린 fsync 등) 응답이 늦어도 프로세스가
+  살아 있으면 잠금이 풀리지 않으므로, 두 프로세스가 같은 DATA_DIR에 함께 쓰는 일이 없다.
+  프로세스가 죽으면 커널이 잠금을 풀어 준다.
+
+한 기기에서 시험하기:
+
+    REPLICATION=1 python bot.py      # 터미널 1: 먼저 뜬 쪽이 주 프로세스
+    REPLICATION=1 python bot.py      # 터미널 2: 대기 프로세스 ("[replica] 대기 중" 로그)
+    kill -9 <터미널 1의 PID>          # 터미널 2가 파일을 읽지 않고 바로 로그인한다
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+from typing import Optional, Set
+
+import config
+from storage import TokenStore
+
+# 한 줄(JSON 하나)의 최대 길이. 처음 보내는 전체 상태가 가장 길다.
+LINE_LIMIT = 1 << 30
+
+
+async def _send(writer: asyncio.StreamWriter, message: dict) -> None:
+    writer.write(json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n')
+    await asyncio.wait_for(writer.drain(), config.REPLICA_TIMEOUT)
+
+
+class PrimaryLock:
+    """DATA_DIR 하나에 주 프로세스 하나. 잡은 뒤에는 프로세스가 끝날 때까지 놓지 않는다."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """잠금을 잡았으면 True. 다른 프로세스가 쥐고 있으면 기다리지 않고 False."""
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # 누가 쥐고 있는지 보려고 남긴다. 잠금 자체는 파일 내용과 상관없다.
+        os.ftruncate(fd, 0)
+        os.write(fd, f'{os.getpid()}\n'.encode('ascii'))
+        self._fd = fd
+        return True
+
+
+class ReplicationServer:
+    """주 프로세스 쪽. 붙은 대기 프로세스마다 변동을 흘려보낸다."""
+
+    def __init__(self, store: TokenStore, path: str):
+        self.store = store
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+
+    @property
+    def standbys(self) -> int:
+        return len(self._clients)
+
+    async def start(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # 죽은 주 프로세스가 남긴 소켓 파일. 주 프로세스 잠금을 잡았으므로 살아 있는 주 프로세스는 없다.
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path, limit=LINE_LIMIT)
+        print(f"[replica] {self.path} 에서 대기 프로세스를 기다립니다.")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=config.REPLICA_QUEUE_SIZE)
+        overflow = asyncio.Event()
+
+        def listener(change: dict) -> None:
+            try:
+                queue.put_nowait(change)
+            except asyncio.QueueFull:
+                overflow.set()
+
+        self._clients.add(writer)
+        try:
+            state = await self.store.attach(listener)
+            await _send(writer, state)
+            print(f"[replica] 대기 프로세스에 전체 상태를 보냈습니다. (seq {state['seq']})")
+            while not overflow.is_set():
+                try:
+                    message = await asyncio.wait_for(queue.get(), config.REPLICA_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    message = {'type': 'ping', 'seq': self.store.seq}
+                await _send(writer, message)
+            # 대기 프로세스가 따라오지 못했다. 끊으면 다시 붙어서 전체 상태부터 받는다.
+            print("[replica] 대기 프로세스가 밀려 연결을 끊습니다.")
+        except (ConnectionError, asyncio.TimeoutError, OSError) as e:
+            print(f"[replica] 대기 프로세스 연결 종료: {type(e).__name__}")
+        finally:
+            self.store.detach(listener)
+            self._clients.discard(writer)
+            writer.close()
+
+
+async def follow(store: TokenStore, path: str, lock: PrimaryLock) -> bool:
+    """대기 프로세스 쪽. 주 프로세스를 따라가며 store를 같은 상태로 유지한다.
+
+    붙을 주 프로세스가 처음부터 없으면 False를 돌려준다. (이 프로세스가 주 프로세스가 된다)
+    따라가던 주 프로세스가 죽으면 True를 돌려준다. 이때 store에는 마지막으로 확정된 상태가 들어 있다.
+    어느 쪽이든 돌려주기 전에 lock을 잡는다. 잡지 못하면 주 프로세스가 아직 살아 있는 것이므로
+    (시작하는 중이거나 잠시 멈췄다) 다시 붙어서 계속 따라간다.
+    """
+    followed = False
+    waiting = False
+    while True:
+        try:
+            reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+        except (FileNotFoundError, ConnectionRefusedError):
+            if lock.acquire():
+                if followed:
+                    print(f"[replica] 주 프로세스가 없습니다. 넘겨받습니다. (seq {store.seq})")
+                return followed
+            if not waiting:
+                print("[replica] 주 프로세스가 시작하는 중입니다. 소켓이 열릴 때까지 기다립니다.")
+                waiting = True
+            await asyncio.sleep(config.REPLICA_HEARTBEAT)
+            continue
+        waiting = False
+
+        try:
+            while True:
+                line = await asyncio.wait_for(reader.readline(), config.REPLICA_TIMEOUT)
+                if not line:
+                    break
+                message = json.loads(line)
+                kind = message['type']
+                if kind == 'snapshot':
+                    store.import_state(message)
+                    followed = True
+                    print(f"[replica] 대기 중. 주 프로세스의 상태를 받았습니다. (seq {store.seq})")
+                elif kind == 'change':
+                    # 전체 상태는 아직 파일에 쓰이지 않은 커밋까지 담으므로, 그 커밋들이 뒤늦게 다시 온다.
+                    # 이미 받은 번호는 apply_change가 건너뛰고, 번호가 비었을 때만 처음부터 다시 받는다.
+                    if message['seq'] > store.seq + 1:
+                        raise ValueError(f"변동 번호가 이어지지 않습니다. ({store.seq} -> {message['seq']})")
+                    store.apply_change(message)
+        except asyncio.TimeoutError:
+            if lock.acquire():
+                print(f"[replica] 주 프로세스가 {config.REPLICA_TIMEOUT:g}초 동안 응답하지 않습니다. 넘겨받습니다.")
+                return followed
+            # 응답은 없지만 프로세스는 살아 있다. 넘겨받으면 두 프로세스가 같은 파일에 쓰게 된다.
+            print(f"[replica] 주 프로세스가 {config.REPLICA_TIMEOUT:g}초 동안 응답하지 않지만 "
+                  "잠금을 쥐고 있어 넘겨받지 않고 다시 연결합니다.")
+        except (ConnectionError, ValueError, KeyError) as e:
+            # 번호가 어긋났거나 연결이 잘못됐다. 다시 붙어서 전체 상태부터 받는다.
+            print(f"[replica] 다시 연결합니다: {e}")
+        finally:
+            writer.close()
+
+        # 연결이 끊겼다. 주 프로세스가 살아 있으면(밀려서 끊긴 경우) 다시 붙고, 없으면 위에서 끝난다.
+        await asyncio.sleep(config.REPLICA_HEARTBEAT)
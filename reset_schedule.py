@@ -0,0 +1,120 @@
+"""서버별 매일 보정 일정.
+
+모든 서버를 같은 시각에 보정하면 보정과 파일 쓰기가 같은 1초에 몰린다.
+서버마다 시간대·보정 시각을 따로 두고, 보정 시각부터 TOPUP_JITTER_WINDOW 초 안에서
+서버별로 정해진 만큼 늦춰 실행한다. 늦추는 양은 (서버, 날짜)로 정해지므로 재시작해도 같다.
+
+다음 실행 시각은 min-heap 하나로 관리한다. 가장 이른 서버를 꺼내는 것도, 놓친 보정을
+따라잡는 것도 같은 힙에서 O(log n)에 한다.
+"""
+
+import hashlib
+import heapq
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+
+@lru_cache(maxsize=None)
+def zone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def jitter(guild_id: int, day: str, window: int) -> int:
+    """보정 시각에서 늦출 초. 같은 서버·날짜면 항상 같다."""
+    if window <= 0:
+        return 0
+    digest = hashlib.sha256(f"{guild_id}:{day}".encode('ascii')).digest()
+    return int.from_bytes(digest[:8], 'big') % (window + 1)
+
+
+def plan(
+    guild_id: int, tz_name: str, hour: int, last_day: Optional[str], window: int, now: datetime
+) -> Tuple[float, str]:
+    """(실행 시각 epoch, 보정 날짜).
+
+    보정 날짜는 그 서버 시간대의 오늘이고, 오늘 보정을 이미 했으면 내일이다.
+    오늘 보정 시각이 지났는데 하지 않았으면 실행 시각이 과거가 되어 바로 실행된다. (따라잡기)
+    """
+    tz = zone(tz_name)
+    day: date = now.astimezone(tz).date()
+    if last_day == day.isoformat():
+        day += timedelta(days=1)
+    key = day.isoformat()
+    run_at = datetime.combine(day, dt_time(hour), tzinfo=tz).timestamp() + jitter(guild_id, key, window)
+    return run_at, key
+
+
+class ResetScheduler:
+    def __init__(self, window: int):
+        self.window = window
+        # (실행 시각, guild_id, 보정 날짜). 다시 잡힌 서버의 옛 항목은 꺼낼 때 버린다.
+        self._heap: List[Tuple[float, int, str]] = []
+        self._next: Dict[int, Tuple[float, str]] = {}
+        # 보정하는 중인 서버. 끝날 때까지 다시 잡지 않는다.
+        self._running: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._next)
+
+    def schedule(
+        self, guild_id: int, tz_name: str, hour: int, last_day: Optional[str],
+        now: Optional[datetime] = None,
+    ) -> None:
+        if guild_id in self._running:
+            return
+        run_at, day = plan(guild_id, tz_name, hour, last_day, self.window, now or datetime.now(timezone.utc))
+        self._push(guild_id, run_at, day)
+
+    def retry(self, guild_id: int, day: str, delay: float, now: float) -> None:
+        """실패한 보정을 같은 날짜로 delay 초 뒤에 다시 한다."""
+        self._running.discard(guild_id)
+        self._push(guild_id, now + delay, day)
+
+    def _push(self, guild_id: int, run_at: float, day: str) -> None:
+        if self._next.get(guild_id) == (run_at, day):
+            return
+        self._next[guild_id] = (run_at, day)
+        heapq.heappush(self._heap, (run_at, guild_id, day))
+        # 다시 잡을 때마다 옛 항목이 남으므로, 많이 쌓이면 한 번에 정리한다.
+        if len(self._heap) > 2 * len(self._next) + 64:
+            self._heap = [(at, gid, d) for gid, (at, d) in self._next.items()]
+            heapq.heapify(self._heap)
+
+    def forget(self, guild_id: int) -> None:
+        self._next.pop(guild_id, None)
+        self._running.discard(guild_id)
+
+    def next_run(self, guild_id: int) -> Optional[Tuple[float, str]]:
+        return self._next.get(guild_id)
+
+    def _is_current(self, entry: Tuple[float, int, str]) -> bool:
+        run_at, guild_id, day = entry
+        return self._next.get(guild_id) == (run_at, day)
+
+    def peek(self) -> Optional[float]:
+        """가장 이른 실행 시각."""
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def is_due(self, guild_id: int, now: float) -> bool:
+        entry = self._next.get(guild_id)
+        return entry is not None and entry[0] <= now
+
+    def pop_due(self, now: float) -> List[Tuple[int, str]]:
+        """실행 시각이 지난 서버를 이른 순서로 꺼낸다. 꺼낸 서버는 finish()까지 다시 잡히지 않는다."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if not self._is_current(entry):
+                continue
+            _, guild_id, day = entry
+            del self._next[guild_id]
+            self._running.add(guild_id)
+            due.append((guild_id, day))
+        return due
+
+    def finish(self, guild_id: int) -> None:
+        self._running.discard(guild_id)
@@ -0,0 +1,111 @@
+"""놀이 규칙.
+
+discord·저장소와 상관없는 순수 함수만 둔다. bot.py가 실제 정산에, simulator.py가 설정값을 바꿨을 때의
+경제를 미리 돌려 보는 데 같은 함수를 쓴다. cfg는 GameSettings처럼 설정값을 속성으로 가진 객체다.
+
+숫자를 받는 함수(solo_correct, solo_delta, bet_limit, topped_up, clamp)는 NumPy 배열을 넣어도
+원소마다 같은 규칙으로 계산한다. 이 모듈은 numpy를 import 하지 않는다.
+"""
+
+import random
+from bisect import bisect_right
+from typing import List, Sequence, Tuple
+
+import config
+
+GAME_ODD_EVEN = '1'
+GAME_NUMBER = '2'
+GAME_NAMES = {GAME_ODD_EVEN: "홀짝 맞추기", GAME_NUMBER: "숫자 맞추기"}
+
+
+# ----------------------------------------------------------------------
+# 혼자놀기
+# ----------------------------------------------------------------------
+def roll(cfg, rng: random.Random = random) -> int:
+    return rng.randint(cfg.DICE_MIN, cfg.DICE_MAX)
+
+
+def rolls(cfg, size, generator):
+    """roll 을 size 번. generator는 numpy.random.Generator."""
+    return generator.integers(cfg.DICE_MIN, cfg.DICE_MAX + 1, size=size)
+
+
+def solo_correct(game: str, guess: str, number):
+    """답(guess)이 뽑힌 숫자와 맞는지."""
+    if game == GAME_ODD_EVEN:
+        return number % 2 == (0 if guess == "짝" else 1)
+    return number == int(guess)
+
+
+def solo_reward(game: str, cfg) -> int:
+    return cfg.ODD_EVEN_REWARD if game == GAME_ODD_EVEN else cfg.NUMBER_REWARD
+
+
+def solo_delta(game: str, correct, cfg):
+    """한 판의 증감. 맞히면 보상, 틀리면 참가비를 잃는다."""
+    return correct * (solo_reward(game, cfg) + cfg.SOLO_BET) - cfg.SOLO_BET
+
+
+# ----------------------------------------------------------------------
+# 같이놀기
+# ----------------------------------------------------------------------
+def bet_limit(balance, cfg):
+    """보유량으로 걸 수 있는 최대 금액. 베팅 단위로 내린다."""
+    return balance // cfg.DUO_UNIT * cfg.DUO_UNIT
+
+
+def bet_options(max_bet: int, cfg) -> List[int]:
+    """걸 수 있는 금액 선택지. 사다리 값 중 한도 이하인 것들과 한도 자체를 합친다."""
+    amounts = {a for a in cfg.DUO_BET_LADDER if a <= max_bet}
+    if max_bet >= cfg.DUO_MIN_BET:
+        amounts.add(max_bet)
+    ordered = sorted(amounts)
+    if len(ordered) > config.SELECT_MAX_OPTIONS:
+        # 넘칠 일은 없지만, 넘치면 가장 큰 값(한도)은 반드시 남긴다.
+        ordered = ordered[: config.SELECT_MAX_OPTIONS - 1] + [ordered[-1]]
+    return ordered
+
+
+def duel_rolls(cfg, rng: random.Random = random) -> Tuple[int, int]:
+    """두 사람의 숫자. 무승부가 나오지 않도록 서로 다른 숫자가 나올 때까지 다시 뽑는다. 큰 쪽이 이긴다."""
+    first, second = roll(cfg, rng), roll(cfg, rng)
+    while first == second:
+        first, second = roll(cfg, rng), roll(cfg, rng)
+    return first, second
+
+
+def bet_bucket(amount: int, ladder: Sequence[int]) -> int:
+    """베팅액이 속한 구간. 사다리에서 amount 이하인 가장 큰 값의 위치."""
+    return max(bisect_right(ladder, amount) - 1, 0)
+
+
+# ----------------------------------------------------------------------
+# 토큰선물
+# ----------------------------------------------------------------------
+def gift_amounts(cfg) -> List[int]:
+    """고를 수 있는 선물 금액."""
+    return list(range(cfg.GIFT_MIN, cfg.GIFT_MAX + 1, cfg.GIFT_STEP))
+
+
+def gift_received(amount: int, cfg) -> int:
+    """선물한 금액 중 실제로 상대에게 들어가는 양."""
+    return int(amount * cfg.GIFT_RATIO)
+
+
+# ----------------------------------------------------------------------
+# 보유량
+# ----------------------------------------------------------------------
+def topped_up(balance, floor):
+    """매일 보정. 기준선 미만이면 기준선으로 맞춘다. 더해 주는 것이 아니다."""
+    if hasattr(balance, 'clip'):
+        return balance.clip(floor, None)
+    return max(balance, floor)
+
+
+def clamp(amount, cap: int = None):
+    """보유량은 0 이상 cap(기본 MAX_TOKENS) 이하다."""
+    if cap is None:
+        cap = config.MAX_TOKENS
+    if hasattr(amount, 'clip'):
+        return amount.clip(0, cap)
+    return max(0, min(cap, amount))
@@ -0,0 +1,258 @@
+"""실행 중에 바꿀 수 있는 놀이 설정.
+
+지급량·배당·베팅 사다리·선물 규칙·시간 제한·보정 시각(시간대) 같은 값은 config.py 의 값을 기본으로 하고,
+DATA_DIR/game_config.json 이 있으면 그 값으로 덮어쓴다. 서버별로 다른 값을 줄 수도 있다.
+
+    {
+      "defaults": {"SOLO_BET": 200, "NUMBER_REWARD": 500},
+      "guilds": {"123456789012345678": {"GIFT_RATIO": 0.8}}
+    }
+
+- 파일이 바뀌면(수정 시각·크기) 다시 읽는다. 봇은 CONFIG_POLL_SECONDS 마다 확인하고,
+  /설정새로고침 으로 바로 읽게 할 수도 있다.
+- 읽은 값은 전부 검사한 뒤에 한 번에 바꾼다. 하나라도 틀리면 이전 설정을 그대로 쓰고 오류만 남긴다.
+- 서버별 설정 객체는 바뀌지 않으므로, 그 객체에 묶어 둔 안내 문구·선택지(memo)는 값이 바뀔 때만 다시 만든다.
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import config
+
+# 바꿀 수 있는 항목과 형식
+INT = 'int'
+FLOAT = 'float'
+INT_LIST = 'int_list'
+STR = 'str'
+
+TUNABLE = {
+    'INITIAL_TOKENS': INT,
+    'DAILY_FLOOR': INT,
+    'DAILY_RESET_HOUR': INT,
+    'TIMEZONE': STR,
+    'SOLO_BET': INT,
+    'ODD_EVEN_REWARD': INT,
+    'NUMBER_REWARD': INT,
+    'DICE_MIN': INT,
+    'DICE_MAX': INT,
+    'DUO_UNIT': INT,
+    'DUO_MIN_BET': INT,
+    'DUO_BET_LADDER': INT_LIST,
+    'MATCH_QUEUE_TIMEOUT': INT,
+    'GIFT_MIN': INT,
+    'GIFT_MAX': INT,
+    'GIFT_STEP': INT,
+    'GIFT_RATIO': FLOAT,
+    'GIFT_MAX_RECIPIENTS': INT,
+    'TOURNAMENT_FEES': INT_LIST,
+    'TOURNAMENT_MIN_PLAYERS': INT,
+    'TOURNAMENT_JOIN_TIME': INT,
+    'TOURNAMENT_ROUND_DELAY': INT,
+    'MODAL_TIME_LIMIT': INT,
+    'INVITE_TIME_LIMIT': INT,
+    'BUTTON_TIME_LIMIT': INT,
+    'PLAY_LOCK_TIMEOUT': INT,
+}
+
+# 디스코드 응답 토큰이 15분 뒤 만료되므로 그보다 길게 기다리는 값은 받지 않는다.
+MAX_WAIT_SECONDS = 14 * 60
+
+
+class GameSettings:
+    """한 서버에 적용되는 설정값. 만든 뒤에는 바꾸지 않는다."""
+
+    def __init__(self, values: Dict[str, Any], version: int):
+        for name, value in values.items():
+            setattr(self, name, tuple(value) if isinstance(value, list) else value)
+        self.version = version
+        self._memo: Dict[str, Any] = {}
+
+    def memo(self, name: str, build: Callable[[], Any]) -> Any:
+        """이 설정으로 만든 값(안내 문구, 선택지 등)을 한 번만 만든다."""
+        try:
+            return self._memo[name]
+        except KeyError:
+            value = self._memo[name] = build()
+            return value
+
+
+def defaults_from_config() -> Dict[str, Any]:
+    return {name: getattr(config, name) for name in TUNABLE}
+
+
+def _check_type(name: str, value: Any) -> Optional[str]:
+    kind = TUNABLE.get(name)
+    if kind is None:
+        return f"{name}: 바꿀 수 없는 항목입니다."
+    if kind == INT and (isinstance(value, bool) or not isinstance(value, int)):
+        return f"{name}: 정수여야 합니다."
+    if kind == FLOAT and (isinstance(value, bool) or not isinstance(value, (int, float))):
+        return f"{name}: 숫자여야 합니다."
+    if kind == STR and not isinstance(value, str):
+        return f"{name}: 문자열이어야 합니다."
+    if kind == INT_LIST and (
+        not isinstance(value, list) or any(isinstance(v, bool) or not isinstance(v, int) for v in value)
+    ):
+        return f"{name}: 정수 목록이어야 합니다."
+    return None
+
+
+def validate(values: Dict[str, Any]) -> List[str]:
+    """합쳐진 설정 전체를 검사해 오류 목록을 돌려준다. 비어 있으면 통과."""
+    errors = [e for e in (_check_type(name, value) for name, value in values.items()) if e]
+    if errors:
+        return errors
+
+    v = values
+    for name, kind in TUNABLE.items():
+        if kind == INT and v[name] < 0:
+            errors.append(f"{name}: 0 이상이어야 합니다.")
+    for name in ('SOLO_BET', 'DUO_UNIT', 'DUO_MIN_BET', 'GIFT_MIN', 'GIFT_STEP', 'GIFT_MAX_RECIPIENTS',
+                 'MODAL_TIME_LIMIT', 'INVITE_TIME_LIMIT', 'BUTTON_TIME_LIMIT', 'PLAY_LOCK_TIMEOUT',
+                 'MATCH_QUEUE_TIMEOUT', 'TOURNAMENT_JOIN_TIME'):
+        if v[name] <= 0:
+            errors.append(f"{name}: 0보다 커야 합니다.")
+    if errors:
+        return errors
+
+    if v['INITIAL_TOKENS'] > config.MAX_TOKENS or v['DAILY_FLOOR'] > config.MAX_TOKENS:
+        errors.append(f"INITIAL_TOKENS, DAILY_FLOOR: 보유 상한({config.MAX_TOKENS}) 이하여야 합니다.")
+    if not 0 <= v['DAILY_RESET_HOUR'] <= 23:
+        errors.append("DAILY_RESET_HOUR 는 0 ~ 23 이어야 합니다.")
+    try:
+        ZoneInfo(v['TIMEZONE'])
+    except (ZoneInfoNotFoundError, ValueError):
+        errors.append(f"TIMEZONE: 알 수 없는 시간대입니다. ({v['TIMEZONE']})")
+    if not v['DICE_MIN'] < v['DICE_MAX']:
+        errors.append("DICE_MIN 은 DICE_MAX 보다 작아야 합니다.")
+    if v['DICE_MAX'] - v['DICE_MIN'] + 1 > config.SELECT_MAX_OPTIONS:
+        errors.append(f"숫자 범위는 {config.SELECT_MAX_OPTIONS}개 이하여야 합니다. (선택 메뉴 상한)")
+    if v['DUO_MIN_BET'] % v['DUO_UNIT']:
+        errors.append("DUO_MIN_BET 은 DUO_UNIT 의 배수여야 합니다.")
+
+    for name in ('DUO_BET_LADDER', 'TOURNAMENT_FEES'):
+        amounts = v[name]
+        if not amounts:
+            errors.append(f"{name}: 비어 있으면 안 됩니다.")
+        elif any(a <= 0 for a in amounts) or any(a >= b for a, b in zip(amounts, amounts[1:])):
+            errors.append(f"{name}: 0보다 큰 값이 커지는 순서여야 합니다.")
+        elif len(amounts) > config.SELECT_MAX_OPTIONS - (1 if name == 'DUO_BET_LADDER' else 0):
+            errors.append(f"{name}: 선택 메뉴 상한({config.SELECT_MAX_OPTIONS}개)을 넘습니다.")
+
+    if not v['GIFT_MIN'] <= v['GIFT_MAX']:
+        errors.append("GIFT_MIN 은 GIFT_MAX 이하여야 합니다.")
+    elif len(range(v['GIFT_MIN'], v['GIFT_MAX'] + 1, v['GIFT_STEP'])) > config.SELECT_MAX_OPTIONS:
+        errors.append(f"선물 금액 선택지가 {config.SELECT_MAX_OPTIONS}개를 넘습니다. GIFT_STEP 을 늘려주세요.")
+    if not 0 < v['GIFT_RATIO'] <= 1:
+        errors.append("GIFT_RATIO 는 0보다 크고 1 이하여야 합니다.")
+    if v['GIFT_MAX_RECIPIENTS'] > config.SELECT_MAX_OPTIONS:
+        errors.append(f"GIFT_MAX_RECIPIENTS 는 {config.SELECT_MAX_OPTIONS} 이하여야 합니다.")
+    elif v['GIFT_MAX_RECIPIENTS'] * v['GIFT_MIN'] > v['GIFT_MAX']:
+        # 합계가 GIFT_MAX를 넘을 수 없으므로, 그보다 많이 고르면 제출해도 항상 거절된다.
+        errors.append("GIFT_MAX_RECIPIENTS × GIFT_MIN 은 GIFT_MAX 이하여야 합니다.")
+    if not 2 <= v['TOURNAMENT_MIN_PLAYERS'] <= config.TOURNAMENT_MAX_PLAYERS:
+        errors.append(f"TOURNAMENT_MIN_PLAYERS 는 2 ~ {config.TOURNAMENT_MAX_PLAYERS} 여야 합니다.")
+    for name in ('MATCH_QUEUE_TIMEOUT', 'TOURNAMENT_JOIN_TIME', 'BUTTON_TIME_LIMIT'):
+        if v[name] > MAX_WAIT_SECONDS:
+            errors.append(f"{name}: {MAX_WAIT_SECONDS}초 이하여야 합니다.")
+    return errors
+
+
+class RuntimeSettings:
+    def __init__(self, data_dir: Optional[str] = None):
+        self.path = os.path.join(data_dir or config.DATA_DIR, 'game_config.json')
+        self._base = defaults_from_config()
+        # (기본 설정, {guild_id: 서버별 설정}, 파일 상태). 읽기는 이 튜플 하나만 보므로 통째로 바꾸면 된다.
+        self._state: Tuple[GameSettings, Dict[int, GameSettings], Optional[Tuple[int, int]]] = (
+            GameSettings(self._base, 0), {}, None,
+        )
+        self.version = 0
+        self.last_error: Optional[str] = None
+
+    def get(self, guild_id: Optional[int]) -> GameSettings:
+        defaults, per_guild, _ = self._state
+        if guild_id is None:
+            return defaults
+        return per_guild.get(guild_id, defaults)
+
+    def overrides(self, guild_id: int) -> Dict[str, Any]:
+        """config.py 기본값과 다른 항목. 안내용."""
+        current = self.get(guild_id)
+        changed = {}
+        for name in TUNABLE:
+            value, base = getattr(current, name), self._base[name]
+            if value != (tuple(base) if isinstance(base, list) else base):
+                changed[name] = value
+        return changed
+
+    def _file_state(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self, force: bool = False) -> bool:
+        """파일이 바뀌었으면 다시 읽는다. 설정을 바꿨으면 True.
+
+        형식이 틀리면 이전 설정을 유지하고 last_error에 사유를 남긴다.
+        """
+        file_state = self._file_state()
+        if not force and file_state == self._state[2]:
+            return False
+
+        try:
+            raw = self._read() if file_state is not None else {}
+            defaults, per_guild = self._build(raw)
+        except ValueError as e:
+            self.last_error = str(e)
+            # 같은 파일로 오류를 되풀이해 남기지 않도록 상태는 기억해 둔다.
+            self._state = (self._state[0], self._state[1], file_state)
+            print(f"[settings] {self.path} 을(를) 적용하지 않았습니다: {e}")
+            return False
+
+        self.version += 1
+        self._state = (
+            GameSettings(defaults, self.version),
+            {gid: GameSettings(values, self.version) for gid, values in per_guild.items()},
+            file_state,
+        )
+        self.last_error = None
+        print(f"[settings] 설정 {self.version}판을 적용했습니다. (서버별 설정 {len(per_guild)}개)")
+        return True
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON 형식 오류: {e}")
+        if not isinstance(raw, dict):
+            raise ValueError("최상위는 객체여야 합니다.")
+        return raw
+
+    def _build(self, raw: dict) -> Tuple[Dict[str, Any], Dict[int, Dict[str, Any]]]:
+        if not isinstance(raw.get('defaults', {}), dict) or not isinstance(raw.get('guilds', {}), dict):
+            raise ValueError("defaults, guilds 는 객체여야 합니다.")
+        defaults = dict(self._base)
+        defaults.update(raw.get('defaults', {}))
+        errors = validate(defaults)
+        if errors:
+            raise ValueError("; ".join(errors))
+
+        per_guild = {}
+        for gid, values in raw.get('guilds', {}).items():
+            if not str(gid).isdigit() or not isinstance(values, dict):
+                raise ValueError(f"guilds.{gid}: 서버 ID와 설정 객체여야 합니다.")
+            merged = dict(defaults)
+            merged.update(values)
+            errors = validate(merged)
+            if errors:
+                raise ValueError(f"서버 {gid}: " + "; ".join(errors))
+            per_guild[int(gid)] = merged
+        return defaults, per_guild
+
+
+settings = RuntimeSettings()
@@ -0,0 +1,327 @@
+"""경제 시뮬레이터.
+
+ODD_EVEN_REWARD, NUMBER_REWARD, DAILY_FLOOR, DUO_BET_LADDER 같은 설정값을 실제 서버에서 바꿔 보기 전에,
+가상의 서버 여러 개를 며칠씩 돌려 발행량이 얼마나 불어나고 보유량이 얼마나 한쪽으로 몰리는지 본다.
+봇과 별개로 실행하는 도구다.
+
+    python simulator.py                                         # 지금 설정
+    python simulator.py --set NUMBER_REWARD=500 --set DAILY_FLOOR=800
+    python simulator.py --set 'DUO_BET_LADDER=[100,500,1000]' --days 180
+    python simulator.py --guild 123456789012345678 --servers 400 --members 1000
+    python simulator.py --mix casual=0.5,grinder=0.3,gambler=0.1,giver=0.1
+
+- 규칙은 bot.py 가 정산에 쓰는 rules.py 의 함수를 그대로 쓴다. (판정, 베팅 선택지, 선물 손실, 매일 보정, 상한)
+- 한 서버의 인원은 NumPy 배열 하나로 다루고 하루치 행동을 배열 연산으로 처리한다.
+- 서버끼리는 토큰이 오가지 않으므로 서버 하나를 작업 하나로 나눠 모든 코어에서 돌린다.
+- --set 을 주면 같은 난수로 지금 설정과 바꾼 설정을 나란히 돌려 비교한다.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import config
+from analytics import gini
+from rules import (
+    GAME_NUMBER,
+    GAME_ODD_EVEN,
+    bet_limit,
+    bet_options,
+    clamp,
+    gift_amounts,
+    gift_received,
+    rolls,
+    solo_correct,
+    solo_delta,
+    topped_up,
+)
+from settings import TUNABLE, GameSettings, RuntimeSettings, defaults_from_config, validate
+
+BET_MIN = 'min'
+BET_RANDOM = 'random'
+BET_MAX = 'max'
+BET_STYLES = (BET_MIN, BET_RANDOM, BET_MAX)
+
+# 행동 유형. 모두 하루 기준이다.
+# solo: 혼자놀기 판 수 평균(포아송), number: 혼자놀기 중 숫자 맞추기를 고를 확률,
+# duo: 같이놀기에 나설 확률, bet: 고르는 베팅액(선택지 중 가장 작은 것/아무거나/가장 큰 것),
+# gift: 선물할 확률
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'casual': {'solo': 2.0, 'number': 0.3, 'duo': 0.1, 'bet': BET_MIN, 'gift': 0.02},
+    'grinder': {'solo': 20.0, 'number': 0.5, 'duo': 0.2, 'bet': BET_RANDOM, 'gift': 0.0},
+    'gambler': {'solo': 5.0, 'number': 0.8, 'duo': 0.6, 'bet': BET_MAX, 'gift': 0.0},
+    'giver': {'solo': 1.0, 'number': 0.2, 'duo': 0.05, 'bet': BET_MIN, 'gift': 0.5},
+}
+DEFAULT_MIX = 'casual=0.6,grinder=0.2,gambler=0.1,giver=0.1'
+
+# 서버마다 하루에 남기는 지표
+METRICS = ('supply', 'minted_floor', 'solo_net', 'duo_volume', 'burned_gift', 'gini', 'top10_share', 'at_floor')
+
+
+# ----------------------------------------------------------------------
+# 서버 하나 (작업 프로세스에서 돈다)
+# ----------------------------------------------------------------------
+def _play_solo(balance: np.ndarray, games: np.ndarray, number_game: np.ndarray, guess: np.ndarray,
+               cfg: GameSettings, rng: np.random.Generator) -> None:
+    """혼자놀기를 판 수만큼. 같은 날에는 같은 게임·같은 답으로 하고, 보유량이 참가비 미만이면 멈춘다. (play_rounds)"""
+    numbers_range = list(range(cfg.DICE_MIN, cfg.DICE_MAX + 1))
+    for round_ in range(int(games.max(initial=0))):
+        active = np.flatnonzero((games > round_) & (balance >= cfg.SOLO_BET))
+        if active.size == 0:
+            break
+        numbers = rolls(cfg, active.size, rng)
+        delta = np.empty(active.size, dtype=np.int64)
+        is_number = number_game[active]
+        answers = guess[active]
+        for game, choices in ((GAME_ODD_EVEN, ("짝", "홀")), (GAME_NUMBER, numbers_range)):
+            in_game = is_number if game == GAME_NUMBER else ~is_number
+            for index, answer in enumerate(choices):
+                mask = in_game & (answers % len(choices) == index)
+                if mask.any():
+                    delta[mask] = solo_delta(game, solo_correct(game, str(answer), numbers[mask]), cfg)
+        balance[active] = clamp(balance[active] + delta, config.MAX_TOKENS)
+
+
+def _play_duels(balance: np.ndarray, want: np.ndarray, style: np.ndarray,
+                cfg: GameSettings, rng: np.random.Generator) -> int:
+    """나선 사람끼리 무작위로 짝지어 한 판씩. 건 금액의 합을 돌려준다."""
+    players = rng.permutation(np.flatnonzero(want))
+    players = players[: players.size // 2 * 2]
+    first, second = players[0::2], players[1::2]
+    limit = bet_limit(np.minimum(balance[first], balance[second]), cfg)
+    ok = limit >= cfg.DUO_MIN_BET
+    first, second, limit = first[ok], second[ok], limit[ok]
+    if first.size == 0:
+        return 0
+
+    # 선택지는 한도마다 bet_options 로 만든다. 신청한 쪽(first)의 성향대로 고른다.
+    limits, inverse = np.unique(limit, return_inverse=True)
+    options = [bet_options(int(m), cfg) for m in limits]
+    width = max(len(o) for o in options)
+    table = np.array([o + [o[-1]] * (width - len(o)) for o in options], dtype=np.int64)
+    counts = np.array([len(o) for o in options])[inverse]
+    chooser = style[first]
+    anything = (rng.random(first.size) * counts).astype(np.int64)
+    pick = np.where(
+        chooser == BET_STYLES.index(BET_MIN), 0,
+        np.where(chooser == BET_STYLES.index(BET_MAX), counts - 1, anything),
+    )
+    stake = table[inverse, pick]
+
+    # duel_rolls: 서로 다른 숫자가 나올 때까지 다시 뽑고 큰 쪽이 이긴다.
+    mine, theirs = rolls(cfg, first.size, rng), rolls(cfg, first.size, rng)
+    tie = mine == theirs
+    while tie.any():
+        mine[tie], theirs[tie] = rolls(cfg, int(tie.sum()), rng), rolls(cfg, int(tie.sum()), rng)
+        tie = mine == theirs
+    winner = np.where(mine > theirs, first, second)
+    loser = np.where(mine > theirs, second, first)
+    balance[winner] = clamp(balance[winner] + stake, config.MAX_TOKENS)
+    balance[loser] -= stake
+    return int(stake.sum())
+
+
+def _give_gifts(balance: np.ndarray, want: np.ndarray, cfg: GameSettings, rng: np.random.Generator) -> int:
+    """선물할 사람이 무작위 상대에게 한 번씩. 사라진 양을 돌려준다."""
+    amounts = gift_amounts(cfg)
+    sent_table = np.array(amounts, dtype=np.int64)
+    received_table = np.array([gift_received(a, cfg) for a in amounts], dtype=np.int64)
+    givers = np.flatnonzero(want)
+    if givers.size == 0 or balance.size < 2:
+        return 0
+    receivers = (givers + rng.integers(1, balance.size, size=givers.size)) % balance.size
+    choice = rng.integers(0, len(amounts), size=givers.size)
+    sent, received = sent_table[choice], received_table[choice]
+    ok = balance[givers] >= sent
+    givers, receivers, sent, received = givers[ok], receivers[ok], sent[ok], received[ok]
+    balance[givers] -= sent
+    np.add.at(balance, receivers, received)
+    balance[:] = clamp(balance, config.MAX_TOKENS)
+    return int((sent - received).sum())
+
+
+def simulate_server(job: Tuple[Dict[str, Any], List[Tuple[str, float]], int, int, int]) -> Dict[str, np.ndarray]:
+    """가상의 서버 하나를 days 일 동안 돌리고 날짜별 지표를 돌려준다."""
+    values, mix, members, days, seed = job
+    cfg = GameSettings(values, 0)
+    rng = np.random.default_rng(seed)
+
+    names = [name for name, _ in mix]
+    shares = np.array([share for _, share in mix], dtype=np.float64)
+    kind = rng.choice(len(names), size=members, p=shares / shares.sum())
+    solo = np.array([PROFILES[n]['solo'] for n in names])[kind]
+    number = np.array([PROFILES[n]['number'] for n in names])[kind]
+    duo = np.array([PROFILES[n]['duo'] for n in names])[kind]
+    gift = np.array([PROFILES[n]['gift'] for n in names])[kind]
+    style = np.array([BET_STYLES.index(PROFILES[n]['bet']) for n in names])[kind]
+
+    balance = np.full(members, clamp(cfg.INITIAL_TOKENS, config.MAX_TOKENS), dtype=np.int64)
+    out = {name: np.zeros(days, dtype=np.float64) for name in METRICS}
+    top = max(members // 10, 1)
+    for day in range(days):
+        before = balance.sum()
+        balance = topped_up(balance, cfg.DAILY_FLOOR)
+        out['minted_floor'][day] = balance.sum() - before
+
+        before = balance.sum()
+        _play_solo(
+            balance, rng.poisson(solo), rng.random(members) < number,
+            rng.integers(0, 1 << 30, size=members), cfg, rng,
+        )
+        out['solo_net'][day] = balance.sum() - before
+        out['duo_volume'][day] = _play_duels(balance, rng.random(members) < duo, style, cfg, rng)
+        out['burned_gift'][day] = _give_gifts(balance, rng.random(members) < gift, cfg, rng)
+
+        supply = balance.sum()
+        out['supply'][day] = supply
+        out['gini'][day] = gini(balance)
+        out['top10_share'][day] = np.partition(balance, members - top)[-top:].sum() / supply if supply else 0.0
+        out['at_floor'][day] = (balance <= cfg.DAILY_FLOOR).mean()
+    return out
+
+
+# ----------------------------------------------------------------------
+# 실행과 집계
+# ----------------------------------------------------------------------
+def run(values: Dict[str, Any], mix: List[Tuple[str, float]], servers: int, members: int, days: int,
+        seed: int, workers: Optional[int]) -> Dict[str, np.ndarray]:
+    """{지표: (servers, days) 배열}. 서버 i는 항상 seed+i 로 돌아가므로 설정만 바꿔 비교할 수 있다."""
+    workers = workers or os.cpu_count() or 1
+    jobs = [(values, mix, members, days, seed + i) for i in range(servers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(simulate_server, jobs, chunksize=max(1, servers // (4 * workers))))
+    return {name: np.stack([r[name] for r in results]) for name in METRICS}
+
+
+def summarize(result: Dict[str, np.ndarray], members: int, every: int) -> dict:
+    """서버를 합쳐 날짜별 지표로. 발행량은 1인당, 물가 상승(inflation)은 전날 대비 총발행량 증가율."""
+    supply = result['supply'].sum(axis=0)
+    previous = np.concatenate([supply[:1], supply[:-1]])
+    inflation = np.where(previous > 0, supply / previous - 1, 0.0)
+    servers = result['supply'].shape[0]
+    rows = []
+    days = supply.size
+    for day in sorted(set(range(every - 1, days, every)) | {0, days - 1}):
+        rows.append({
+            'day': day + 1,
+            'supply_per_member': round(float(supply[day]) / (servers * members), 1),
+            'inflation': round(float(inflation[day]), 5),
+            'minted_floor': int(result['minted_floor'][:, day].sum()),
+            'solo_net': int(result['solo_net'][:, day].sum()),
+            'burned_gift': int(result['burned_gift'][:, day].sum()),
+            'duo_volume': int(result['duo_volume'][:, day].sum()),
+            'gini': round(float(result['gini'][:, day].mean()), 4),
+            'gini_p90': round(float(np.percentile(result['gini'][:, day], 90)), 4),
+            'top10_share': round(float(result['top10_share'][:, day].mean()), 4),
+            'at_floor': round(float(result['at_floor'][:, day].mean()), 4),
+        })
+    growth = float(supply[-1] / supply[0]) if supply[0] else 0.0
+    return {
+        'rows': rows,
+        'supply_growth': round(growth, 4),
+        'daily_inflation': round(growth ** (1 / max(days - 1, 1)) - 1, 5),
+        'final_gini': rows[-1]['gini'],
+        'final_top10_share': rows[-1]['top10_share'],
+    }
+
+
+def _parse_mix(text: str) -> List[Tuple[str, float]]:
+    mix = []
+    for part in text.split(','):
+        name, _, share = part.partition('=')
+        name = name.strip()
+        if name not in PROFILES:
+            raise SystemExit(f"알 수 없는 행동 유형입니다: {name} (가능: {', '.join(PROFILES)})")
+        mix.append((name, float(share or 1)))
+    return mix
+
+
+def _parse_set(items: List[str], values: Dict[str, Any]) -> Dict[str, Any]:
+    changed = dict(values)
+    for item in items:
+        name, _, raw = item.partition('=')
+        name = name.strip()
+        if name not in TUNABLE:
+            raise SystemExit(f"{name}: 바꿀 수 없는 항목입니다.")
+        try:
+            changed[name] = json.loads(raw)
+        except ValueError:
+            changed[name] = raw
+    errors = validate(changed)
+    if errors:
+        raise SystemExit("\n".join(errors))
+    return changed
+
+
+def _print_rows(label: str, summary: dict) -> None:
+    print(label)
+    print(f"  {'일':>4} {'1인당':>10} {'증가율':>8} {'보정 발행':>12} {'혼자놀기':>12} {'선물 소멸':>10}"
+          f" {'지니':>7} {'상위10%':>8} {'기준선 이하':>10}")
+    for row in summary['rows']:
+        print(f"  {row['day']:>4} {row['supply_per_member']:>10,.0f} {row['inflation']:>8.2%}"
+              f" {row['minted_floor']:>12,} {row['solo_net']:>12,} {row['burned_gift']:>10,}"
+              f" {row['gini']:>7.3f} {row['top10_share']:>8.1%} {row['at_floor']:>10.1%}")
+    print(f"  총발행량 {summary['supply_growth']:.2f}배 (하루 평균 {summary['daily_inflation']:+.2%}), "
+          f"지니 {summary['final_gini']:.3f}, 상위 10% 보유 {summary['final_top10_share']:.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='경제 시뮬레이터')
+    parser.add_argument('--set', action='append', default=[], metavar='이름=값',
+                        help='바꿔 볼 설정값. 목록은 JSON으로 (여러 번 줄 수 있다)')
+    parser.add_argument('--guild', type=int, default=None, help='이 서버의 game_config.json 설정에서 시작한다')
+    parser.add_argument('--servers', type=int, default=200, help='가상 서버 수')
+    parser.add_argument('--members', type=int, default=500, help='서버당 인원')
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'행동 유형 비율 (기본 {DEFAULT_MIX})')
+    parser.add_argument('--every', type=int, default=7, help='며칠마다 한 줄씩 보여줄지')
+    parser.add_argument('--workers', type=int, default=None, help='작업 프로세스 수 (기본: 코어 수)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=config.DATA_DIR)
+    parser.add_argument('--out', default=None, help='보고서 경로 (기본: DATA_DIR/reports/)')
+    args = parser.parse_args()
+
+    if args.guild is not None:
+        runtime = RuntimeSettings(args.data_dir)
+        runtime.reload(force=True)
+        current = runtime.get(args.guild)
+        values = {name: list(v) if isinstance(v, tuple) else v
+                  for name, v in ((name, getattr(current, name)) for name in TUNABLE)}
+    else:
+        values = defaults_from_config()
+    mix = _parse_mix(args.mix)
+    scenarios = [('지금 설정', values)]
+    if args.set:
+        scenarios.append(('바꾼 설정 (' + ', '.join(args.set) + ')', _parse_set(args.set, values)))
+
+    report = {
+        'generated_at': date.today().isoformat(),
+        'servers': args.servers, 'members': args.members, 'days': args.days, 'mix': dict(mix), 'seed': args.seed,
+        'scenarios': [],
+    }
+    player_days = args.servers * args.members * args.days
+    for label, scenario in scenarios:
+        started = time.perf_counter()
+        result = run(scenario, mix, args.servers, args.members, args.days, args.seed, args.workers)
+        elapsed = time.perf_counter() - started
+        summary = summarize(result, args.members, max(args.every, 1))
+        changed = {name: scenario[name] for name in scenario if scenario[name] != values[name]}
+        report['scenarios'].append({'label': label, 'changed': changed, **summary})
+        _print_rows(f"{label}: 서버 {args.servers:,}개 × {args.members:,}명 × {args.days}일 "
+                    f"({player_days:,} 인원·일, {elapsed:.1f}초)", summary)
+
+    out = args.out or os.path.join(args.data_dir, 'reports', f"simulation-{date.today().isoformat()}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"보고서: {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""시작 비용 측정.
+
+재시작할 때 봇이 멈춰 있는 시간은 대부분 import와 저장소 불러오기다. 두 가지를 따로 재서
+DATA_DIR/reports/startup.jsonl 에 한 줄씩 쌓고, 지난 측정과 비교해 보여준다.
+
+- import: 새 프로세스에서 `python -X importtime -c "import bot"` 를 실행해 모듈별 누적 시간을 읽는다.
+- 저장소: 새 프로세스에서 store.load() 에 걸린 시간을 잰다. (파일 캐시 영향을 줄이려 매번 새 프로세스)
+
+    python startup_report.py                 # 측정하고 기록에 남긴다
+    python startup_report.py --runs 5        # 5번 재서 중앙값을 남긴다
+    python startup_report.py --history 20    # 최근 20번의 기록만 보여준다
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import config
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LOAD_SNIPPET = (
+    "import time\n"
+    "from storage import store\n"
+    "started = time.perf_counter()\n"
+    "store.load()\n"
+    "print(round((time.perf_counter() - started) * 1000, 1))\n"
+)
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = HERE + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def measure_imports() -> Tuple[float, List[Tuple[str, float]]]:
+    """(bot import 전체 ms, [(최상위 모듈, 누적 ms)])"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import bot'],
+        cwd=HERE, env=_env(), capture_output=True, text=True, check=True,
+    )
+    total = 0.0
+    top: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue    # 머리글 줄
+        depth = (len(name) - len(name.lstrip())) // 2
+        ms = int(cumulative) / 1000
+        name = name.strip()
+        if depth == 0:
+            # 자식 모듈이 부모보다 먼저 찍힌다. bot 이 아닌 최상위 줄(site 등 인터프리터 시작)이면
+            # 그때까지 모은 것은 bot 과 상관없다.
+            if name == 'bot':
+                total = ms
+                break
+            top = {}
+        elif depth == 1:
+            # bot이 직접 불러온 모듈. 최상위 이름으로 합친다.
+            root = name.split('.')[0]
+            top[root] = top.get(root, 0.0) + ms
+    return total, sorted(top.items(), key=lambda item: item[1], reverse=True)
+
+
+def measure_load() -> float:
+    result = subprocess.run(
+        [sys.executable, '-c', LOAD_SNIPPET],
+        cwd=HERE, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def history_path(data_dir: str) -> str:
+    return os.path.join(data_dir, 'reports', 'startup.jsonl')
+
+
+def read_history(path: str) -> List[dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='시작 비용(import·저장소 불러오기) 측정')
+    parser.add_argument('--runs', type=int, default=3, help='측정 횟수. 중앙값을 남긴다')
+    parser.add_argument('--history', type=int, default=10, help='보여줄 지난 기록 수')
+    parser.add_argument('--data-dir', default=config.DATA_DIR)
+    args = parser.parse_args()
+
+    imports, loads, modules = [], [], []
+    for _ in range(max(args.runs, 1)):
+        total, top = measure_imports()
+        imports.append(total)
+        modules.append(dict(top))
+        loads.append(measure_load())
+
+    names = sorted({name for run in modules for name in run})
+    by_module = {name: statistics.median(run.get(name, 0.0) for run in modules) for name in names}
+    record = {
+        'at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'import_ms': round(statistics.median(imports), 1),
+        'load_ms': round(statistics.median(loads), 1),
+        'modules': {
+            name: round(ms, 1)
+            for name, ms in sorted(by_module.items(), key=lambda item: item[1], reverse=True)[:10]
+        },
+    }
+
+    path = history_path(args.data_dir)
+    previous = read_history(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    print(f"import bot      {record['import_ms']:>8.1f} ms")
+    print(f"store.load()    {record['load_ms']:>8.1f} ms")
+    print("import 상위 모듈")
+    for name, ms in record['modules'].items():
+        print(f"  {name:<20} {ms:>8.1f} ms")
+
+    if previous:
+        last = previous[-1]
+        print(f"지난 측정({last['at']}) 대비: import {record['import_ms'] - last['import_ms']:+.1f} ms, "
+              f"불러오기 {record['load_ms'] - last['load_ms']:+.1f} ms")
+    print(f"기록 ({path})")
+    for row in (previous + [record])[-args.history:]:
+        print(f"  {row['at']}  import {row['import_ms']:>8.1f} ms  불러오기 {row['load_ms']:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
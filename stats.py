@@ -0,0 +1,143 @@
+"""놀이별 전적.
+
+(서버, 인원, 게임)마다 판수·승수·얻은 토큰·잃은 토큰·현재 연속 기록·최고 연승을 센다.
+한 사람당 객체를 만들지 않고 열마다 정수 배열 하나씩 두는 구조(struct-of-arrays)라
+인원이 많아도 한 줄에 수십 바이트면 된다. 갱신은 색인 조회 한 번과 배열 쓰기 몇 번이다.
+
+판마다의 결과는 보유량 일지에 커밋과 함께 (인원, 게임, 증감)으로만 적는다. 표 전체는 파일 쓰기
+스레드가 새 스냅숏을 쓸 때 그 seq와 함께 stats.bin 으로 쓰고, 불러올 때는 그 뒤의 일지를 다시 센다.
+"""
+
+import struct
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+STAT_ODD_EVEN = 1
+STAT_NUMBER = 2
+STAT_DUO = 3
+
+STAT_NAMES = {
+    STAT_ODD_EVEN: "홀짝 맞추기",
+    STAT_NUMBER: "숫자 맞추기",
+    STAT_DUO: "같이놀기",
+}
+
+# 표식, 행 수, 이 표에 반영된 마지막 커밋 번호
+HEADER = struct.Struct('<4sIQ')
+MAGIC = b'STA2'
+
+# 보유 순서대로 파일에 쓴다. (이름, array 형식)
+COLUMNS = (
+    ('guilds', 'Q'),
+    ('users', 'Q'),
+    ('games', 'B'),
+    ('plays', 'q'),
+    ('wins', 'q'),
+    ('won', 'q'),
+    ('lost', 'q'),
+    ('streak', 'q'),   # 양수면 연승, 음수면 연패
+    ('best', 'q'),     # 최고 연승
+)
+
+
+class Record(NamedTuple):
+    game: int
+    plays: int
+    wins: int
+    won: int
+    lost: int
+    streak: int
+    best: int
+
+
+class GameStats:
+    def __init__(self):
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+        # (guild_id, user_id, game) -> 행 번호
+        self._rows: Dict[Tuple[int, int, int], int] = {}
+        # (guild_id, user_id) -> 그 사람의 행 번호들
+        self._by_user: Dict[Tuple[int, int], List[int]] = {}
+        # 파일에서 읽었을 때 그 파일에 반영된 마지막 커밋 번호
+        self.seq = 0
+
+    def __len__(self) -> int:
+        return len(self.plays)
+
+    def _row(self, guild_id: int, user_id: int, game: int) -> int:
+        key = (guild_id, user_id, game)
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self.plays)
+            self.guilds.append(guild_id)
+            self.users.append(user_id)
+            self.games.append(game)
+            for name, _ in COLUMNS[3:]:
+                getattr(self, name).append(0)
+            self._by_user.setdefault((guild_id, user_id), []).append(row)
+        return row
+
+    def record(self, guild_id: int, user_id: int, game: int, delta: int) -> None:
+        """한 판의 결과를 반영한다. 토큰을 얻었으면 이긴 판으로 센다."""
+        row = self._row(guild_id, user_id, game)
+        self.plays[row] += 1
+        if delta > 0:
+            self.wins[row] += 1
+            self.won[row] += delta
+            streak = self.streak[row] + 1 if self.streak[row] > 0 else 1
+            if streak > self.best[row]:
+                self.best[row] = streak
+        else:
+            self.lost[row] -= delta
+            streak = self.streak[row] - 1 if self.streak[row] < 0 else -1
+        self.streak[row] = streak
+
+    def get(self, guild_id: int, user_id: int) -> List[Record]:
+        return [
+            Record(self.games[row], self.plays[row], self.wins[row], self.won[row],
+                   self.lost[row], self.streak[row], self.best[row])
+            for row in self._by_user.get((guild_id, user_id), [])
+        ]
+
+    def copy(self) -> 'GameStats':
+        """파일 쓰기 스레드가 따로 들고 갈 사본. 열마다 배열을 통째로 복사한다."""
+        other = GameStats()
+        for name, typecode in COLUMNS:
+            setattr(other, name, array(typecode, getattr(self, name)))
+        other._rows = dict(self._rows)
+        other._by_user = {key: list(rows) for key, rows in self._by_user.items()}
+        other.seq = self.seq
+        return other
+
+    # ------------------------------------------------------------------
+    # 파일 형식: 머리글(표식, 행 수, seq) 뒤에 열마다 배열 바이트를 이어 붙인다.
+    # ------------------------------------------------------------------
+    def to_bytes(self, seq: int = 0) -> bytes:
+        parts = [HEADER.pack(MAGIC, len(self), seq)]
+        parts += [getattr(self, name).tobytes() for name, _ in COLUMNS]
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'GameStats':
+        stats = cls()
+        magic, count, stats.seq = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError('stats 파일 형식이 아닙니다.')
+        offset = HEADER.size
+        for name, typecode in COLUMNS:
+            column = array(typecode)
+            size = column.itemsize * count
+            column.frombytes(data[offset:offset + size])
+            if len(column) != count:
+                raise ValueError('stats 파일이 잘렸습니다.')
+            setattr(stats, name, column)
+            offset += size
+        for row in range(count):
+            guild_id, user_id = stats.guilds[row], stats.users[row]
+            stats._rows[(guild_id, user_id, stats.games[row])] = row
+            stats._by_user.setdefault((guild_id, user_id), []).append(row)
+        return stats
+
+
+def win_rate(record: Record) -> Optional[float]:
+    return record.wins / record.plays if record.plays else None
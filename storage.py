@@ -1,37 +1,136 @@
 """토큰 보유량 저장소.
 
-서버(길드)별로 사용자의 토큰 보유량을 JSON 파일에 저장한다.
+서버(길드)별로 사용자의 토큰 보유량을 파일에 저장한다. 파일 형식은 tokenfile 모듈에 있다.
 디스코드에서는 조회만 가능하고, 값을 바꾸는 경로는 이 모듈뿐이다.
 """
 
 import asyncio
+import base64
+import bisect
 import json
+import math
 import os
+import struct
 import tempfile
-from typing import Dict, Iterable, List, Optional, Tuple
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
 import config
+from admission import MeteredLock
+from ledger import (
+    REASON_DUO,
+    REASON_GIFT,
+    REASON_INITIAL,
+    REASON_OTHER,
+    REASON_TOPUP,
+    Ledger,
+)
+from persistence import PersistenceWorker
+from rules import clamp, topped_up
+from stats import STAT_DUO, GameStats
+from tokenfile import TokenFiles
+
+# 서버를 떠난 계정의 보정 회차(LAZY_FLOOR). 어느 회차보다도 뒤라서 떠나 있는 동안의 기준선을 받지 않는다.
+AWAY_EPOCH = 1 << 62
+
+
+class SettlementError(Exception):
+    """정산 조건을 만족하지 못해 아무것도 반영하지 않았다."""
+
+    def __init__(self, user_id: int, balance: int, required: int):
+        super().__init__(f"user {user_id}: balance {balance} < required {required}")
+        self.user_id = user_id
+        self.balance = balance
+        self.required = required
 
 
 class TokenStore:
     def __init__(self, data_dir: str = None):
         self.data_dir = data_dir or config.DATA_DIR
-        self.path = os.path.join(self.data_dir, 'tokens.json')
-        self._lock = asyncio.Lock()
+        # 스냅숏 + 변동 일지. 예전 형식(tokens.json)은 처음 불러올 때 옮긴다.
+        self.files = TokenFiles(self.data_dir)
+        self.path = self.files.path
+        self.legacy_path = os.path.join(self.data_dir, 'tokens.json')
+        self._lock = MeteredLock()
         # {guild_id(str): {user_id(str): balance(int)}}
         self._balances: Dict[str, Dict[str, int]] = {}
         # {guild_id(str): "YYYY-MM-DD"} - 마지막으로 일일 보정을 한 날짜
         self._last_topup: Dict[str, str] = {}
+        # 늦춘 보정(LAZY_FLOOR). {guild_id(str): [(회차, 기준선)]}, 회차 번호는 1부터.
+        # 뒤 회차에 더 높거나 같은 기준선이 있는 회차는 버리므로 기준선 값이 바뀐 만큼만 남는다.
+        self._floors: Dict[str, List[Tuple[int, int]]] = {}
+        # {guild_id(str): {user_id(str): 마지막으로 기준선을 반영한 회차}}. 없으면 0회차, 떠난 계정은 AWAY_EPOCH.
+        self._epochs: Dict[str, Dict[str, int]] = {}
+        # 모든 변동 기록. 토큰 파일을 쓸 때 함께 디스크에 반영한다.
+        self.ledger = Ledger(self.data_dir)
+        # 놀이별 전적. 바뀐 것이 있으면 보유량 파일을 쓸 때 함께 쓴다.
+        self.stats_path = os.path.join(self.data_dir, 'stats.bin')
+        self.stats = GameStats()
+        # 커밋할 때마다 1씩 늘어나는 번호. 대기 프로세스가 어디까지 받았는지 맞춰볼 때 쓴다.
+        self.seq = 0
+        # 불러왔을(넘겨받았을) 때의 seq. 재시작 전 커밋이 파일에 남았는지 번호로 확인할 때 쓴다.
+        self.loaded_seq = 0
+        # 커밋된 변경을 받아가는 쪽(복제). 이벤트 루프에서 불리므로 오래 걸리면 안 된다.
+        self._listeners: List[Callable[[dict], None]] = []
+        # 이미 반영한 정산. {키: (만료 시각, 결과)}, 오래된 것이 앞에 있다.
+        # 같은 상호작용이 다시 들어와도 한 번만 반영하고 처음 결과를 그대로 돌려준다.
+        self._settled: 'OrderedDict[str, Tuple[float, object]]' = OrderedDict()
+        # 파일 쓰기를 맡는 스레드. 불러오기가 끝나면 시작한다.
+        self.persist = PersistenceWorker(self._write_state, config.PERSIST_QUEUE_SIZE)
         self._loaded = False
 
     # ------------------------------------------------------------------
     # 파일 입출력
     # ------------------------------------------------------------------
-    def load(self) -> None:
-        """파일에서 보유량을 읽어온다. 파일이 없으면 빈 상태로 시작한다."""
+    def load(self, readonly: bool = False) -> None:
+        """파일에서 보유량을 읽어온다. 파일이 없으면 빈 상태로 시작한다.
+
+        스냅숏에 깨진 서버 블록이 있거나 일지 끝이 깨졌으면, 되살린 상태로 새 스냅숏을 바로 써 둔다.
+
+        readonly면 보유량만 읽고 파일은 하나도 건드리지 않는다. 옮기기·되살린 스냅숏 쓰기·일지 자르기를
+        하지 않고 변동 기록을 열거나 쓰기 스레드를 시작하지도 않는다. 봇이 돌고 있는 DATA_DIR을
+        분석 도구에서 읽을 때 쓰며, 이렇게 읽은 저장소로는 값을 바꾸지 않는다.
+        """
+        if readonly:
+            if not self.files.exists() and os.path.exists(self.legacy_path):
+                self._load_legacy(readonly=True)
+            else:
+                self._import_files(self.files.load(readonly=True)[0])
+            return
         os.makedirs(self.data_dir, exist_ok=True)
+        if not self.files.exists() and os.path.exists(self.legacy_path):
+            self._load_legacy()
+            self._load_stats([])
+            self._compact(self._copy_state(), self.stats)
+            if os.path.exists(self.legacy_path):
+                os.replace(self.legacy_path, self.legacy_path + '.migrated')
+                print(f"[storage] {self.legacy_path} 을(를) {self.path} 로 옮겼습니다.")
+        else:
+            state, repaired = self.files.load()
+            self._import_files(state)
+            if self.files.exists():
+                print(f"[storage] {self.path} 에서 {sum(len(m) for m in self._balances.values())}건을 불러왔습니다.")
+            else:
+                print(f"[storage] {self.path} 이(가) 없어 새로 시작합니다.")
+            self._load_stats(state['games'])
+            if repaired:
+                self._compact(self._copy_state(), self.stats, rotate=False)
+        self.ledger.open()
+        self.persist.reset(self._copy_state(), self.stats.copy())
+        self.loaded_seq = self.seq
+        self._loaded = True
+
+    def _import_files(self, state: dict) -> None:
+        self._balances = state['balances']
+        self._last_topup = state['last_topup']
+        self._set_floors(state['floors'], state['floor_epochs'])
+        self.seq = state['seq']
+
+    def _load_legacy(self, readonly: bool = False) -> None:
+        """예전 형식(tokens.json)을 읽는다. readonly면 깨진 파일도 옮기지 않는다."""
         try:
-            with open(self.path, 'r', encoding='utf-8') as f:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
                 raw = json.load(f)
             balances = raw.get('balances', {})
             self._balances = {
@@ -39,34 +138,89 @@ class TokenStore:
                 for gid, members in balances.items()
             }
             self._last_topup = {str(gid): str(day) for gid, day in raw.get('last_topup', {}).items()}
-            print(f"[storage] {self.path} 에서 {sum(len(m) for m in self._balances.values())}건을 불러왔습니다.")
-        except FileNotFoundError:
-            self._balances = {}
-            self._last_topup = {}
-            print(f"[storage] {self.path} 이(가) 없어 새로 시작합니다.")
+            self._set_floors(raw.get('floors', {}), raw.get('floor_epochs', {}))
+            self.seq = int(raw.get('seq', 0))
+            print(f"[storage] {self.legacy_path} 에서 {sum(len(m) for m in self._balances.values())}건을 불러왔습니다.")
         except (json.JSONDecodeError, ValueError) as e:
             # 파일이 깨진 경우 백업만 남기고 빈 상태로 시작한다.
-            backup = self.path + '.broken'
+            backup = self.legacy_path + '.broken'
             try:
-                os.replace(self.path, backup)
-                print(f"[storage] 파일을 읽을 수 없어 {backup} 으로 옮겼습니다: {e}")
+                if readonly:
+                    print(f"[storage] {self.legacy_path} 을(를) 읽을 수 없습니다: {e}")
+                else:
+                    os.replace(self.legacy_path, backup)
+                    print(f"[storage] 파일을 읽을 수 없어 {backup} 으로 옮겼습니다: {e}")
             except OSError:
                 pass
             self._balances = {}
             self._last_topup = {}
-        self._loaded = True
+            self._set_floors({}, {})
+
+    def _load_stats(self, changes: List[dict]) -> None:
+        """stats.bin을 읽고, 그 뒤의 일지 커밋(changes)에 적힌 전적을 다시 센다."""
+        try:
+            with open(self.stats_path, 'rb') as f:
+                self.stats = GameStats.from_bytes(f.read())
+        except FileNotFoundError:
+            self.stats = GameStats()
+        except (ValueError, struct.error) as e:
+            backup = self.stats_path + '.broken'
+            try:
+                os.replace(self.stats_path, backup)
+                print(f"[storage] 전적 파일을 읽을 수 없어 {backup} 으로 옮겼습니다: {e}")
+            except OSError:
+                pass
+            self.stats = GameStats()
+        for change in changes:
+            if change['seq'] <= self.stats.seq:
+                continue
+            for user_id, game, delta in change['games']:
+                self.stats.record(int(change['guild']), user_id, game, delta)
+
+    def _copy_state(self) -> dict:
+        """파일에 쓰는 상태의 사본. 복제와 쓰기 스레드가 받아 간다."""
+        return {
+            'seq': self.seq,
+            'balances': {gid: dict(members) for gid, members in self._balances.items()},
+            'last_topup': dict(self._last_topup),
+            'floors': {gid: list(floors) for gid, floors in self._floors.items()},
+            'floor_epochs': {gid: dict(epochs) for gid, epochs in self._epochs.items()},
+        }
 
     def _write(self) -> None:
-        """임시 파일에 쓴 뒤 교체해서 중간에 끊겨도 파일이 깨지지 않게 한다."""
+        """지금 상태 전체를 새 스냅숏으로 바로 쓴다. 쓰기 스레드를 거치지 않으므로 넘겨받기처럼 커밋이 없을 때만 쓴다."""
+        self.ledger.flush()
+        self._compact(self._copy_state(), self.stats)
+
+    def _compact(self, state: dict, stats: GameStats, rotate: bool = True) -> None:
+        """state로 새 스냅숏을 쓴다. 전적 표는 그보다 먼저 같은 seq로 써 둔다.
+
+        표를 쓴 뒤 스냅숏을 바꾸기 전에 끊겨도, 불러올 때 표의 seq 뒤 일지만 다시 세므로 두 번 세지 않는다.
+        """
+        self._write_bytes(self.stats_path, stats.to_bytes(state['seq']))
+        self.files.compact(state, rotate)
+
+    def _write_state(self, state: dict, stats: GameStats, changes: List[dict]) -> None:
+        """이번에 반영한 커밋들을 일지에 덧붙인다. 일지가 커졌으면 state로 새 스냅숏을 쓴다.
+
+        변동 기록을 먼저 반영해서, 파일에 남은 보유량에는 항상 그 이유가 남아 있게 한다.
+        쓰기 스레드에서 불린다. state와 stats는 그 스레드의 사본이다. 전적은 일지에 커밋의 games로
+        들어가므로, 표 전체는 새 스냅숏을 쓸 때만 쓴다.
+        """
         os.makedirs(self.data_dir, exist_ok=True)
-        payload = {'version': 1, 'balances': self._balances, 'last_topup': self._last_topup}
+        self.ledger.flush()
+        if changes and self.files.append(changes):
+            self._compact(state, stats)
+
+    def _write_bytes(self, path: str, data: bytes) -> None:
+        """임시 파일에 쓰고 fsync 한 뒤 교체해서 중간에 끊겨도 파일이 깨지지 않게 한다."""
         fd, tmp_path = tempfile.mkstemp(dir=self.data_dir, prefix='tokens-', suffix='.tmp')
         try:
-            with os.fdopen(fd, 'w', encoding='utf-8') as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
                 f.flush()
                 os.fsync(f.fileno())
-            os.replace(tmp_path, self.path)
+            os.replace(tmp_path, path)
         except Exception:
             try:
                 os.unlink(tmp_path)
@@ -75,7 +229,133 @@ class TokenStore:
             raise
 
     async def save(self) -> None:
-        await asyncio.to_thread(self._write)
+        """쓰기 스레드에 밀린 것까지 파일에 쓴다."""
+        await (await self.persist.submit(None, self._publish))
+
+    async def _commit(
+        self,
+        guild_id: int,
+        keys: Iterable[str],
+        games: Sequence[Tuple[int, int, int]] = (),
+        floors: bool = False,
+    ) -> 'asyncio.Future[None]':
+        """바뀐 것을 쓰기 스레드에 넘긴다. 잠금을 잡은 채로 부르고, 돌려받은 future는 잠금을 놓은 뒤 기다린다.
+
+        파일에 쓰기가 끝나면 future가 완료되고 그때 복제 쪽에 알린다. 쓰는 동안 잠금을 잡고 있지 않으므로
+        밀린 커밋들은 쓰기 스레드에서 한 번에 쓰인다. 대기열이 가득 차면 여기서 기다린다.
+        keys는 보유량이 바뀐 user_id(str), games는 전적에 센 (user_id, game, delta) 목록.
+        floors는 보정 회차를 올렸을 때만 참으로 주고, 그때만 서버의 기준선 목록을 함께 보낸다.
+        """
+        self.seq += 1
+        gid = str(guild_id)
+        members = self._guild(guild_id)
+        change = {
+            'type': 'change',
+            'seq': self.seq,
+            'guild': gid,
+            'balances': {key: members[key] for key in keys if key in members},
+            'last_topup': self._last_topup.get(gid),
+            'games': [list(g) for g in games],
+        }
+        if floors:
+            change['floors'] = [list(step) for step in self._floors[gid]]
+        epochs = self._epochs.get(gid)
+        if epochs:
+            change['floor_epochs'] = {key: epochs[key] for key in change['balances'] if key in epochs}
+        return await self.persist.submit(change, self._publish)
+
+    def _publish(self, change: dict) -> None:
+        for listener in list(self._listeners):
+            listener(change)
+
+    # ------------------------------------------------------------------
+    # 복제
+    # ------------------------------------------------------------------
+    async def attach(self, listener: Callable[[dict], None]) -> dict:
+        """현재 상태 전체를 돌려주고 이후 커밋을 listener로 보낸다.
+
+        잠금 안에서 둘을 함께 하므로, 받은 상태와 이어지는 변경 사이에 빠지는 커밋이 없다.
+        """
+        async with self._lock:
+            self._listeners.append(listener)
+            return {
+                'type': 'snapshot',
+                **self._copy_state(),
+                'stats': base64.b64encode(self.stats.to_bytes()).decode('ascii'),
+            }
+
+    def detach(self, listener: Callable[[dict], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def import_state(self, state: dict) -> None:
+        """복제로 받은 전체 상태로 바꾼다. 대기 프로세스에서만 쓴다."""
+        self._balances = {gid: dict(members) for gid, members in state['balances'].items()}
+        self._last_topup = dict(state['last_topup'])
+        self._set_floors(state.get('floors', {}), state.get('floor_epochs', {}))
+        self.stats = GameStats.from_bytes(base64.b64decode(state['stats']))
+        self.seq = int(state['seq'])
+        self._loaded = True
+
+    def apply_change(self, change: dict) -> None:
+        """복제로 받은 커밋 하나를 반영한다. 대기 프로세스에서만 쓴다.
+
+        전체 상태는 파일 쓰기가 끝나기 전의 커밋까지 담을 수 있으므로, 이미 받은 번호의 변동은 건너뛴다.
+        """
+        if int(change['seq']) <= self.seq:
+            return
+        members = self._balances.setdefault(change['guild'], {})
+        members.update(change['balances'])
+        if change.get('last_topup'):
+            self._last_topup[change['guild']] = change['last_topup']
+        if 'floors' in change:
+            self._floors[change['guild']] = [(int(e), int(f)) for e, f in change['floors']]
+        if change.get('floor_epochs'):
+            self._epochs.setdefault(change['guild'], {}).update(change['floor_epochs'])
+        for user_id, game, delta in change.get('games', []):
+            self.stats.record(int(change['guild']), user_id, game, delta)
+        self.seq = int(change['seq'])
+
+    def take_over(self) -> None:
+        """대기 프로세스가 주 프로세스 역할을 넘겨받는다.
+
+        보유량·전적은 메모리에 있는 것을 그대로 쓰고, 파일에서는 변동 기록 색인만 다시 만든다.
+        받은 상태를 자기 DATA_DIR에 한 번 써 두어 이후 저장과 백업이 이어지게 한다.
+
+        주 프로세스가 파일을 쓴 직후, 변동을 보내기 전에 죽었으면 같은 DATA_DIR의 파일이
+        한 커밋 앞서 있다. 이때만 파일에서 다시 읽는다.
+        """
+        try:
+            on_disk = self.files.disk_seq()
+        except OSError:
+            on_disk = 0
+        if on_disk > self.seq:
+            print(f"[storage] 파일이 복제본보다 앞서 있어 다시 읽습니다. ({self.seq} -> {on_disk})")
+            self.load()
+            return
+        self.ledger.open()
+        self._write()
+        self.persist.reset(self._copy_state(), self.stats.copy())
+        self.loaded_seq = self.seq
+
+    @property
+    def lock_meter(self) -> MeteredLock:
+        """잠금 대기 인원·시간. 입장 제어(admission)에서 읽는다."""
+        return self._lock
+
+    def busy(self) -> bool:
+        """정산이나 파일 쓰기가 진행 중인지. 백업처럼 급하지 않은 디스크 작업이 비켜설 때 쓴다."""
+        return self._lock.locked() or self.persist.pending > 0
+
+    def sizes(self) -> Dict[str, int]:
+        """메모리에 들고 있는 항목 수. 메모리 추적(memprof)에서 다른 스레드가 읽는다."""
+        return {
+            'guilds': len(self._balances),
+            'accounts': sum(len(members) for members in list(self._balances.values())),
+            'floor_epochs': sum(len(epochs) for epochs in list(self._epochs.values())),
+            'settled_keys': len(self._settled),
+            'listeners': len(self._listeners),
+        }
 
     # ------------------------------------------------------------------
     # 조회
@@ -86,16 +366,35 @@ class TokenStore:
     def has_account(self, guild_id: int, user_id: int) -> bool:
         return str(user_id) in self._guild(guild_id)
 
+    def _balance(self, guild_id: int, key: str) -> int:
+        """밀린 기준선까지 반영한 보유량. 저장된 값은 바꾸지 않는다."""
+        members = self._guild(guild_id)
+        balance = members.get(key, 0)
+        steps = self._floors.get(str(guild_id))
+        if steps and key in members:
+            return max(balance, _floor_due(steps, self._epochs.get(str(guild_id), {}).get(key, 0)))
+        return balance
+
     def get_balance(self, guild_id: int, user_id: int) -> int:
-        return self._guild(guild_id).get(str(user_id), 0)
+        return self._balance(guild_id, str(user_id))
 
     def get_last_topup(self, guild_id: int) -> Optional[str]:
         """마지막으로 일일 보정을 한 날짜(YYYY-MM-DD). 기록이 없으면 None."""
         return self._last_topup.get(str(guild_id))
 
+    def snapshot(self, guild_id: int) -> Dict[int, int]:
+        """한 서버의 {user_id: 보유량} 사본."""
+        return {int(uid): self._balance(guild_id, uid) for uid in self._guild(guild_id)}
+
+    def history(self, guild_id: int, user_id: int, limit: int = 10):
+        """한 사람의 최근 변동 기록(ledger.Entry)을 최신순으로 돌려준다."""
+        return self.ledger.history(guild_id, user_id, limit)
+
     def top(self, guild_id: int, count: int = 5) -> List[Tuple[int, int]]:
         """보유량 상위 인원을 (user_id, balance) 목록으로 돌려준다."""
         members = self._guild(guild_id)
+        if self._floors.get(str(guild_id)):
+            members = {uid: self._balance(guild_id, uid) for uid in members}
         ordered = sorted(members.items(), key=lambda kv: (-kv[1], int(kv[0])))
         return [(int(uid), amount) for uid, amount in ordered[:count]]
 
@@ -104,74 +403,453 @@ class TokenStore:
     # ------------------------------------------------------------------
     @staticmethod
     def _clamp(amount: int) -> int:
-        return max(0, min(config.MAX_TOKENS, amount))
+        return clamp(amount, config.MAX_TOKENS)
+
+    def _set_floors(
+        self, floors: Mapping[str, Sequence[Sequence[int]]], epochs: Mapping[str, Mapping[str, int]]
+    ) -> None:
+        self._floors = {str(gid): [(int(e), int(f)) for e, f in steps] for gid, steps in floors.items()}
+        self._epochs = {
+            str(gid): {str(uid): int(e) for uid, e in members.items()} for gid, members in epochs.items()
+        }
+
+    def _catch_up(self, guild_id: int, keys: Iterable[str]) -> None:
+        """keys 계정에 밀린 기준선을 실제 보유량으로 반영하고 변동 기록을 남긴다. 잠금 안에서 부른다.
+
+        계정이 없는 키는 지금 회차에 만들어지는 것으로 보고 회차만 기록한다. 떠난 계정은 떠난 채로 둔다.
+        """
+        gid = str(guild_id)
+        steps = self._floors.get(gid)
+        if not steps:
+            return
+        current = steps[-1][0]
+        members = self._guild(guild_id)
+        epochs = self._epochs.setdefault(gid, {})
+        records = []
+        for key in keys:
+            epoch = epochs.get(key, 0)
+            if epoch == AWAY_EPOCH:
+                continue
+            if key in members:
+                floor = _floor_due(steps, epoch)
+                if members[key] < floor:
+                    records.append((int(key), 0, floor - members[key], REASON_TOPUP))
+                    members[key] = floor
+            epochs[key] = current
+        self.ledger.append(guild_id, records)
+
+    async def mark_away(self, guild_id: int, user_ids: Iterable[int]) -> int:
+        """서버를 떠난 인원의 계정이 돌아올 때까지 기준선을 받지 않게 한다. (LAZY_FLOOR)
 
-    async def grant_initial(self, guild_id: int, user_ids: Iterable[int]) -> int:
-        """계정이 없는 인원에게만 최초 지급을 한다. 지급한 인원 수를 돌려준다."""
+        바로 보정할 때는 그날 서버에 있는 인원만 올리므로, 떠나기 전까지의 기준선만 반영해 두고
+        회차를 AWAY_EPOCH로 적는다. 표시한 계정 수를 돌려준다.
+        """
         async with self._lock:
+            gid = str(guild_id)
             members = self._guild(guild_id)
-            granted = 0
-            for user_id in user_ids:
-                key = str(user_id)
-                if key not in members:
-                    members[key] = config.INITIAL_TOKENS
-                    granted += 1
-            if granted:
-                await asyncio.to_thread(self._write)
-            return granted
-
-    async def daily_topup(self, guild_id: int, user_ids: Iterable[int], day: str) -> int:
+            epochs = self._epochs.setdefault(gid, {})
+            keys = [
+                key for key in dict.fromkeys(str(user_id) for user_id in user_ids)
+                if key in members and epochs.get(key) != AWAY_EPOCH
+            ]
+            if not keys:
+                return 0
+            self._catch_up(guild_id, keys)
+            for key in keys:
+                epochs[key] = AWAY_EPOCH
+            durable = await self._commit(guild_id, keys)
+        await durable
+        return len(keys)
+
+    async def mark_present(self, guild_id: int, user_ids: Iterable[int]) -> int:
+        """돌아온 인원의 계정이 다음 회차부터 다시 기준선을 받게 한다. 표시한 계정 수를 돌려준다."""
+        async with self._lock:
+            gid = str(guild_id)
+            epochs = self._epochs.get(gid, {})
+            keys = [
+                key for key in dict.fromkeys(str(user_id) for user_id in user_ids)
+                if epochs.get(key) == AWAY_EPOCH
+            ]
+            if not keys:
+                return 0
+            current = _current_epoch(self._floors.get(gid))
+            for key in keys:
+                epochs[key] = current
+            durable = await self._commit(guild_id, keys)
+        await durable
+        return len(keys)
+
+    async def sync_members(self, guild_id: int, user_ids: Iterable[int]) -> Tuple[int, int]:
+        """꺼져 있던 동안 놓친 입장·퇴장을 맞춘다. 시작할 때 서버마다 한 번 부른다. (떠난 수, 돌아온 수)"""
+        present = {str(user_id) for user_id in user_ids}
+        gid = str(guild_id)
+        epochs = self._epochs.get(gid, {})
+        away = [int(key) for key in self._guild(guild_id) if key not in present and epochs.get(key) != AWAY_EPOCH]
+        back = [int(key) for key in present if epochs.get(key) == AWAY_EPOCH]
+        return await self.mark_away(guild_id, away), await self.mark_present(guild_id, back)
+
+    async def grant_initial(
+        self, guild_id: int, user_ids: Iterable[int], amount: Optional[int] = None
+    ) -> int:
+        """계정이 없는 인원에게만 최초 지급을 한다. 지급한 인원 수를 돌려준다.
+
+        amount를 주지 않으면 config.INITIAL_TOKENS 만큼 지급한다. (서버별 설정은 부르는 쪽에서 준다)
+        """
+        if amount is None:
+            amount = config.INITIAL_TOKENS
+        async with self._lock:
+            members = self._guild(guild_id)
+            new = list(dict.fromkeys(str(user_id) for user_id in user_ids if str(user_id) not in members))
+            if not new:
+                return 0
+            # 계정을 넣기 전에 불러야 지금 회차에 만들어진 것으로 기록된다. 넣은 뒤에 부르면 0회차로 보고
+            # 지난 기준선의 최댓값까지 올려 버린다.
+            self._catch_up(guild_id, new)
+            records = []
+            for key in new:
+                members[key] = amount
+                records.append((int(key), 0, amount, REASON_INITIAL))
+            granted = len(records)
+            self.ledger.append(guild_id, records)
+            durable = await self._commit(guild_id, new)
+        await durable
+        return granted
+
+    async def daily_topup(
+        self, guild_id: int, user_ids: Iterable[int], day: str, floor: Optional[int] = None
+    ) -> int:
         """보유량이 기준선 미만인 인원을 기준선으로 맞춘다. 보정된 인원 수를 돌려준다.
 
         보정한 날짜(day)를 함께 기록해서, 봇이 재시작해도 그날 보정을 이미 했는지
         판단할 수 있게 한다. 바뀐 인원이 없어도 날짜는 기록한다.
+        floor를 주지 않으면 config.DAILY_FLOOR 가 기준선이다.
+        LAZY_FLOOR이면 user_ids는 보지 않고 _lazy_topup으로 회차만 올린다.
         """
+        if floor is None:
+            floor = config.DAILY_FLOOR
+        if config.LAZY_FLOOR:
+            return await self._lazy_topup(guild_id, day, floor)
         async with self._lock:
             members = self._guild(guild_id)
-            changed = 0
+            user_ids = list(user_ids)
+            # 늦춘 보정을 쓰다 끈 경우, 밀린 기준선을 먼저 반영한다.
+            self._catch_up(guild_id, [str(user_id) for user_id in user_ids])
+            records = []
             for user_id in user_ids:
                 key = str(user_id)
-                if members.get(key, 0) < config.DAILY_FLOOR:
-                    members[key] = config.DAILY_FLOOR
-                    changed += 1
+                balance = members.get(key, 0)
+                topped = topped_up(balance, floor)
+                if topped != balance:
+                    members[key] = topped
+                    records.append((user_id, 0, topped - balance, REASON_TOPUP))
+            self.ledger.append(guild_id, records)
             self._last_topup[str(guild_id)] = day
-            await asyncio.to_thread(self._write)
-            return changed
+            durable = await self._commit(guild_id, [str(r[0]) for r in records])
+        await durable
+        return len(records)
+
+    async def _lazy_topup(self, guild_id: int, day: str, floor: int) -> int:
+        """기준선 회차만 하나 올리고, 각 계정에는 다음 조회·변경 때 반영한다. 계정은 하나도 보지 않는다.
+
+        조회(get_balance, snapshot, top)는 밀린 기준선까지 더한 값을 보여주고, 변경(adjust, settle 등)은
+        그 값을 실제로 적으면서 매일 보정 기록을 남긴다. 보유량을 건드리지 않는 날이 많은 인원은
+        파일에 다시 쓰이지 않는다.
+
+        즉시 보정과 결과를 같게 하려고, 서버에 없는 계정은 mark_away로 회차를 건너뛰게 하고
+        새로 들어온 인원은 입장할 때 계정을 만든다. 둘 다 입장·퇴장 이벤트에서 한 명씩 한다.
+        (기준선 아래였던 인원 수는 조회할 때까지 모르므로 0을 돌려준다)
+        """
+        async with self._lock:
+            gid = str(guild_id)
+            _push_floor(self._floors.setdefault(gid, []), floor)
+            self._last_topup[gid] = day
+            durable = await self._commit(guild_id, [], floors=True)
+        await durable
+        return 0
+
+    async def adjust(
+        self,
+        guild_id: int,
+        user_id: int,
+        delta: int,
+        reason: int = REASON_OTHER,
+        game: Optional[int] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> int:
+        """한 명의 보유량을 증감시키고 결과 보유량을 돌려준다.
+
+        reason은 변동 기록에 남길 사유이고, game을 주면 그 놀이의 전적에 한 판으로 센다.
+        idempotency_key는 settle과 같다.
+        """
+        async with self._lock:
+            found, previous = self._recall(idempotency_key)
+            if found:
+                return previous
+            members = self._guild(guild_id)
+            key = str(user_id)
+            self._catch_up(guild_id, [key])
+            before = members.get(key, 0)
+            members[key] = self._clamp(before + delta)
+            self.ledger.append(guild_id, [(user_id, 0, members[key] - before, reason)])
+            games = []
+            if game is not None:
+                self.stats.record(guild_id, user_id, game, delta)
+                games.append((user_id, game, delta))
+            durable = await self._commit(guild_id, [key], games)
+            self._remember(idempotency_key, members[key])
+            balance = members[key]
+        await durable
+        return balance
+
+    async def play_rounds(
+        self,
+        guild_id: int,
+        user_id: int,
+        deltas: Sequence[int],
+        stake: int,
+        reason: int = REASON_OTHER,
+        game: Optional[int] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[int, int, int]:
+        """미리 정해진 여러 판의 증감을 차례로 반영한다. (진행한 판 수, 결과 보유량, 판들의 증감 합계)를 돌려준다.
 
-    async def adjust(self, guild_id: int, user_id: int, delta: int) -> int:
-        """한 명의 보유량을 증감시키고 결과 보유량을 돌려준다."""
+        판마다 시작 보유량이 stake 이상이어야 하고, 모자라면 그 판부터는 진행하지 않는다.
+        판마다 상한(MAX_TOKENS)으로 자르므로 adjust를 판 수만큼 부른 것과 결과가 같다.
+        변동 기록과 전적에는 판마다 한 줄씩 남기고(기록은 한 번에 덧붙인다), 보유량과 파일은 한 번만 바꾼다.
+        """
         async with self._lock:
+            found, previous = self._recall(idempotency_key)
+            if found:
+                return previous
             members = self._guild(guild_id)
             key = str(user_id)
-            members[key] = self._clamp(members.get(key, 0) + delta)
-            await asyncio.to_thread(self._write)
-            return members[key]
+            self._catch_up(guild_id, [key])
+            balance = members.get(key, 0)
+            played = 0
+            records = []
+            for delta in deltas:
+                if balance < stake:
+                    break
+                after = self._clamp(balance + delta)
+                records.append((user_id, 0, after - balance, reason))
+                balance = after
+                played += 1
+            games = []
+            if game is not None:
+                for delta in deltas[:played]:
+                    self.stats.record(guild_id, user_id, game, delta)
+                    games.append((user_id, game, delta))
+            durable = None
+            if played:
+                members[key] = balance
+                self.ledger.append(guild_id, records)
+                durable = await self._commit(guild_id, [key], games)
+            net = sum(record[2] for record in records)
+            self._remember(idempotency_key, (played, balance, net))
+        if durable is not None:
+            await durable
+        return played, balance, net
+
+    async def settle(
+        self,
+        guild_id: int,
+        deltas: Sequence[Tuple[int, int]],
+        preconditions: Optional[Mapping[int, int]] = None,
+        reason: int = REASON_OTHER,
+        counterparty: Optional[int] = None,
+        game: Optional[int] = None,
+        idempotency_key: Optional[str] = None,
+        before_commit: Optional[Callable[[int], Awaitable[None]]] = None,
+    ) -> Dict[int, int]:
+        """여러 명의 보유량을 한 번에 증감시킨다. 전부 반영되거나 하나도 반영되지 않는다.
+
+        deltas는 (user_id, 증감량) 목록이고, 같은 사람이 여러 번 나와도 된다.
+        preconditions는 {user_id: 최소 보유량}으로, 반영 전 보유량이 이보다 적으면 거절한다.
+        증감 후 보유량이 0 미만이 되는 경우도 거절한다. 거절하면 SettlementError를 낸다.
+        상한(MAX_TOKENS)은 넘는 만큼 잘라낸다.
+
+        변동 기록에는 reason과 함께 상대를 남긴다. 두 사람 사이의 정산이면 서로가 상대이고,
+        counterparty를 주면 나머지 인원의 상대는 그 사람이 된다. (선물한 사람, 대회 등)
+        game을 주면 참여한 인원 모두의 그 놀이 전적에 한 판씩 센다.
+
+        idempotency_key(보통 상호작용 ID)를 주면 SETTLE_DEDUP_TTL초 동안 같은 키로 다시 불려도
+        반영하지 않고 처음 결과를 돌려준다. 거절된 정산은 기억하지 않는다.
+
+        before_commit을 주면 검증을 통과한 뒤, 아무것도 바꾸기 전에 이 정산이 받을 커밋 번호로 불러
+        기다린다. 재시작해도 반영 여부를 확인해야 하는 정산(토너먼트)이 번호를 먼저 남겨 두는 데 쓴다.
+        여기서 예외가 나면 아무것도 반영하지 않는다.
+
+        검증과 반영을 잠금 한 번 안에서 하고 파일에도 한 번만 쓴다.
+        {user_id: 결과 보유량}을 돌려준다.
+        """
+        async with self._lock:
+            found, previous = self._recall(idempotency_key)
+            if found:
+                return dict(previous)
+            members = self._guild(guild_id)
+            net: Dict[int, int] = {}
+            for user_id, delta in deltas:
+                net[user_id] = net.get(user_id, 0) + delta
+
+            for user_id, required in (preconditions or {}).items():
+                balance = self._balance(guild_id, str(user_id))
+                if balance < required:
+                    raise SettlementError(user_id, balance, required)
+            for user_id, delta in net.items():
+                balance = self._balance(guild_id, str(user_id))
+                if balance + delta < 0:
+                    raise SettlementError(user_id, balance, -delta)
+            if before_commit is not None:
+                # 잠금을 잡고 있으므로 다음 커밋 번호는 이 정산의 것이다.
+                await before_commit(self.seq + 1)
+            self._catch_up(
+                guild_id, [str(user_id) for user_id, delta in net.items() if delta or str(user_id) in members]
+            )
+
+            result = {}
+            records = []
+            games = []
+            for user_id, delta in net.items():
+                key = str(user_id)
+                if not delta and key not in members:
+                    # 변동이 없는 인원 때문에 빈 계정을 만들지 않는다.
+                    result[user_id] = 0
+                    continue
+                before = members.get(key, 0)
+                members[key] = result[user_id] = self._clamp(before + delta)
+                other = self._counterparty(user_id, net, counterparty)
+                records.append((user_id, other, result[user_id] - before, reason))
+                if game is not None:
+                    self.stats.record(guild_id, user_id, game, delta)
+                    games.append((user_id, game, delta))
+            self.ledger.append(guild_id, records)
+            durable = await self._commit(guild_id, [str(r[0]) for r in records], games)
+            self._remember(idempotency_key, dict(result))
+        await durable
+        return result
+
+    # ------------------------------------------------------------------
+    # 중복 정산 방지
+    # ------------------------------------------------------------------
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._settled:
+            expires_at, _ = next(iter(self._settled.values()))
+            if expires_at > now and len(self._settled) <= config.SETTLE_DEDUP_SIZE:
+                break
+            self._settled.popitem(last=False)
+
+    def _recall(self, key: Optional[str]) -> Tuple[bool, object]:
+        """(이미 반영했는지, 그때의 결과). 잠금 안에서 부른다."""
+        if key is None:
+            return False, None
+        self._expire()
+        entry = self._settled.get(key)
+        if entry is None:
+            return False, None
+        print(f"[storage] 이미 반영한 정산이라 다시 반영하지 않습니다. ({key})")
+        return True, entry[1]
+
+    def _remember(self, key: Optional[str], result: object) -> None:
+        if key is None:
+            return
+        self._settled[key] = (time.monotonic() + config.SETTLE_DEDUP_TTL, result)
+        self._expire()
+
+    def was_settled(self, key: str) -> bool:
+        """이 키로 정산이 반영되었는지. 오류 안내에서 실제 결과를 알려줄 때 쓴다."""
+        self._expire()
+        return key in self._settled
+
+    @staticmethod
+    def _counterparty(user_id: int, net: Mapping[int, int], central: Optional[int]) -> int:
+        """변동 기록에 남길 상대. 정할 수 없으면 0."""
+        if central is not None and user_id != central:
+            return central
+        others = [other for other in net if other != user_id]
+        return others[0] if len(others) == 1 else 0
 
     async def gift(
         self, guild_id: int, sender_id: int, receiver_id: int, sent: int, received: int
     ) -> Tuple[int, int]:
         """보내는 쪽에서 sent 만큼 빼고 받는 쪽에 received 만큼 넣는다.
 
-        전달 과정에서 일부가 사라지므로 두 값이 다르다.
+        전달 과정에서 일부가 사라지므로 두 값이 다르다. 보내는 쪽 보유량이 sent보다
+        적으면 SettlementError를 낸다.
         (보낸 사람 보유량, 받은 사람 보유량)을 돌려준다.
         """
-        async with self._lock:
-            members = self._guild(guild_id)
-            skey, rkey = str(sender_id), str(receiver_id)
-            members[skey] = self._clamp(members.get(skey, 0) - sent)
-            members[rkey] = self._clamp(members.get(rkey, 0) + received)
-            await asyncio.to_thread(self._write)
-            return members[skey], members[rkey]
-
-    async def transfer(self, guild_id: int, winner_id: int, loser_id: int, amount: int) -> Tuple[int, int]:
-        """패자에게서 승자로 토큰을 옮기고 (승자 보유량, 패자 보유량)을 돌려준다."""
-        async with self._lock:
-            members = self._guild(guild_id)
-            wkey, lkey = str(winner_id), str(loser_id)
-            members[wkey] = self._clamp(members.get(wkey, 0) + amount)
-            members[lkey] = self._clamp(members.get(lkey, 0) - amount)
-            await asyncio.to_thread(self._write)
-            return members[wkey], members[lkey]
+        sender_balance, receivers = await self.gift_many(
+            guild_id, sender_id, [(receiver_id, sent, received)]
+        )
+        return sender_balance, receivers[receiver_id]
+
+    async def gift_many(
+        self,
+        guild_id: int,
+        sender_id: int,
+        gifts: Sequence[Tuple[int, int, int]],
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[int, Dict[int, int]]:
+        """한 사람이 여러 명에게 한 번에 선물한다. gifts는 (받는 사람, sent, received) 목록.
+
+        보내는 쪽에서는 sent의 합계가 빠지며, 합계보다 적게 가졌으면 아무에게도 보내지 않는다.
+        정산과 저장은 한 번만 한다. (보낸 사람 보유량, {받은 사람: 보유량})을 돌려준다.
+        """
+        deltas = [(sender_id, -sum(sent for _, sent, _ in gifts))]
+        deltas += [(receiver_id, received) for receiver_id, _, received in gifts]
+        result = await self.settle(
+            guild_id, deltas, reason=REASON_GIFT, counterparty=sender_id, idempotency_key=idempotency_key
+        )
+        return result[sender_id], {receiver_id: result[receiver_id] for receiver_id, _, _ in gifts}
+
+    async def transfer(
+        self,
+        guild_id: int,
+        winner_id: int,
+        loser_id: int,
+        amount: int,
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[int, int]:
+        """패자에게서 승자로 토큰을 옮기고 (승자 보유량, 패자 보유량)을 돌려준다.
+
+        대결에 건 금액이므로 두 사람 모두 amount 이상 보유하고 있어야 한다.
+        한 명이라도 부족하면 SettlementError를 낸다.
+        """
+        result = await self.settle(
+            guild_id,
+            [(winner_id, amount), (loser_id, -amount)],
+            preconditions={winner_id: amount, loser_id: amount},
+            reason=REASON_DUO,
+            game=STAT_DUO,
+            idempotency_key=idempotency_key,
+        )
+        return result[winner_id], result[loser_id]
+
+
+def _current_epoch(steps: Optional[Sequence[Tuple[int, int]]]) -> int:
+    return steps[-1][0] if steps else 0
+
+
+def _push_floor(steps: List[Tuple[int, int]], floor: int) -> None:
+    """회차를 하나 올리고 그 기준선을 넣는다.
+
+    앞 회차 중 기준선이 floor 이하인 것은 이제 어느 계정에도 최댓값이 되지 않으므로 버린다. 기준선이
+    매일 같으면 목록은 한 칸이고, 길이는 기준선이 줄어든 횟수를 넘지 않는다.
+    """
+    epoch = _current_epoch(steps) + 1
+    while steps and steps[-1][1] <= floor:
+        steps.pop()
+    steps.append((epoch, floor))
+
+
+def _floor_due(steps: Sequence[Tuple[int, int]], epoch: int) -> int:
+    """epoch 회차까지 반영한 계정에 밀린 기준선. 그 뒤 회차 기준선들의 최댓값이고, 없으면 0이다.
+
+    e회차까지 반영한 계정이 그 뒤로 보유량이 바뀌지 않았다면, 즉시 보정을 매일 했을 때의 결과는
+    max(보유량, 그 뒤 기준선들) 이다. steps는 기준선이 줄어드는 순서이므로 epoch 뒤의 첫 칸이 최댓값이다.
+    """
+    index = bisect.bisect_right(steps, (epoch, math.inf))
+    return steps[index][1] if index < len(steps) else 0
 
 
 store = TokenStore()
@@ -0,0 +1,108 @@
+"""명령어 남용 제한.
+
+한 사람이(또는 스크립트가) /토큰보유, /채널추천, /혼자놀기 같은 명령을 연달아 보내면 그때마다 정렬·정산과
+공개 메시지가 생겨 같은 서버의 다른 인원까지 느려진다. (서버, 인원, 명령어)마다 최근 받은 시각을
+THROTTLE_LIMITS 의 횟수만큼만 고리 버퍼에 남겨 두고, 가장 오래된 것이 창(초) 안에 있으면 거절한다.
+
+- 확인 한 번은 버퍼의 한 칸만 보고 한 칸만 고치므로 O(1)이다. 거절한 요청은 기록하지 않는다.
+- 창이 지난 항목은 가끔 한 번에 치운다.
+- 명령어 트리의 interaction_check 에서 저장소·디스코드 작업보다 먼저 부른다.
+"""
+
+import time
+from array import array
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+# 이 횟수만큼 확인할 때마다 창이 지난 항목을 치운다.
+SWEEP_EVERY = 4096
+
+
+def parse_limits(text: str) -> Dict[str, Tuple[int, int]]:
+    """"토큰보유=5/60,혼자놀기=10/60" 형식. 횟수 0이면 제한하지 않는다."""
+    limits = {}
+    for part in text.split(','):
+        name, _, rule = part.partition('=')
+        if not name.strip() or not rule:
+            continue
+        count, _, seconds = rule.partition('/')
+        limits[name.strip()] = (int(count), int(seconds or 60))
+    return limits
+
+
+class _Window:
+    """최근 받은 시각 최대 limit 개. 다 차면 head 가 가장 오래된 칸이다."""
+
+    __slots__ = ('times', 'head')
+
+    def __init__(self):
+        self.times = array('d')
+        self.head = 0
+
+    def newest(self) -> float:
+        return self.times[self.head - 1] if self.times else 0.0
+
+
+class Throttle:
+    def __init__(self, limits: Dict[str, Tuple[int, int]], default: Tuple[int, int]):
+        self.limits = limits
+        self.default = default
+        self._windows: Dict[Tuple[int, int, str], _Window] = {}
+        self._checks = 0
+        self.allowed = 0
+        self.throttled: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def limit(self, command: str) -> Tuple[int, int]:
+        return self.limits.get(command, self.default)
+
+    def check(self, guild_id: Optional[int], user_id: int, command: str,
+              now: Optional[float] = None) -> Optional[float]:
+        """받으면 None, 거절하면 다시 쓸 수 있을 때까지 남은 초."""
+        count, seconds = self.limit(command)
+        if count <= 0:
+            return None
+        now = time.monotonic() if now is None else now
+        self._checks += 1
+        if self._checks % SWEEP_EVERY == 0:
+            self.sweep(now)
+
+        key = (guild_id or 0, user_id, command)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _Window()
+        times = window.times
+        if len(times) < count:
+            times.append(now)
+            window.head = len(times) % count
+        else:
+            oldest = times[window.head]
+            if oldest > now - seconds:
+                self.throttled[command] += 1
+                return oldest + seconds - now
+            times[window.head] = now
+            window.head = (window.head + 1) % count
+        self.allowed += 1
+        return None
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """창이 지난 항목을 지우고 지운 수를 돌려준다."""
+        now = time.monotonic() if now is None else now
+        stale = [
+            key for key, window in self._windows.items()
+            if window.newest() <= now - self.limit(key[2])[1]
+        ]
+        for key in stale:
+            del self._windows[key]
+        return len(stale)
+
+    def report(self) -> str:
+        total = sum(self.throttled.values())
+        top = ", ".join(f"{name} {n}" for name, n in self.throttled.most_common(3))
+        return (
+            f"명령어 제한: 받음 {self.allowed} · 거절 {total}" + (f" ({top})" if top else "")
+            + f", 추적 {len(self._windows)}개"
+        )
+
@@ -0,0 +1,656 @@
+"""보유량 파일 형식: 압축 스냅숏 + 변동 일지(journal).
+
+tokens.json 은 들여쓰기와 숫자 문자열 키 때문에 실제 데이터보다 몇 배 크고, 한 글자만 깨져도
+JSONDecodeError 로 전체를 버려야 했다. 여기서는
+
+- tokens.bin: 서버마다 블록 하나. 인원 ID는 정렬해서 앞 ID와의 차이를, 숫자는 모두 varint로 적고
+  블록째 zlib으로 압축한다. 블록 머리와 내용에 각각 CRC32를 둔다.
+- journal/<스냅숏 seq>.log: 스냅숏 이후의 커밋. 서버별로 묶은 블록을 덧붙이므로
+  평소에는 바뀐 인원과 그 커밋의 전적 증감만 디스크에 쓰인다. 일지가 SNAPSHOT_JOURNAL_BYTES 를 넘으면
+  새 스냅숏을 쓴다.
+- 새 스냅숏을 쓰면 이전 것은 tokens.prev.bin 으로 남기고, 그 사이의 일지도 지우지 않는다.
+
+불러올 때 내용이 깨진 서버 블록이 있으면 그 서버만 이전 스냅숏에서 가져와 두 일지로 따라잡는다.
+일지 중간의 블록이 깨졌으면 그 블록만 건너뛰고 그 서버를 lost에 적는다. 일지 끝이 덜 써진 채로
+끝났으면 거기까지만 반영하고 그 꼬리를 잘라 낸다.
+"""
+
+import os
+import struct
+import tempfile
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import config
+
+SNAPSHOT_MAGIC = b'TKS1'
+JOURNAL_MAGIC = b'TKJ1'
+
+KIND_GUILD = 1
+KIND_CHANGES = 2
+
+# 종류, guild_id(예전 일지는 0), 내용 길이, 내용 CRC32 / 그 앞 17바이트의 CRC32
+BLOCK = struct.Struct('<BQII')
+HEADER_CRC = struct.Struct('<I')
+BLOCK_SIZE = BLOCK.size + HEADER_CRC.size
+
+
+class FileDamaged(Exception):
+    """파일 머리가 깨져 블록을 찾을 수 없다."""
+
+
+# ----------------------------------------------------------------------
+# varint
+# ----------------------------------------------------------------------
+def _put(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _put_text(out: bytearray, text: Optional[str]) -> None:
+    data = (text or '').encode('utf-8')
+    _put(out, len(data))
+    out += data
+
+
+def _put_ids(out: bytearray, ids: List[int]) -> None:
+    """정렬된 ID를 개수와 앞 ID와의 차이로 적는다."""
+    _put(out, len(ids))
+    previous = 0
+    for uid in ids:
+        _put(out, uid - previous)
+        previous = uid
+
+
+class _Reader:
+    __slots__ = ('data', 'pos')
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def int(self) -> int:
+        result = shift = 0
+        data = self.data
+        while True:
+            byte = data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def text(self) -> Optional[str]:
+        size = self.int()
+        data = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return data.decode('utf-8') or None
+
+    def ids(self) -> List[int]:
+        ids = []
+        current = 0
+        for _ in range(self.int()):
+            current += self.int()
+            ids.append(current)
+        return ids
+
+
+# ----------------------------------------------------------------------
+# 블록
+# ----------------------------------------------------------------------
+def _block(kind: int, guild_id: int, body: bytes) -> bytes:
+    payload = zlib.compress(body, 6)
+    header = BLOCK.pack(kind, guild_id, len(payload), zlib.crc32(payload))
+    return header + HEADER_CRC.pack(zlib.crc32(header)) + payload
+
+
+def _blocks(data: bytes, offset: int) -> Iterator[Tuple[int, int, Optional[bytes], int]]:
+    """(종류, guild_id, 풀어 낸 내용, 블록 끝 위치). 내용이 깨졌으면 내용 자리에 None.
+
+    블록 머리가 깨졌거나 잘렸으면 그 뒤는 찾을 수 없으므로 FileDamaged를 낸다.
+    """
+    while offset < len(data):
+        header = data[offset:offset + BLOCK.size]
+        crc = data[offset + BLOCK.size:offset + BLOCK_SIZE]
+        if len(crc) < HEADER_CRC.size or HEADER_CRC.unpack(crc)[0] != zlib.crc32(header):
+            raise FileDamaged(f'{offset}바이트 위치의 블록 머리가 깨졌습니다.')
+        kind, guild_id, length, payload_crc = BLOCK.unpack(header)
+        start = offset + BLOCK_SIZE
+        payload = data[start:start + length]
+        offset = start + length
+        if len(payload) < length:
+            raise FileDamaged(f'{start}바이트 위치의 블록이 잘렸습니다.')
+        body = None
+        if zlib.crc32(payload) == payload_crc:
+            try:
+                body = zlib.decompress(payload)
+            except zlib.error:
+                body = None
+        yield kind, guild_id, body, offset
+
+
+def block_spans(data: bytes) -> List[Tuple[int, int]]:
+    """스냅숏을 (시작, 끝) 블록 단위로 나눈다. 백업이 서버별로 조각을 나눌 때 쓴다.
+
+    seq가 든 파일 머리는 매번 바뀌므로 따로 한 조각으로 둔다.
+    """
+    try:
+        reader = _Reader(data, len(SNAPSHOT_MAGIC))
+        reader.int()
+        pos = reader.pos
+    except IndexError:
+        return [(0, len(data))]
+    spans = [(0, pos)]
+    start = pos
+    while pos < len(data):
+        header = data[pos:pos + BLOCK.size]
+        if len(header) < BLOCK.size:
+            break
+        length = BLOCK.unpack(header)[2]
+        end = pos + BLOCK_SIZE + length
+        spans.append((start, min(end, len(data))))
+        start = pos = end
+    if start < len(data):
+        spans.append((start, len(data)))
+    return spans
+
+
+# ----------------------------------------------------------------------
+# 서버 하나 / 커밋 하나
+# ----------------------------------------------------------------------
+class GuildState(NamedTuple):
+    members: Dict[str, int]
+    last_topup: Optional[str]
+    # 늦춘 보정의 (회차, 기준선) 목록. 기준선이 줄어드는 칸만 남아 있다.
+    floors: List[Tuple[int, int]]
+    epochs: Dict[str, int]
+
+
+def _put_floors(out: bytearray, floors: List[Tuple[int, int]]) -> None:
+    for epoch, floor in floors:
+        _put(out, epoch)
+        _put(out, floor)
+
+
+def _read_floors(reader: _Reader, count: int) -> List[Tuple[int, int]]:
+    return [(reader.int(), reader.int()) for _ in range(count)]
+
+
+def encode_guild(guild: GuildState) -> bytes:
+    out = bytearray()
+    _put_text(out, guild.last_topup)
+    _put(out, len(guild.floors))
+    _put_floors(out, guild.floors)
+    ids = sorted(int(uid) for uid in guild.members)
+    _put_ids(out, ids)
+    for uid in ids:
+        _put(out, guild.members[str(uid)])
+    for uid in ids:
+        _put(out, guild.epochs.get(str(uid), 0))
+    return bytes(out)
+
+
+def decode_guild(body: bytes) -> GuildState:
+    reader = _Reader(body)
+    last_topup = reader.text()
+    floors = _read_floors(reader, reader.int())
+    ids = reader.ids()
+    members = {str(uid): reader.int() for uid in ids}
+    epochs = {}
+    for uid in ids:
+        epoch = reader.int()
+        if epoch:
+            epochs[str(uid)] = epoch
+    return GuildState(members, last_topup, floors, epochs)
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+def _encode_change(out: bytearray, change: dict) -> None:
+    _put(out, change['seq'])
+    _put(out, int(change['guild']))
+    _put_text(out, change.get('last_topup'))
+    floors = change.get('floors')
+    _put(out, 0 if floors is None else len(floors) + 1)
+    _put_floors(out, floors or ())
+    balances = change['balances']
+    epochs = change.get('floor_epochs', {})
+    ids = sorted(int(uid) for uid in balances)
+    _put_ids(out, ids)
+    for uid in ids:
+        _put(out, balances[str(uid)])
+    for uid in ids:
+        epoch = epochs.get(str(uid))
+        _put(out, 0 if epoch is None else epoch + 1)
+    games = change.get('games', ())
+    _put(out, len(games))
+    for user_id, game, delta in games:
+        _put(out, user_id)
+        _put(out, game)
+        _put(out, _zigzag(delta))
+
+
+def _decode_change(reader: _Reader) -> dict:
+    change = {'seq': reader.int(), 'guild': str(reader.int()), 'last_topup': reader.text()}
+    count = reader.int()
+    if count:
+        change['floors'] = _read_floors(reader, count - 1)
+    ids = reader.ids()
+    change['balances'] = {str(uid): reader.int() for uid in ids}
+    epochs = {}
+    for uid in ids:
+        epoch = reader.int()
+        if epoch:
+            epochs[str(uid)] = epoch - 1
+    if epochs:
+        change['floor_epochs'] = epochs
+    games = [[reader.int(), reader.int(), _unzigzag(reader.int())] for _ in range(reader.int())]
+    if games:
+        change['games'] = games
+    return change
+
+
+def encode_changes(changes: List[dict]) -> bytes:
+    out = bytearray()
+    _put(out, len(changes))
+    for change in changes:
+        _encode_change(out, change)
+    return bytes(out)
+
+
+def decode_changes(body: bytes) -> List[dict]:
+    reader = _Reader(body)
+    return [_decode_change(reader) for _ in range(reader.int())]
+
+
+# ----------------------------------------------------------------------
+# 파일
+# ----------------------------------------------------------------------
+class Snapshot(NamedTuple):
+    seq: int
+    guilds: Dict[str, GuildState]
+    # 내용이 깨진 서버
+    damaged: Set[str]
+    # 블록 머리가 깨져 그 뒤를 읽지 못했는지
+    truncated: bool
+
+
+def read_snapshot(path: str) -> Optional[Snapshot]:
+    """스냅숏을 읽는다. 파일이 없으면 None, 맨 앞 머리부터 깨졌으면 FileDamaged."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise FileDamaged(f'{path} 은(는) 보유량 스냅숏 파일이 아닙니다.')
+    reader = _Reader(data, len(SNAPSHOT_MAGIC))
+    try:
+        seq = reader.int()
+    except IndexError:
+        raise FileDamaged(f'{path} 의 머리가 잘렸습니다.')
+    guilds: Dict[str, GuildState] = {}
+    damaged: Set[str] = set()
+    truncated = False
+    try:
+        for kind, guild_id, body, _ in _blocks(data, reader.pos):
+            if kind != KIND_GUILD:
+                continue
+            gid = str(guild_id)
+            try:
+                if body is None:
+                    raise ValueError
+                guilds[gid] = decode_guild(body)
+            except (ValueError, IndexError, UnicodeDecodeError):
+                damaged.add(gid)
+    except FileDamaged as e:
+        print(f"[storage] {path}: {e}")
+        truncated = True
+    return Snapshot(seq, guilds, damaged, truncated)
+
+
+def write_snapshot(path: str, seq: int, guilds: Dict[str, GuildState]) -> Tuple[int, str]:
+    """path 옆 임시 파일에 쓰고 fsync 한다. (쓴 바이트 수, 임시 파일 경로). 교체는 부르는 쪽이 한다."""
+    out = bytearray(SNAPSHOT_MAGIC)
+    _put(out, seq)
+    for gid in sorted(guilds, key=int):
+        out += _block(KIND_GUILD, int(gid), encode_guild(guilds[gid]))
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='tokens-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(out)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(out), tmp_path
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class Journal(NamedTuple):
+    changes: List[dict]
+    # 온전한 부분이 끝나는 위치. 이 뒤는 덧붙이다 끊긴 꼬리다.
+    usable: int
+    size: int
+    # 건너뛴 블록: (guild_id, 앞 블록의 마지막 seq, 뒤 블록의 첫 seq 또는 None). 어느 서버인지 모르면 0.
+    skipped: List[Tuple[int, int, Optional[int]]]
+
+
+def _header_at(data: bytes, offset: int) -> Optional[Tuple[int, int, int, int]]:
+    header = data[offset:offset + BLOCK.size]
+    crc = data[offset + BLOCK.size:offset + BLOCK_SIZE]
+    if len(crc) < HEADER_CRC.size or HEADER_CRC.unpack(crc)[0] != zlib.crc32(header):
+        return None
+    return BLOCK.unpack(header)
+
+
+def _next_header(data: bytes, offset: int) -> Optional[int]:
+    """offset 뒤에서 CRC가 맞는 일지 블록 머리를 찾는다."""
+    marker = bytes([KIND_CHANGES])
+    offset = data.find(marker, offset)
+    while offset >= 0:
+        found = _header_at(data, offset)
+        if found is not None and offset + BLOCK_SIZE + found[2] <= len(data):
+            return offset
+        offset = data.find(marker, offset + 1)
+    return None
+
+
+def read_journal(path: str) -> Journal:
+    """일지를 읽는다. 블록 하나가 깨져도 그 뒤의 블록은 계속 읽는다.
+
+    머리가 온전하고 길이가 파일 안에 들어가면 내용만 깨진 것이므로 그 블록만 건너뛴다.
+    머리가 깨졌으면 뒤에서 다음 온전한 머리를 찾아 이어 읽는다. 머리나 내용이 파일 끝을 넘거나
+    더 읽을 블록이 없으면 덧붙이다 끊긴 꼬리이므로 거기서 멈춘다.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return Journal([], 0, 0, [])
+    if not data.startswith(JOURNAL_MAGIC):
+        return Journal([], 0, len(data), [])
+    changes: List[dict] = []
+    skipped: List[Tuple[int, int, Optional[int]]] = []
+    # 아직 뒤 블록의 첫 seq를 모르는 건너뛴 블록
+    pending: List[Tuple[int, int]] = []
+    last_seq = 0
+    offset = len(JOURNAL_MAGIC)
+    while offset < len(data):
+        found = _header_at(data, offset)
+        if found is None:
+            resume = _next_header(data, offset + 1)
+            if resume is None:
+                break
+            print(f"[storage] {path}: {offset}바이트 위치의 블록 머리가 깨져 {resume}바이트 위치부터 이어 읽습니다.")
+            pending.append((0, last_seq))
+            offset = resume
+            continue
+        kind, guild_id, length, payload_crc = found
+        start = offset + BLOCK_SIZE
+        if start + length > len(data):
+            break
+        offset = start + length
+        if kind != KIND_CHANGES:
+            continue
+        payload = data[start:offset]
+        try:
+            if zlib.crc32(payload) != payload_crc:
+                raise ValueError
+            decoded = decode_changes(zlib.decompress(payload))
+        except (zlib.error, ValueError, IndexError, UnicodeDecodeError):
+            print(f"[storage] {path}: {start}바이트 위치의 블록 내용이 깨져 건너뜁니다.")
+            pending.append((guild_id, last_seq))
+            continue
+        if decoded:
+            skipped += [(gid, after, decoded[0]['seq']) for gid, after in pending]
+            pending = []
+            last_seq = decoded[-1]['seq']
+        changes += decoded
+    skipped += [(gid, after, None) for gid, after in pending]
+    return Journal(changes, offset, len(data), skipped)
+
+
+def state_to_guilds(state: dict) -> Dict[str, GuildState]:
+    """TokenStore 상태 사본을 서버별로 나눈다."""
+    gids = set(state['balances']) | set(state['last_topup']) | set(state['floors'])
+    return {
+        gid: GuildState(
+            state['balances'].get(gid, {}), state['last_topup'].get(gid),
+            state['floors'].get(gid, []), state['floor_epochs'].get(gid, {}),
+        )
+        for gid in gids
+    }
+
+
+def guilds_to_state(seq: int, guilds: Dict[str, GuildState]) -> dict:
+    state = {'seq': seq, 'balances': {}, 'last_topup': {}, 'floors': {}, 'floor_epochs': {}}
+    for gid, guild in guilds.items():
+        state['balances'][gid] = dict(guild.members)
+        if guild.last_topup:
+            state['last_topup'][gid] = guild.last_topup
+        if guild.floors:
+            state['floors'][gid] = list(guild.floors)
+        if guild.epochs:
+            state['floor_epochs'][gid] = dict(guild.epochs)
+    return state
+
+
+def _apply(guild: Optional[GuildState], change: dict) -> GuildState:
+    if guild is None:
+        guild = GuildState({}, None, [], {})
+    guild.members.update(change['balances'])
+    floors = guild.floors
+    if 'floors' in change:
+        floors = [tuple(step) for step in change['floors']]
+    guild.epochs.update(change.get('floor_epochs', {}))
+    return GuildState(guild.members, change.get('last_topup') or guild.last_topup, floors, guild.epochs)
+
+
+class TokenFiles:
+    """DATA_DIR 안의 스냅숏·일지. 쓰기는 파일 쓰기 스레드 한 곳에서만 한다."""
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, 'tokens.bin')
+        self.prev_path = os.path.join(data_dir, 'tokens.prev.bin')
+        self.journal_dir = os.path.join(data_dir, 'journal')
+        # 지금 스냅숏의 seq. 일지는 journal/<base>.log 에 덧붙인다.
+        self.base = 0
+        # 이전 스냅숏의 seq. 이보다 오래된 일지는 필요 없다.
+        self.prev_base = 0
+        self.journal_bytes = 0
+        # 마지막으로 쓴 바이트 수 (health 표시용)
+        self.last_written = 0
+        # 불러올 때 일지 블록이 깨져 커밋 일부를 잃은 서버. 복제본이나 백업에서 되살려야 한다.
+        self.lost: Set[str] = set()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) or os.path.exists(self.prev_path) or bool(self._segments())
+
+    def _segment(self, base: int) -> str:
+        return os.path.join(self.journal_dir, f'{base}.log')
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        try:
+            names = os.listdir(self.journal_dir)
+        except FileNotFoundError:
+            return []
+        found = []
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if ext == '.log' and stem.isdigit():
+                found.append((int(stem), os.path.join(self.journal_dir, name)))
+        return sorted(found)
+
+    def _read(self, path: str) -> Optional[Snapshot]:
+        try:
+            return read_snapshot(path)
+        except FileDamaged as e:
+            print(f"[storage] {e}")
+            return Snapshot(-1, {}, set(), True)
+
+    # ------------------------------------------------------------------
+    # 불러오기
+    # ------------------------------------------------------------------
+    def load(self, readonly: bool = False) -> Tuple[dict, bool]:
+        """(상태, 새 스냅숏을 써야 하는지). 깨진 서버는 이전 스냅숏과 일지로 되살린다.
+
+        상태의 'games'에는 일지에서 읽은 커밋 중 전적이 든 것을 순서대로 담는다.
+
+        readonly면 파일을 고치지 않는다. 봇이 돌고 있는 DATA_DIR을 다른 프로세스에서 읽을 때 쓰며,
+        이때 일지 끝이 덜 써진 것은 봇이 덧붙이는 중일 수 있으므로 그 앞까지만 읽고 그대로 둔다.
+        """
+        self.lost = set()
+        current = self._read(self.path)
+        previous: Optional[Snapshot] = None
+        repaired = False
+        if current is None or current.seq < 0:
+            # 스냅숏을 바꾸는 도중에 끊겼거나 통째로 깨졌다. 이전 스냅숏부터 일지로 따라잡는다.
+            repaired = current is not None or os.path.exists(self.prev_path)
+            current = self._read(self.prev_path)
+            if current is None or current.seq < 0:
+                current = Snapshot(0, {}, set(), False)
+
+        guilds = dict(current.guilds)
+        # 서버별로 어느 seq 이후의 일지부터 반영할지
+        since: Dict[str, int] = {gid: current.seq for gid in guilds}
+        if current.damaged or current.truncated:
+            repaired = True
+            previous = self._read(self.prev_path) if current.seq > 0 else None
+            wanted = set(current.damaged)
+            if current.truncated and previous is not None:
+                wanted |= set(previous.guilds) - set(guilds)
+            for gid in sorted(wanted):
+                if previous is not None and previous.seq >= 0 and gid in previous.guilds:
+                    guilds[gid] = previous.guilds[gid]
+                    since[gid] = previous.seq
+                    print(f"[storage] 서버 {gid} 의 블록이 깨져 이전 스냅숏(seq {previous.seq})에서 되살립니다.")
+                else:
+                    print(f"[storage] 서버 {gid} 의 블록이 깨졌고 이전 스냅숏에도 없어 일지만 반영합니다.")
+                    since[gid] = 0
+
+        seq = current.seq
+        # 전적은 stats.bin의 seq부터 다시 세므로 서버별 since와 상관없이 모두 모은다.
+        games: List[dict] = []
+        segments = self._segments()
+        for index, (_, path) in enumerate(segments):
+            journal = read_journal(path)
+            if journal.usable < journal.size and not readonly:
+                # 덧붙이던 중에 끊겼다. 덜 써진 꼬리는 잘라 내서 이어 쓴 블록이 묻히지 않게 한다.
+                print(f"[storage] {path} 의 {journal.usable}바이트 뒤가 덜 써져 그 앞까지만 반영합니다.")
+                with open(path, 'r+b') as f:
+                    f.truncate(journal.usable)
+                repaired = True
+            for change in journal.changes:
+                if 'games' in change:
+                    games.append(change)
+                gid = change['guild']
+                if change['seq'] <= since.get(gid, current.seq):
+                    continue
+                guilds[gid] = _apply(guilds.get(gid), change)
+                seq = max(seq, change['seq'])
+            for guild_id, after, before in journal.skipped:
+                if before is None and index + 1 < len(segments):
+                    # 다음 일지 조각은 이 조각의 커밋을 모두 담은 스냅숏 뒤에서 시작한다.
+                    before = segments[index + 1][0] + 1
+                gids = [str(guild_id)] if guild_id else sorted(guilds, key=int)
+                gids = [gid for gid in gids if before is None or before - 1 > since.get(gid, current.seq)]
+                if not gids:
+                    # 건너뛴 커밋은 모두 스냅숏에 들어 있다.
+                    continue
+                lost = f'seq {after + 1}~{before - 1}' if before is not None else f'seq {after + 1} 이후'
+                if guild_id:
+                    print(f"[storage] 서버 {guild_id} 의 일지 블록({lost})을 잃었습니다. 뒤 커밋은 계속 반영합니다.")
+                else:
+                    print(f"[storage] 어느 서버인지 모르는 일지 블록({lost})을 잃었습니다. 뒤 커밋은 계속 반영합니다.")
+                self.lost.update(gids)
+                repaired = True
+        self.base = current.seq
+        if previous is None:
+            previous = self._read(self.prev_path)
+        self.prev_base = previous.seq if previous is not None and previous.seq >= 0 else 0
+        self.journal_bytes = self._journal_size()
+        state = guilds_to_state(seq, guilds)
+        state['games'] = games
+        return state, repaired
+
+    def disk_seq(self) -> int:
+        """파일에 반영된 마지막 커밋 번호. 스냅숏과 일지를 끝까지 읽는다."""
+        snapshot = self._read(self.path) or Snapshot(0, {}, set(), False)
+        seq = max(snapshot.seq, 0)
+        for _, path in self._segments():
+            changes = read_journal(path).changes
+            if changes:
+                seq = max(seq, max(change['seq'] for change in changes))
+        return seq
+
+    def _journal_size(self) -> int:
+        try:
+            return os.path.getsize(self._segment(self.base))
+        except OSError:
+            return 0
+
+    # ------------------------------------------------------------------
+    # 쓰기
+    # ------------------------------------------------------------------
+    def append(self, changes: List[dict]) -> bool:
+        """커밋들을 일지에 덧붙인다. 일지가 커져 새 스냅숏(compact)을 써야 하면 True를 돌려준다.
+
+        스냅숏은 부르는 쪽이 쓴다. 저장소는 그 전에 전적 표를 같은 seq로 써 둔다.
+
+        같은 서버의 연속한 커밋을 블록 하나로 묶어 머리에 guild_id를 적는다. 블록 내용이 깨지면
+        어느 서버의 커밋을 잃었는지 알 수 있고, 블록 순서가 seq 순서라 중간에 끊겨도 앞부분만 남는다.
+        """
+        os.makedirs(self.journal_dir, exist_ok=True)
+        runs: List[List[dict]] = []
+        for change in changes:
+            if runs and runs[-1][0]['guild'] == change['guild']:
+                runs[-1].append(change)
+            else:
+                runs.append([change])
+        block = b''.join(_block(KIND_CHANGES, int(run[0]['guild']), encode_changes(run)) for run in runs)
+        path = self._segment(self.base)
+        with open(path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(JOURNAL_MAGIC)
+            f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+            self.journal_bytes = f.tell()
+        self.last_written = len(block)
+        return self.journal_bytes >= config.SNAPSHOT_JOURNAL_BYTES
+
+    def compact(self, state: dict, rotate: bool = True) -> None:
+        """state 전체를 새 스냅숏으로 쓴다. 지금 스냅숏은 이전 스냅숏이 되고, 그보다 오래된 일지는 지운다.
+
+        rotate가 False면 지금 스냅숏을 이전 스냅숏으로 남기지 않고 덮어쓴다. 깨진 스냅숏을 되살린 뒤에
+        쓰며, 이때 이전 스냅숏과 그 뒤의 일지는 그대로 둔다.
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        size, tmp_path = write_snapshot(self.path, state['seq'], state_to_guilds(state))
+        if rotate and os.path.exists(self.path):
+            os.replace(self.path, self.prev_path)
+            self.prev_base = self.base
+        os.replace(tmp_path, self.path)
+        self.base = state['seq']
+        self.journal_bytes = self._journal_size()
+        self.last_written = size
+        for base, path in self._segments():
+            if base < self.prev_base:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
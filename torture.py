@@ -0,0 +1,284 @@
+"""저장소 강제 종료 시험.
+
+정산이 "끝났다"고 답한 뒤 프로세스가 죽어도 그 정산이 남아 있는지, 어디서 죽든 파일이 정산 중간 상태로
+남지 않는지를 직접 죽여 가며 확인한다.
+
+- 새 프로세스에서 저장소를 띄우고 여러 작업이 동시에 transfer·gift·adjust 를 무작위로 부른다.
+  커밋마다 (seq, 바뀐 보유량, 어떤 정산인지)를, 쓰기가 끝나 알림이 오면 확인한 seq를 내보낸다.
+- 무작위 시점에 SIGKILL 로 죽이고, 같은 DATA_DIR을 다시 불러와 확인한다.
+  - 확인받은 커밋은 모두 남아 있어야 한다.
+  - 불러온 상태는 커밋들을 seq 순서대로 앞에서부터 반영한 것과 정확히 같아야 한다. (중간에 빠진 커밋 없음)
+  - transfer 는 합계가 그대로, gift 는 정확히 보낸 양 - 받은 양만큼 줄어야 한다.
+- 이어서 같은 폴더로 다음 회차를 돌린다. 모드마다 초당 확인받은 정산 수도 잰다.
+
+모드는 저장 방식을 바꾸는 환경변수 묶음이다. 더 빠른 방식을 도입할 때 여기에 더해 같은 시험을 돌린다.
+
+    python torture.py                              # 모든 모드, 모드마다 10번 죽인다
+    python torture.py --mode journal --rounds 50
+    python torture.py --tasks 32 --max-run 2
+"""
+
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import io
+import json
+import os
+import random
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+GUILD_ID = 1
+USER_BASE = 10 ** 17
+INITIAL = 1000
+
+# 모드 이름: 자식 프로세스에 더할 환경변수
+MODES: Dict[str, Dict[str, str]] = {
+    # 기본: 바뀐 것만 일지에 덧붙이고 커밋을 모아 쓴다
+    'journal': {},
+    # 쓸 때마다 스냅숏 전체를 새로 쓴다 (예전 tokens.json 과 같은 쓰기 양)
+    'snapshot': {'SNAPSHOT_JOURNAL_BYTES': '1'},
+    # 커밋을 모으지 않고 하나씩 쓴다
+    'unbatched': {'PERSIST_QUEUE_SIZE': '1'},
+}
+
+
+def _emit(record: dict) -> None:
+    sys.stdout.write(json.dumps(record, separators=(',', ':')) + '\n')
+    sys.stdout.flush()
+
+
+# ----------------------------------------------------------------------
+# 자식 프로세스: 정산을 계속 돌린다
+# ----------------------------------------------------------------------
+async def _worker(users: int, tasks: int, seed: int) -> None:
+    from storage import SettlementError, TokenStore
+    from ledger import REASON_INITIAL
+
+    store = TokenStore()
+    with contextlib.redirect_stdout(sys.stderr):
+        store.load()
+    current_op: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar('op', default=None)
+
+    # 쓰기 스레드에 넘기는 순간(잠금 안, seq 순서)에 커밋 내용을 내보낸다.
+    submit = store.persist.submit
+
+    async def traced(change, on_durable):
+        if change is not None:
+            _emit({'t': 'commit', 'seq': change['seq'], 'balances': change['balances'], 'op': current_op.get()})
+        return await submit(change, on_durable)
+
+    store.persist.submit = traced
+    await store.attach(lambda change: _emit({'t': 'ack', 'seq': change['seq']}))
+
+    ids = [USER_BASE + i for i in range(users)]
+    if not store.get_balance(GUILD_ID, ids[0]):
+        for user_id in ids:
+            current_op.set({'kind': 'adjust', 'delta': INITIAL})
+            await store.adjust(GUILD_ID, user_id, INITIAL, reason=REASON_INITIAL)
+    _emit({'t': 'ready', 'seq': store.seq})
+
+    async def run(rng: random.Random) -> None:
+        while True:
+            a, b = rng.sample(ids, 2)
+            roll = rng.random()
+            try:
+                if roll < 0.5:
+                    amount = rng.randint(1, 50)
+                    current_op.set({'kind': 'transfer'})
+                    await store.transfer(GUILD_ID, a, b, amount)
+                elif roll < 0.85:
+                    sent = rng.randint(2, 40)
+                    burn = max(1, sent // 10)
+                    current_op.set({'kind': 'gift', 'burn': burn})
+                    await store.gift(GUILD_ID, a, b, sent, sent - burn)
+                else:
+                    delta = rng.randint(1, 20)
+                    current_op.set({'kind': 'adjust', 'delta': delta})
+                    await store.adjust(GUILD_ID, a, delta)
+            except SettlementError:
+                pass
+
+    await asyncio.gather(*(run(random.Random(seed * 1000 + i)) for i in range(tasks)))
+
+
+# ----------------------------------------------------------------------
+# 부모 프로세스: 죽이고 확인한다
+# ----------------------------------------------------------------------
+class Round:
+    """자식 프로세스 한 번. 내보낸 줄을 따로 읽어 둔다."""
+
+    def __init__(self, data_dir: str, env: Dict[str, str], args: argparse.Namespace, seed: int):
+        self.commits: Dict[int, dict] = {}
+        self.acked = 0
+        self.acks = 0
+        self.ready_at: Optional[float] = None
+        self._ready = threading.Event()
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--worker', '--users', str(args.users),
+             '--tasks', str(args.tasks), '--seed', str(seed)],
+            cwd=HERE, env={**env, 'DATA_DIR': data_dir}, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True,
+        )
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self) -> None:
+        for line in self.proc.stdout:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue    # 죽는 순간 잘린 줄
+            if record['t'] == 'commit':
+                self.commits[record['seq']] = record
+            elif record['t'] == 'ack':
+                self.acked = max(self.acked, record['seq'])
+                self.acks += 1
+            elif record['t'] == 'ready':
+                self.ready_at = time.monotonic()
+                self._ready.set()
+        self._ready.set()
+
+    def kill_after(self, seconds: float) -> float:
+        """준비되고 seconds 뒤에 SIGKILL 로 죽인다. 준비된 뒤 돈 시간(초)을 돌려준다."""
+        self._ready.wait(60)
+        if self.ready_at is None:
+            raise RuntimeError('자식 프로세스가 준비되지 않았습니다.')
+        time.sleep(seconds)
+        self.proc.send_signal(signal.SIGKILL)
+        elapsed = time.monotonic() - self.ready_at
+        self.proc.wait()
+        self._reader.join()
+        return elapsed
+
+
+def reload(data_dir: str) -> tuple:
+    """(seq, {user_id(str): 보유량}, 불러오기 로그). 봇이 시작할 때처럼 불러온다."""
+    from storage import TokenStore
+
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        store = TokenStore(data_dir)
+        store.load()
+    return store.seq, dict(store._balances.get(str(GUILD_ID), {})), out.getvalue()
+
+
+def verify(before: Dict[str, int], base_seq: int, round_: Round, seq: int, balances: Dict[str, int]) -> List[str]:
+    """불러온 상태가 커밋들을 앞에서부터 반영한 것과 같은지, 정산마다 합계가 맞는지 본다."""
+    errors = []
+    if seq < round_.acked:
+        errors.append(f"확인받은 커밋을 잃었습니다: 파일 seq {seq} < 확인 {round_.acked}")
+    expected = dict(before)
+    for number in range(base_seq + 1, seq + 1):
+        commit = round_.commits.get(number)
+        if commit is None:
+            errors.append(f"파일에 있는 seq {number} 의 커밋을 보낸 적이 없습니다.")
+            return errors
+        changed = sum(amount - expected.get(key, 0) for key, amount in commit['balances'].items())
+        op = commit['op'] or {}
+        want = {'transfer': 0, 'gift': -op.get('burn', 0), 'adjust': op.get('delta', 0)}.get(op.get('kind'))
+        if want is not None and changed != want:
+            errors.append(f"seq {number} ({op['kind']}): 합계가 {changed:+d} 바뀌었습니다. (기대 {want:+d})")
+        expected.update(commit['balances'])
+    if balances != expected:
+        wrong = sorted(key for key in set(balances) | set(expected) if balances.get(key) != expected.get(key))
+        errors.append(f"seq {seq} 까지 반영한 상태와 다릅니다: {len(wrong)}명 (예: {wrong[:3]})")
+    return errors
+
+
+def run_mode(name: str, args: argparse.Namespace, rng: random.Random) -> dict:
+    data_dir = tempfile.mkdtemp(prefix=f'torture-{name}-')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = HERE + os.pathsep + env.get('PYTHONPATH', '')
+    env.update(MODES[name])
+    # 보정 방식 등 저장소 밖의 설정은 시험에 섞이지 않게 끈다.
+    env['LAZY_FLOOR'] = ''
+
+    seq, balances, errors, rates, repairs = 0, {}, [], [], 0
+    for number in range(args.rounds):
+        round_ = Round(data_dir, env, args, rng.randrange(1 << 30))
+        elapsed = round_.kill_after(rng.uniform(0.05, args.max_run))
+        new_seq, new_balances, log = reload(data_dir)
+        if '깨' in log:
+            repairs += 1
+        found = verify(balances, seq, round_, new_seq, new_balances)
+        for error in found:
+            errors.append(f"{number + 1}회차: {error}")
+        rates.append(round_.acks / elapsed if elapsed > 0 else 0.0)
+        seq, balances = new_seq, new_balances
+        mark = '실패' if found else '통과'
+        print(f"  [{name}] {number + 1}/{args.rounds} {mark}: seq {seq} (확인 {round_.acked}, "
+              f"보냄 {max(round_.commits, default=seq)}), {elapsed:.2f}초")
+
+    if args.keep:
+        print(f"  [{name}] 데이터를 남겼습니다: {data_dir}")
+    else:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return {
+        'mode': name,
+        'rounds': args.rounds,
+        'commits': seq,
+        'ops_per_sec': round(statistics.median(rates), 1) if rates else 0.0,
+        'repairs': repairs,
+        'errors': errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='저장소 강제 종료 시험')
+    parser.add_argument('--mode', choices=sorted(MODES), action='append', help='시험할 모드 (여러 번 줄 수 있다)')
+    parser.add_argument('--rounds', type=int, default=10, help='모드마다 죽이는 횟수')
+    parser.add_argument('--tasks', type=int, default=16, help='동시에 정산하는 작업 수')
+    parser.add_argument('--users', type=int, default=20, help='정산에 참여하는 인원 수')
+    parser.add_argument('--max-run', type=float, default=1.0, help='죽이기 전까지 돌리는 최대 시간(초)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--keep', action='store_true', help='시험한 DATA_DIR을 지우지 않는다')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(_worker(args.users, args.tasks, args.seed or 0))
+        return
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    rng = random.Random(seed)
+    print(f"시드 {seed}")
+    results = [run_mode(name, args, rng) for name in (args.mode or MODES)]
+
+    import config
+
+    record = {
+        'at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'seed': seed,
+        'tasks': args.tasks,
+        'results': results,
+    }
+    path = os.path.join(config.DATA_DIR, 'reports', 'torture.jsonl')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    print(f"{'모드':<12}{'회차':>6}{'커밋':>8}{'초당 정산':>10}{'복구':>6}{'위반':>6}")
+    for result in results:
+        print(f"{result['mode']:<12}{result['rounds']:>6}{result['commits']:>8}"
+              f"{result['ops_per_sec']:>10.1f}{result['repairs']:>6}{len(result['errors']):>6}")
+        for error in result['errors']:
+            print(f"  {error}")
+    print(f"기록 ({path})")
+    if any(result['errors'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""토너먼트 대진과 진행 상태.
+
+디스코드와 저장소를 모르는 순수한 진행 로직만 둔다. 참가비 회수와 상금 지급은
+bot.py가 저장소의 settle로 한 번씩 처리하고, 여기서는 누가 누구와 붙어 누가 이겼는지만 다룬다.
+
+라운드마다 상태를 DATA_DIR/tournaments/ 아래 파일로 남겨서, 진행 중에 봇이 재시작해도
+참가비를 걷은 대회는 이어서 끝낼 수 있게 한다.
+
+참가비·상금 정산은 커밋하기 직전에 그 커밋 번호(fee_seq, prize_seq)를 먼저 파일에 남긴다.
+재시작 후 저장소가 그 번호까지 불러왔으면 정산이 반영된 것이고, 아니면 반영되지 않은 것이다.
+"""
+
+import json
+import os
+import random
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+
+STATE_REGISTERING = 'registering'
+STATE_RUNNING = 'running'
+STATE_FINISHED = 'finished'
+
+# 한 경기: [첫째 user_id, 둘째 user_id(부전승이면 None), 첫째 숫자, 둘째 숫자, 승자]
+Match = List[Optional[int]]
+
+
+class Tournament:
+    def __init__(self, guild_id: int, host_id: int, entry_fee: int):
+        self.guild_id = guild_id
+        self.host_id = host_id
+        self.entry_fee = entry_fee
+        self.players: List[int] = []
+        self.rounds: List[List[Match]] = []
+        self.state = STATE_REGISTERING
+        # 진행 상황을 보여주는 메시지. 재시작 후 이어서 고치기 위해 남긴다.
+        self.channel_id: Optional[int] = None
+        self.message_id: Optional[int] = None
+        # 참가비·상금 정산의 저장소 커밋 번호. 정산 전에는 None.
+        self.fee_seq: Optional[int] = None
+        self.prize_seq: Optional[int] = None
+
+    # ------------------------------------------------------------------
+    # 참가
+    # ------------------------------------------------------------------
+    def register(self, user_id: int) -> bool:
+        if self.state != STATE_REGISTERING or user_id in self.players:
+            return False
+        if len(self.players) >= config.TOURNAMENT_MAX_PLAYERS:
+            return False
+        self.players.append(user_id)
+        return True
+
+    def withdraw(self, user_id: int) -> bool:
+        if self.state != STATE_REGISTERING or user_id not in self.players:
+            return False
+        self.players.remove(user_id)
+        return True
+
+    @property
+    def pot(self) -> int:
+        return self.entry_fee * len(self.players)
+
+    # ------------------------------------------------------------------
+    # 진행
+    # ------------------------------------------------------------------
+    def start(self, rng: Optional[random.Random] = None) -> None:
+        """대진을 짜고 진행 상태로 바꾼다.
+
+        인원이 2의 거듭제곱이 아니면 첫 라운드에서 모자란 만큼 부전승을 준다.
+        """
+        players = list(self.players)
+        (rng or random).shuffle(players)
+
+        size = 1
+        while size < len(players):
+            size *= 2
+        byes = size - len(players)
+
+        first: List[Match] = [[p, None, None, None, p] for p in players[:byes]]
+        rest = players[byes:]
+        first += [[rest[i], rest[i + 1], None, None, None] for i in range(0, len(rest), 2)]
+        self.rounds = [first]
+        self.state = STATE_RUNNING
+
+    def resolve_round(self, duel: Callable[[], Tuple[int, int]]) -> List[Match]:
+        """현재 라운드의 남은 경기를 한꺼번에 치르고 다음 라운드 대진을 만든다.
+
+        duel은 무승부 없는 두 숫자를 돌려주는 함수로, 같이놀기와 같은 규칙을 쓴다.
+        치른 라운드의 경기 목록을 돌려준다.
+        """
+        current = self.rounds[-1]
+        for match in current:
+            if match[4] is not None:
+                continue
+            first_roll, second_roll = duel()
+            match[2], match[3] = first_roll, second_roll
+            match[4] = match[0] if first_roll > second_roll else match[1]
+
+        winners = [match[4] for match in current]
+        if len(winners) == 1:
+            self.state = STATE_FINISHED
+        else:
+            self.rounds.append([
+                [winners[i], winners[i + 1], None, None, None] for i in range(0, len(winners), 2)
+            ])
+        return current
+
+    @property
+    def champion(self) -> Optional[int]:
+        if self.state != STATE_FINISHED:
+            return None
+        return self.rounds[-1][0][4]
+
+    @property
+    def runner_up(self) -> Optional[int]:
+        if self.state != STATE_FINISHED:
+            return None
+        final = self.rounds[-1][0]
+        if final[1] is None:
+            return None
+        return final[1] if final[4] == final[0] else final[0]
+
+    def payouts(self) -> List[Tuple[int, int]]:
+        """(user_id, 상금) 목록. 나누고 남은 자투리는 우승자에게 준다."""
+        if self.state != STATE_FINISHED:
+            return []
+        pot = self.pot
+        ranked = [self.champion, self.runner_up]
+        shares = [
+            (user_id, int(pot * share))
+            for user_id, share in zip(ranked, config.TOURNAMENT_PAYOUT)
+            if user_id is not None
+        ]
+        leftover = pot - sum(amount for _, amount in shares)
+        shares[0] = (shares[0][0], shares[0][1] + leftover)
+        return shares
+
+    # ------------------------------------------------------------------
+    # 저장
+    # ------------------------------------------------------------------
+    def to_dict(self) -> dict:
+        return {
+            'guild_id': self.guild_id,
+            'host_id': self.host_id,
+            'entry_fee': self.entry_fee,
+            'players': self.players,
+            'rounds': self.rounds,
+            'state': self.state,
+            'channel_id': self.channel_id,
+            'message_id': self.message_id,
+            'fee_seq': self.fee_seq,
+            'prize_seq': self.prize_seq,
+        }
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> 'Tournament':
+        tournament = cls(int(raw['guild_id']), int(raw['host_id']), int(raw['entry_fee']))
+        tournament.players = [int(p) for p in raw.get('players', [])]
+        tournament.rounds = raw.get('rounds', [])
+        tournament.state = raw.get('state', STATE_REGISTERING)
+        tournament.channel_id = raw.get('channel_id')
+        tournament.message_id = raw.get('message_id')
+        tournament.fee_seq = raw.get('fee_seq')
+        tournament.prize_seq = raw.get('prize_seq')
+        return tournament
+
+
+def checkpoint_dir() -> str:
+    return os.path.join(config.DATA_DIR, 'tournaments')
+
+
+def checkpoint_path(guild_id: int) -> str:
+    return os.path.join(checkpoint_dir(), f'{guild_id}.json')
+
+
+def save_checkpoint(tournament: Tournament) -> None:
+    """임시 파일에 쓴 뒤 교체한다. 토큰 파일과 같은 방식."""
+    directory = checkpoint_dir()
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='tournament-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(tournament.to_dict(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, checkpoint_path(tournament.guild_id))
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def remove_checkpoint(guild_id: int) -> None:
+    try:
+        os.unlink(checkpoint_path(guild_id))
+    except FileNotFoundError:
+        pass
+
+
+def load_checkpoints() -> Dict[int, Tournament]:
+    """남아 있는 진행 중 대회를 읽어온다. 읽을 수 없는 파일은 건너뛴다."""
+    found: Dict[int, Tournament] = {}
+    try:
+        names = os.listdir(checkpoint_dir())
+    except FileNotFoundError:
+        return found
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(checkpoint_dir(), name), 'r', encoding='utf-8') as f:
+                tournament = Tournament.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[tournament] {name} 을(를) 읽을 수 없어 건너뜁니다: {e}")
+            continue
+        found[tournament.guild_id] = tournament
+    return found